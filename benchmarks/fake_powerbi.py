@@ -0,0 +1,407 @@
+"""
+Local stand-in for the Microsoft login, the COVID Power BI Dashboard and its data endpoint, for offline benchmarks
+"""
+
+import json
+import time
+import random
+import secrets
+import datetime
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+SESSION_COOKIE = 'fake_bi_session'
+
+# Same element names and ids as the Microsoft login form. Inputs are only added to the
+# page once their step is reached, and the button is disabled while signing in, so the
+# login script sees the same sequence of elements as on the real form.
+LOGIN_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Sign in to your account</title></head>
+<body>
+<form id="login" onsubmit="return false;">
+    <div id="prompt">Sign in</div>
+    <div id="fields"><input type="email" name="loginfmt" placeholder="Email"></div>
+    <input type="submit" id="idSIButton9" value="Next">
+</form>
+<script>
+const returnUrl = %(return_url)s;
+const button = document.getElementById('idSIButton9');
+const fields = document.getElementById('fields');
+const prompt = document.getElementById('prompt');
+let step = 'email';
+let user = '';
+
+button.addEventListener('click', () => {
+    if (step === 'email') {
+        user = document.querySelector('[name=loginfmt]').value;
+        if (!user) return;
+        fields.innerHTML = '<input type="password" name="passwd" placeholder="Password">';
+        prompt.textContent = 'Enter password';
+        button.value = 'Sign in';
+        step = 'password';
+    } else if (step === 'password') {
+        const password = document.querySelector('[name=passwd]').value;
+        if (!password) return;
+        button.disabled = true;
+        fetch('/login', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/x-www-form-urlencoded'},
+            body: new URLSearchParams({loginfmt: user, passwd: password}),
+        }).then(response => {
+            if (!response.ok) {
+                prompt.textContent = 'Your account or password is incorrect';
+                return;
+            }
+            fields.innerHTML = '';
+            prompt.textContent = 'Stay signed in?';
+            button.value = 'Yes';
+            step = 'kmsi';
+        }).finally(() => { button.disabled = false; });
+    } else {
+        window.location.href = returnUrl;
+    }
+});
+</script>
+</body>
+</html>
+"""
+
+# Same data-testid buttons as the Power BI report viewer. Every page shows a loading
+# spinner, then paints its visuals one by one over renderMs, like a report querying data.
+# Like the real viewer it also loads a slow telemetry script, which delays the load event.
+REPORT_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<title>COVID Dashboard</title>
+<script async src="/telemetry/sdk.js"></script>
+<style>
+    body { margin: 0; font-family: Segoe UI, Arial, sans-serif; background: #eaeaea; }
+    #app-bar { height: 40px; background: #252423; color: white; display: flex; align-items: center; gap: 8px; padding: 0 12px; }
+    #app-bar button, #next { font-size: 14px; }
+    #canvas { position: absolute; top: 48px; left: 8px; right: 8px; bottom: 8px; display: grid;
+              grid-template-columns: repeat(4, 1fr); grid-template-rows: repeat(2, 1fr); gap: 8px; }
+    body.fullscreen #app-bar { display: none; }
+    body.fullscreen #canvas { top: 8px; }
+    #next { position: fixed; right: 16px; bottom: 16px; display: none; z-index: 2; }
+    body.fullscreen #next { display: block; }
+    .visual-container { background: white; padding: 8px; overflow: hidden; display: flex; flex-direction: column; }
+    .title { font-weight: 600; margin-bottom: 6px; }
+    .bars { flex: 1; display: flex; align-items: flex-end; gap: 2px; }
+    .kpi { flex: 1; display: flex; align-items: center; justify-content: center; font-size: 64px; }
+    table { border-collapse: collapse; font-size: 12px; }
+    td { border-bottom: 1px solid #ddd; padding: 2px 6px; }
+    .powerbi-spinner { position: fixed; top: 50%%; left: 50%%; width: 48px; height: 48px; margin: -24px;
+                       border: 6px solid #ccc; border-top-color: #f2c811; border-radius: 50%%;
+                       animation: spin 1s linear infinite; z-index: 1; }
+    @keyframes spin { to { transform: rotate(360deg); } }
+</style>
+</head>
+<body>
+<div id="app-bar">
+    <span>COVID Dashboard</span>
+    <button data-testid="app-bar-view-menu-btn" id="view">View</button>
+    <button data-testid="open-in-full-screen-btn" id="fullscreen" style="display: none">Full screen</button>
+    <span id="page-label"></span>
+</div>
+<div id="canvas"></div>
+<button data-testid="fullscreen-navigate-next-btn" id="next">Next page</button>
+<script>
+// Like the real viewer, the token the data queries are sent with is a page global
+window.powerBIAccessToken = %(token)s;
+const PAGES = %(pages)d;
+const RENDER_MS = %(render_ms)d;
+const VISUALS = 8;
+const canvas = document.getElementById('canvas');
+let timers = [];
+let page = Math.min(PAGES, Math.max(1, parseInt(
+    (new URLSearchParams(location.search).get('pageName') || '').replace('ReportSection', '')) || 1));
+
+// Seeded so the same page always paints the same pixels
+function random(seed) {
+    return () => {
+        seed = (seed + 0x6D2B79F5) | 0;
+        let t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+        t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+
+function visual(pageNumber, index) {
+    const rand = random(pageNumber * 100 + index);
+    const container = document.createElement('div');
+    container.className = 'visual-container';
+    const title = document.createElement('div');
+    title.className = 'title';
+    title.textContent = `Page ${pageNumber} visual ${index + 1}`;
+    container.appendChild(title);
+
+    const kind = index %% 3;
+    if (kind === 0) {
+        const bars = document.createElement('div');
+        bars.className = 'bars';
+        for (let i = 0; i < 40; i++) {
+            const bar = document.createElement('div');
+            bar.style.flex = '1';
+            bar.style.height = `${10 + rand() * 90}%%`;
+            bar.style.background = `hsl(${Math.floor(rand() * 360)}, 60%%, 50%%)`;
+            bars.appendChild(bar);
+        }
+        container.appendChild(bars);
+    } else if (kind === 1) {
+        const kpi = document.createElement('div');
+        kpi.className = 'kpi';
+        kpi.textContent = Math.floor(rand() * 100000).toLocaleString();
+        container.appendChild(kpi);
+    } else {
+        const table = document.createElement('table');
+        for (let row = 0; row < 12; row++) {
+            const tr = table.insertRow();
+            for (let col = 0; col < 4; col++) {
+                tr.insertCell().textContent = col === 0 ? `Division ${row + 1}` : Math.floor(rand() * 1000);
+            }
+        }
+        container.appendChild(table);
+    }
+    return container;
+}
+
+function render() {
+    timers.forEach(clearTimeout);
+    timers = [];
+    canvas.innerHTML = '';
+    document.getElementById('page-label').textContent = `Page ${page} of ${PAGES}`;
+
+    const spinner = document.createElement('div');
+    spinner.className = 'powerbi-spinner';
+    document.body.appendChild(spinner);
+
+    // Like the real viewer, the URL names the open page
+    const url = new URL(location.href);
+    url.searchParams.set('pageName', `ReportSection${page}`);
+    history.replaceState(null, '', url);
+
+    const current = page;
+    for (let i = 0; i < VISUALS; i++) {
+        timers.push(setTimeout(() => canvas.appendChild(visual(current, i)), RENDER_MS * (i + 1) / VISUALS));
+    }
+    timers.push(setTimeout(() => spinner.remove(), RENDER_MS));
+    document.querySelectorAll('.powerbi-spinner').forEach(old => { if (old !== spinner) old.remove(); });
+}
+
+document.getElementById('view').addEventListener('click', () => {
+    document.getElementById('fullscreen').style.display = 'inline-block';
+});
+document.getElementById('fullscreen').addEventListener('click', () => {
+    document.body.classList.add('fullscreen');
+});
+document.getElementById('next').addEventListener('click', () => {
+    page = page %% PAGES + 1;
+    render();
+});
+render();
+</script>
+</body>
+</html>
+"""
+
+def fake_query(selects: list, rows: int = 30) -> dict:
+    """
+    Builds a data query in the shape the report viewer sends, for the fake data endpoint
+
+    Args:
+        selects (list): Column names such as "Cases.Date" or "Sum(Cases.Count)"; the first one groups the rows
+        rows (Integer): Number of rows to return
+    Returns:
+        query (dict): Request body for /explore/querydata
+    """
+
+    return {'queries': [{'Query': {'Commands': [{'SemanticQueryDataShapeCommand': {
+        'Query': {'Select': [{'Name': name} for name in selects]},
+        'Binding': {'DataReduction': {'Primary': {'Top': {'Count': rows}}}},
+    }}]}}]}
+
+def fake_query_result(query: dict) -> bytes:
+    """
+    Answers a data query with seeded values, in the compressed format of the real endpoint
+
+    Grouping columns named like a date hold consecutive days, others hold text from a value
+    dictionary; the remaining columns hold integers, with some empty values and repeats.
+
+    Args:
+        query (dict): Request body from fake_query
+    Returns:
+        body (bytes): JSON response
+    """
+
+    command = query['queries'][0]['Query']['Commands'][0]['SemanticQueryDataShapeCommand']
+    names = [select['Name'] for select in command['Query']['Select']]
+    count = command.get('Binding', {}).get('DataReduction', {}).get('Primary', {}).get('Top', {}).get('Count', 30)
+    rand = random.Random('|'.join(names))
+
+    keys = ['G0'] + [f'M{index}' for index in range(len(names) - 1)]
+    dated = 'date' in names[0].lower()
+    schema = [{'N': 'G0', 'T': 7} if dated else {'N': 'G0', 'T': 1, 'DN': 'D0'}]
+    schema += [{'N': key, 'T': 4} for key in keys[1:]]
+
+    start = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    labels = [f'Division {index + 1}' for index in range(count)]
+    entries, previous = [], None
+    for index in range(count):
+        group = int((start + datetime.timedelta(days=index)).timestamp() * 1000) if dated else index
+        row = [group] + [rand.randrange(0, 5000) for _ in keys[1:]]
+        if index % 13 == 12 and len(row) > 2:
+            row[2] = None
+        if previous and rand.random() < 0.2:
+            row[1] = previous[1]
+
+        entry, repeat, empty = {}, 0, 0
+        values = []
+        for column, value in enumerate(row):
+            if previous is not None and value is not None and value == previous[column]:
+                repeat |= 1 << column
+            elif value is None:
+                empty |= 1 << column
+            else:
+                values.append(value)
+        if index == 0:
+            entry['S'] = schema
+        if repeat:
+            entry['R'] = repeat
+        if empty:
+            entry['Ø'] = empty
+        entry['C'] = values
+        entries.append(entry)
+        previous = row
+
+    dataset = {'N': 'DS0', 'PH': [{'DM0': entries}]}
+    if not dated:
+        dataset['ValueDicts'] = {'D0': labels}
+    return json.dumps({'results': [{'jobId': 'fake', 'result': {'data': {
+        'descriptor': {'Select': [{'Kind': 1 if key == 'G0' else 2, 'Value': key, 'Name': name} for key, name in zip(keys, names)]},
+        'dsr': {'Version': 2, 'MinorVersion': 1, 'DS': [dataset]},
+    }}}]}).encode()
+
+class FakePowerBIHandler(BaseHTTPRequestHandler):
+    """Serves the login form, the report and its data queries, redirecting to the login without a session cookie"""
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path == '/login':
+            query = dict(urllib.parse.parse_qsl(parsed.query))
+            self._send_html(LOGIN_PAGE % {'return_url': json.dumps(query.get('return', '/report'))})
+        elif parsed.path == '/report':
+            if not self._has_session():
+                location = '/login?' + urllib.parse.urlencode({'return': self.path})
+                self.send_response(302)
+                self.send_header('Location', location)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self._send_html(REPORT_PAGE % {
+                'pages': self.server.pages, 'render_ms': self.server.render_ms,  # type: ignore
+                'token': json.dumps(self._cookies().get(SESSION_COOKIE)),
+            })
+        elif parsed.path.startswith('/telemetry/'):
+            time.sleep(self.server.telemetry_ms / 1000)  # type: ignore
+            body = b'/* telemetry */' + b' ' * 150_000
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/javascript')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if urllib.parse.urlparse(self.path).path == '/explore/querydata':
+            self._query_data()
+            return
+        if urllib.parse.urlparse(self.path).path != '/login':
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        form = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode()))
+        if not form.get('loginfmt') or not form.get('passwd'):
+            self.send_error(401)
+            return
+
+        token = secrets.token_hex(16)
+        with self.server.lock:  # type: ignore
+            self.server.sessions.add(token)  # type: ignore
+        self.send_response(204)
+        self.send_header('Set-Cookie', f'{SESSION_COOKIE}={token}; Path=/')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _cookies(self) -> dict:
+        return dict(part.strip().split('=', 1) for part in self.headers.get('Cookie', '').split(';') if '=' in part)
+
+    def _has_session(self) -> bool:
+        return self._cookies().get(SESSION_COOKIE) in self.server.sessions  # type: ignore
+
+    def _query_data(self):
+        # Data queries are authorised with the page's bearer token, or the session cookie
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        if token not in self.server.sessions and not self._has_session():  # type: ignore
+            self.send_error(401)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = fake_query_result(json.loads(self.rfile.read(length)))
+        except (ValueError, KeyError, IndexError):
+            self.send_error(400)
+            return
+        time.sleep(self.server.query_ms / 1000)  # type: ignore
+        with self.server.lock:  # type: ignore
+            self.server.query_count += 1  # type: ignore
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_html(self, html: str) -> None:
+        body = html.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fake_powerbi(pages: int = 3, render_ms: int = 1500, telemetry_ms: int = 800, query_ms: int = 50, port: int = 0):
+    """
+    Starts the fake login and dashboard on a background thread
+
+    Args:
+        pages (Integer): Number of report pages
+        render_ms (Integer): Milliseconds each page takes to paint its visuals
+        telemetry_ms (Integer): Milliseconds the telemetry script takes to download
+        query_ms (Integer): Milliseconds each data query takes to answer
+        port (Integer): Port to listen on, 0 picks a free one
+    Returns:
+        server (ThreadingHTTPServer): Running server, stop it with shutdown()
+        url (String): Dashboard link, to use as COVID_DASH_LINK
+    """
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakePowerBIHandler)
+    server.pages = pages  # type: ignore
+    server.render_ms = render_ms  # type: ignore
+    server.telemetry_ms = telemetry_ms  # type: ignore
+    server.query_ms = query_ms  # type: ignore
+    server.query_count = 0  # type: ignore
+    server.sessions = set()  # type: ignore
+    server.lock = threading.Lock()  # type: ignore
+
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    return server, f'http://127.0.0.1:{server.server_port}/report?reportId=benchmark'
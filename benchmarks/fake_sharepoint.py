@@ -0,0 +1,204 @@
+"""
+Minimal SharePoint REST emulator for offline benchmarks of the report uploads
+
+Implements only the calls upload_report makes: form digests, Files/add, chunked upload
+sessions and folder listings, including inside $batch requests.
+"""
+
+import json
+import re
+import threading
+import urllib.parse
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FOLDER = re.compile(r"getFolderByServerRelativeUrl\('([^']*)'\)", re.IGNORECASE)
+FILE = re.compile(r"getFileByServerRelativeUrl\('([^']*)'\)", re.IGNORECASE)
+GET_BY_URL = re.compile(r"/Files/GetByUrl\('([^']*)'\)", re.IGNORECASE)
+ADD = re.compile(r"/Files/add\((.*)\)$", re.IGNORECASE)
+UPLOAD = re.compile(r"/(startUpload|continueUpload|finishUpload)\(([^)]*)\)", re.IGNORECASE)
+
+class SharePointError(Exception):
+    """Becomes an OData error response"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def parse_args(args: str) -> dict:
+    # e.g. uploadID='...',fileOffset=5 or overwrite=true,url='a.pdf'
+    values = {}
+    for name, value in re.findall(r"(\w+)=('[^']*'|[^,]*)", args):
+        values[name.lower()] = urllib.parse.unquote(value.strip("'"))
+    return values
+
+class FakeSharePoint:
+    """In-memory document libraries and upload sessions of one SharePoint host"""
+
+    def __init__(self):
+        self.files = {}
+        self.sessions = {}
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def count(self, body: bytes) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(body)
+
+    def file_json(self, path: str) -> dict:
+        stored = self.files[path]
+        return {
+            '__metadata': {'type': 'SP.File'},
+            'Name': path.rsplit('/', 1)[-1],
+            'ServerRelativeUrl': path,
+            'Length': str(len(stored['content'])),
+            'ETag': f'"{{{stored["id"]}}},{stored["version"]}"',
+        }
+
+    def store(self, path: str, content: bytes) -> dict:
+        with self._lock:
+            stored = self.files.setdefault(path, {'id': str(uuid.uuid4()).upper(), 'version': 0})
+            stored['content'] = content
+            stored['version'] += 1
+        return self.file_json(path)
+
+    def handle(self, method: str, url: str, body: bytes):
+        """
+        Answers one REST call
+
+        Args:
+            method (String): HTTP method
+            url (String): Request URL or path
+            body (bytes): Request body
+        Returns:
+            result (dict): Value of the 'd' property of the verbose OData response
+        """
+
+        path = urllib.parse.unquote(urllib.parse.urlparse(url).path)
+
+        if path.lower().endswith('/_api/contextinfo'):
+            return {'GetContextWebInformation': {'FormDigestValue': str(uuid.uuid4()), 'FormDigestTimeoutSeconds': 1800}}
+
+        folder = FOLDER.search(path)
+        target = FILE.search(path)
+        if folder and GET_BY_URL.search(path):
+            target_path = f'{folder.group(1)}/{GET_BY_URL.search(path).group(1)}'  # type: ignore
+        elif target:
+            target_path = target.group(1)
+        else:
+            target_path = None
+
+        upload = UPLOAD.search(path)
+        if upload and target_path:
+            return self.upload_step(upload.group(1).lower(), parse_args(upload.group(2)), target_path, body)
+
+        add = ADD.search(path)
+        if add and folder:
+            args = parse_args(add.group(1))
+            return self.store(f"{folder.group(1)}/{args['url']}", body)
+
+        if folder and method == 'GET' and path.lower().endswith('/files'):
+            prefix = folder.group(1).rstrip('/') + '/'
+            with self._lock:
+                paths = [p for p in self.files if p.startswith(prefix) and '/' not in p[len(prefix):]]
+            return {'results': [self.file_json(p) for p in sorted(paths)]}
+
+        raise SharePointError(404, f'Unsupported request: {method} {path}')
+
+    def upload_step(self, step: str, args: dict, path: str, chunk: bytes) -> dict:
+        upload_id = args['uploadid']
+        with self._lock:
+            if step == 'startupload':
+                self.sessions[upload_id] = bytearray(chunk)
+                return {'StartUpload': str(len(chunk))}
+
+            received = self.sessions.get(upload_id)
+            if received is None or int(args['fileoffset']) != len(received):
+                raise SharePointError(400, f'Upload session {upload_id} not found at offset {args.get("fileoffset")}')
+            received += chunk
+            if step == 'continueupload':
+                return {'ContinueUpload': str(len(received))}
+            del self.sessions[upload_id]
+
+        return self.store(path, bytes(received))
+
+def odata_response(status: int, result=None, message: str | None = None) -> tuple:
+    if status >= 400:
+        payload = {'error': {'code': f'-1, {status}', 'message': {'lang': 'en-US', 'value': message}}}
+    else:
+        payload = {'d': result}
+    return status, json.dumps(payload).encode()
+
+class FakeSharePointHandler(BaseHTTPRequestHandler):
+    """HTTP front end of FakeSharePoint, unpacking $batch requests into single calls"""
+
+    def do_GET(self):
+        self._handle(b'')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self._handle(self.rfile.read(length))
+
+    def _handle(self, body: bytes) -> None:
+        self.server.sharepoint.count(body)  # type: ignore
+        if self.path.endswith('/_api/$batch'):
+            self._handle_batch(body)
+            return
+
+        status, payload = self._call(self.command, self.path, body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;odata=verbose;charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _call(self, method: str, url: str, body: bytes) -> tuple:
+        try:
+            return odata_response(200, self.server.sharepoint.handle(method, url, body))  # type: ignore
+        except SharePointError as e:
+            return odata_response(e.status, message=str(e))
+
+    def _handle_batch(self, body: bytes) -> None:
+        # Only GET parts are needed for the folder listings
+        boundary = 'batchresponse_' + str(uuid.uuid4())
+        parts = []
+        for method, url in re.findall(r'^(GET) (.+) HTTP/1\.1\r?$', body.decode(), re.MULTILINE):
+            status, payload = self._call(method, url, b'')
+            reason = 'OK' if status == 200 else 'Error'
+            parts.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\n'
+                f'HTTP/1.1 {status} {reason}\r\nCONTENT-TYPE: application/json;odata=verbose;charset=utf-8\r\n\r\n'
+                f'{payload.decode()}\r\n'
+            )
+        payload = (''.join(parts) + f'--{boundary}--\r\n').encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/mixed; boundary={boundary}')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fake_sharepoint(port: int = 0):
+    """
+    Starts the SharePoint emulator on a background thread
+
+    Args:
+        port (Integer): Port to listen on, 0 picks a free one
+    Returns:
+        server (ThreadingHTTPServer): Running server; server.sharepoint holds the uploaded files
+        url (String): Base URL, to use as SHAREPOINT_URL
+    """
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeSharePointHandler)
+    server.sharepoint = FakeSharePoint()  # type: ignore
+
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    return server, f'http://127.0.0.1:{server.server_port}/'
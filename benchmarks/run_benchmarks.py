@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the report pipeline
+
+Runs the stages of create_all_reports and upload_report against local stand-ins for the
+Microsoft login, the Power BI dashboard and SharePoint, across page counts and screenshot
+sizes, and records wall time, CPU time and peak memory of every stage.
+
+    python benchmarks/run_benchmarks.py --pages 3,6 --scales 0.5,1 --output results.json
+    python benchmarks/run_benchmarks.py --pages 3,6 --scales 0.5,1 --baseline results.json
+
+--no-browser replaces the browser capture with generated screenshots, to benchmark PDF
+building and uploads on machines without Chrome. --capture-mode data builds the reports
+from the fake dashboard's data endpoint instead of screenshots.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'scripts'))
+
+from fake_powerbi import fake_query, start_fake_powerbi
+from fake_sharepoint import start_fake_sharepoint
+
+SITE = 'benchmark'
+STAGES = ('capture', 'build', 'upload')
+
+def children_cpu() -> float:
+    # Only counts child processes that have already exited, such as browsers torn down by the stage
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class StageMeter:
+    """Measures wall time, CPU time and peak memory of one stage, including the browsers it starts"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.result = {}
+        self._peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        # The scripts read their settings on import, which main sets up first
+        from tracing import process_tree_rss
+
+        while not self._stop.is_set():
+            rss = process_tree_rss()
+            if rss is None:
+                return
+            self._peak = max(self._peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._children_cpu = children_cpu()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu + children_cpu() - self._children_cpu
+        self._stop.set()
+        self._sampler.join()
+
+        # Without /proc, fall back to the peak of this process over its whole lifetime
+        if self._peak:
+            peak_mb = self._peak / 1024 / 1024
+        else:
+            from pdf_builder import peak_rss_mb
+            peak_mb = peak_rss_mb()
+
+        self.result = {
+            'wall_seconds': round(wall, 3),
+            'cpu_seconds': round(cpu, 3),
+            'peak_rss_mb': round(peak_mb, 1) if peak_mb is not None else None,
+        }
+
+def synthetic_screenshots(pages: int, scale: float) -> list:
+    """
+    Generates dashboard-like screenshots, for benchmarking without a browser
+
+    Args:
+        pages (Integer): Number of screenshots
+        scale (Float): Size relative to a 1920x1080 viewport
+    Returns:
+        screenshots (list): PNG bytes, in page order
+    """
+
+    from PIL import Image, ImageDraw
+
+    width, height = int(1920 * scale), int(1080 * scale)
+    screenshots = []
+    for page in range(1, pages + 1):
+        rand = random.Random(page)
+        image = Image.new('RGB', (width, height), (234, 234, 234))
+        draw = ImageDraw.Draw(image)
+        cell_w, cell_h = width // 4, height // 2
+        for index in range(8):
+            left, top = (index % 4) * cell_w + 4, (index // 4) * cell_h + 4
+            draw.rectangle((left, top, left + cell_w - 8, top + cell_h - 8), fill='white')
+            draw.text((left + 6, top + 4), f'Page {page} visual {index + 1}', fill='black')
+            bar_w = max(1, (cell_w - 24) // 40)
+            for bar in range(40):
+                bar_h = int((cell_h - 40) * (0.1 + 0.9 * rand.random()))
+                x = left + 8 + bar * bar_w
+                color = tuple(rand.randrange(256) for _ in range(3))
+                draw.rectangle((x, top + cell_h - 16 - bar_h, x + bar_w - 1, top + cell_h - 16), fill=color)
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        screenshots.append(buffer.getvalue())
+    return screenshots
+
+def export_spec(pages: int, query_url: str) -> dict:
+    """
+    Lists three visuals per page for the data-export mode: a bar chart, a table and a line chart
+
+    Args:
+        pages (Integer): Number of dashboard pages
+        query_url (String): Data endpoint of the fake dashboard
+    Returns:
+        spec (dict): Visuals in the EXPORT_VISUALS format
+    """
+
+    visuals = []
+    for page in range(1, pages + 1):
+        visuals += [
+            {'name': f'page{page}_cases', 'title': f'Page {page} new cases by day', 'page': page, 'kind': 'bar',
+             'query': fake_query(['Cases.Date', f'Sum(Cases.Page{page})'], rows=30)},
+            {'name': f'page{page}_divisions', 'title': f'Page {page} cases by division', 'page': page, 'kind': 'table',
+             'query': fake_query(['Divisions.Division', 'Sum(Cases.Active)', 'Sum(Cases.Recovered)', f'Sum(Cases.Page{page})'], rows=40)},
+            {'name': f'page{page}_trend', 'title': f'Page {page} trend', 'page': page, 'kind': 'line',
+             'query': fake_query(['Cases.Date', 'Sum(Cases.Tested)', f'Sum(Cases.Positive{page})'], rows=90)},
+        ]
+    return {'query_url': query_url, 'pages': {str(page): f'Page {page}' for page in range(1, pages + 1)}, 'visuals': visuals}
+
+def login_headers(dash_link: str) -> dict:
+    """
+    Signs in to the fake dashboard over HTTP, for exporting data without a browser
+
+    Args:
+        dash_link (String): Dashboard link of the fake dashboard
+    Returns:
+        headers (dict): Request headers carrying the session cookie
+    """
+
+    import urllib.parse
+    import urllib.request
+
+    base = dash_link.split('/report')[0]
+    form = urllib.parse.urlencode({'loginfmt': 'benchmark@example.com', 'passwd': 'benchmark'}).encode()
+    with urllib.request.urlopen(urllib.request.Request(f'{base}/login', data=form, method='POST')) as response:
+        cookie = response.headers['Set-Cookie'].split(';')[0]
+    return {'Content-Type': 'application/json', 'Accept': 'application/json', 'Cookie': cookie}
+
+def run_case(pages: int, scale: float, browser: bool, capture_mode: str = 'screenshot') -> dict:
+    """
+    Captures, builds and uploads the reports once
+
+    Args:
+        pages (Integer): Number of dashboard pages to capture
+        scale (Float): Screenshot scale, as SCREENSHOT_SCALE
+        browser (Boolean): Capture with Chrome, or generate the screenshots (sign in over HTTP in data mode)
+        capture_mode (String): 'screenshot' to capture pages, 'data' to export the visuals' data
+    Returns:
+        case (dict): Stage measurements, span totals and output sizes
+    """
+
+    import create_reports
+    import data_export
+    import tracing
+    from upload_report import upload_report
+
+    tracing.reset()
+    create_reports.REPORT_PAGES = ','.join(str(page) for page in range(1, pages + 1))
+    create_reports.SCREENSHOT_SCALE = scale
+    stages = {}
+    screenshots = []
+
+    # create_all_reports is split at its two halves so they are measured separately
+    with StageMeter() as meter:
+        if capture_mode == 'data':
+            spec = data_export.load_visuals()
+            spec['visuals'] = [visual for visual in spec['visuals'] if visual['page'] <= pages]
+            if browser:
+                driver = create_reports.powerbi_login(os.environ['METRO_EMAIL'])
+                try:
+                    headers = data_export.session_headers(driver, spec['query_url'])
+                finally:
+                    create_reports.teardown(driver)
+            else:
+                headers = login_headers(os.environ['COVID_DASH_LINK'])
+            visuals = data_export.export_tables(headers, spec)
+        elif browser:
+            screenshots = create_reports.capture_all_pages()
+        else:
+            screenshots = synthetic_screenshots(pages, scale)
+    stages['capture'] = meter.result
+
+    with StageMeter() as meter:
+        if capture_mode == 'data':
+            report_filepaths = data_export.save_data_reports(visuals, spec['pages'])
+        else:
+            report_filepaths = create_reports.save_reports(screenshots)
+    stages['build'] = meter.result
+
+    with StageMeter() as meter:
+        for localpath in report_filepaths.values():
+            upload_report(SITE, localpath, f'/sites/{SITE}/Shared Documents/benchmark/{os.path.basename(localpath)}')
+    stages['upload'] = meter.result
+
+    spans = {}
+    network = {'blocked_count': 0, 'saved_bytes': 0, 'loaded_bytes': 0}
+    query_bytes = 0
+    for recorded in tracing.spans():
+        spans[recorded['name']] = round(spans.get(recorded['name'], 0) + recorded['seconds'], 3)
+        if recorded['name'] == 'network':
+            for key in network:
+                network[key] += recorded['attrs'][key]
+        elif recorded['name'] == 'export.query':
+            query_bytes += recorded['attrs'].get('bytes', 0)
+
+    return {
+        'pages': pages,
+        'scale': scale,
+        'capture_mode': capture_mode,
+        'stages': stages,
+        'spans': spans,
+        'network': network,
+        'screenshot_bytes': sum(len(png) for png in screenshots),
+        'query_bytes': query_bytes,
+        'pdf_bytes': {report: os.path.getsize(path) for report, path in report_filepaths.items()},
+    }
+
+def compare(cases: list, baseline_path: str) -> None:
+    """
+    Prints the change in wall time of every stage against an earlier results file
+
+    Args:
+        cases (list): Cases of this run
+        baseline_path (String): Results JSON of an earlier run
+    """
+
+    with open(baseline_path) as f:
+        baseline = {(case['pages'], case['scale'], case['run']): case for case in json.load(f)['cases']}
+
+    print(f"\nChange against {baseline_path}:")
+    for case in cases:
+        before = baseline.get((case['pages'], case['scale'], case['run']))
+        if before is None:
+            continue
+        changes = []
+        for stage in STAGES:
+            old, new = before['stages'][stage]['wall_seconds'], case['stages'][stage]['wall_seconds']
+            changes.append(f"{stage} {old:.2f}s -> {new:.2f}s ({(new - old) / old * 100 if old else 0:+.0f}%)")
+        print(f"  pages={case['pages']} scale={case['scale']} run {case['run']}: " + ', '.join(changes))
+
+def main(argv: list | None = None) -> list:
+    parser = argparse.ArgumentParser(description='Offline benchmark of report capture, PDF building and upload')
+    parser.add_argument('--pages', default='3', help='Comma separated page counts, e.g. 3,6,12')
+    parser.add_argument('--scales', default='1', help='Comma separated screenshot scales, e.g. 0.5,1,2')
+    parser.add_argument('--render-ms', type=int, default=1500, help='How long each fake page takes to render')
+    parser.add_argument('--telemetry-ms', type=int, default=800, help='How long the fake telemetry script takes to load')
+    parser.add_argument('--network-policy', choices=('on', 'off'), default='on', help='NETWORK_POLICY for the capture stage')
+    parser.add_argument('--quiet-ms', default='250', help='RENDER_QUIET_MS for the render wait')
+    parser.add_argument('--concurrency', default='3', help='CAPTURE_CONCURRENCY for the capture stage')
+    parser.add_argument('--profiles', default='standard', help='REPORT_PROFILES for the build stage')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs of every case')
+    parser.add_argument('--capture-mode', choices=('screenshot', 'data'), default='screenshot',
+                        help="'data' builds the reports from the fake data endpoint instead of screenshots")
+    parser.add_argument('--query-ms', type=int, default=50, help='How long each fake data query takes to answer')
+    parser.add_argument('--no-browser', action='store_true', help='Generate screenshots, or sign in over HTTP in data mode, instead of using Chrome')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against the results JSON of an earlier run')
+    args = parser.parse_args(argv)
+    started = time.time()
+
+    page_counts = [int(pages) for pages in args.pages.split(',')]
+    scales = [float(scale) for scale in args.scales.split(',')]
+
+    powerbi, dash_link = start_fake_powerbi(pages=max(page_counts), render_ms=args.render_ms, telemetry_ms=args.telemetry_ms,
+                                            query_ms=args.query_ms)
+    sharepoint, sharepoint_url = start_fake_sharepoint()
+
+    # Module level settings are read when the scripts are imported, so set them first
+    os.environ.update({
+        'COVID_DASH_LINK': dash_link,
+        'SHAREPOINT_URL': sharepoint_url,
+        'METRO_EMAIL': 'benchmark@example.com',
+        'METRO_PASSWORD': 'benchmark',
+        'RENDER_QUIET_MS': args.quiet_ms,
+        'CAPTURE_CONCURRENCY': args.concurrency,
+        'REPORT_PROFILES': args.profiles,
+        'NETWORK_POLICY': args.network_policy,
+        'NETWORK_DENY': '*/telemetry/*',
+        # Every data-export run queries the endpoint, rather than reading an earlier run's cache
+        'EXPORT_CACHE_MINUTES': '0',
+    })
+    for name in ('BI_SESSION_CACHE', 'SAVE_SCREENSHOTS', 'TRACE_REPORT', 'TRACE_TEXTFILE', 'EXPORT_QUERY_URL'):
+        os.environ.pop(name, None)
+
+    # Microsoft's token service cannot run locally; the emulator accepts any session cookie. upload_report
+    # imports AuthenticationContext when a publisher is created, so the office365 module itself is patched
+    from office365.runtime.auth import authentication_context
+
+    class EmulatorAuthenticationContext(authentication_context.AuthenticationContext):
+        def acquire_token_for_user(self, username, password):
+            self._authenticate = lambda request: request.set_header('Cookie', 'FedAuth=benchmark')
+            return self
+
+    authentication_context.AuthenticationContext = EmulatorAuthenticationContext
+
+    # Reports, screenshots and upload state are written to a scratch directory
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    cwd = os.getcwd()
+    cases = []
+    with tempfile.TemporaryDirectory(prefix='covid-reports-benchmark-') as workdir:
+        os.chdir(workdir)
+        spec_path = os.path.join(workdir, 'export_visuals.json')
+        with open(spec_path, 'w') as f:
+            json.dump(export_spec(max(page_counts), dash_link.split('/report')[0] + '/explore/querydata'), f)
+        os.environ['EXPORT_VISUALS'] = spec_path
+        try:
+            for pages in page_counts:
+                for scale in scales:
+                    for run in range(1, args.repeat + 1):
+                        print(f"\n=== pages={pages} scale={scale} run {run}/{args.repeat} ===")
+                        case = run_case(pages, scale, browser=not args.no_browser, capture_mode=args.capture_mode)
+                        case['run'] = run
+                        cases.append(case)
+        finally:
+            os.chdir(cwd)
+            powerbi.shutdown()
+            sharepoint.shutdown()
+
+    print('\nResults:')
+    for case in cases:
+        stages = ', '.join(
+            f"{stage} {measured['wall_seconds']:.2f}s wall / {measured['cpu_seconds']:.2f}s cpu / {measured['peak_rss_mb']} MB"
+            for stage, measured in case['stages'].items()
+        )
+        print(f"  pages={case['pages']} scale={case['scale']} run {case['run']}: {stages}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'started': started, 'settings': vars(args), 'cases': cases}, f, indent=2)
+        print(f"Wrote results to: {output}")
+
+    if baseline:
+        compare(cases, baseline)
+
+    return cases
+
+if __name__ == '__main__':
+    main()
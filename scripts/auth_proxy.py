@@ -6,71 +6,201 @@ Simple authentication proxy for handling Windows Integrated Auth in GitHub Actio
 import os
 import requests
 from requests_ntlm import HttpNtlmAuth
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from contextlib import contextmanager
+import json
 import urllib.parse
 import threading
 import time
 
+from response_cache import ResponseCache, CacheEntry, MAX_ENTRY_BYTES
+
+# Authenticated keep-alive sessions kept per upstream host, and streaming chunk size
+POOL_SIZE = int(os.getenv('AUTH_PROXY_POOL_SIZE', '4'))
+CHUNK_SIZE = 64 * 1024
+
+# Add headers to look more like a real browser
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Headers that only apply to a single connection and are never forwarded
+HOP_BY_HOP = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'host', 'content-length',
+}
+
+class SessionPool:
+    """Bounded pool of NTLM authenticated keep-alive sessions for each upstream host"""
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        # Get credentials from environment
+        session = requests.Session()
+        session.auth = HttpNtlmAuth(os.getenv('METRO_EMAIL'), os.getenv('METRO_PASSWORD'))
+        return session
+
+    @contextmanager
+    def session(self, host: str):
+        """
+        Borrows an authenticated session for a host, waiting while all of them are in use
+
+        Args:
+            host (String): Upstream host name
+        """
+
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = (threading.BoundedSemaphore(self.size), [])
+            slots, idle = self._hosts[host]
+
+        with slots:
+            with self._lock:
+                session = idle.pop() if idle else None
+            session = session or self._new_session()
+            try:
+                yield session
+            except Exception:
+                # Its connection may be in an unknown state, so do not reuse it
+                session.close()
+                raise
+            with self._lock:
+                idle.append(session)
+
 class AuthProxyHandler(BaseHTTPRequestHandler):
     """HTTP proxy that handles NTLM authentication"""
-    
+
+    protocol_version = 'HTTP/1.1'
+    pool = SessionPool()
+    cache = ResponseCache()
+
     def do_GET(self):
+        # Hit, miss and byte counters of the response cache
+        if self.path == '/__proxy/stats':
+            self._send_body(200, [('Content-Type', 'application/json')], json.dumps(self.cache.stats()).encode())
+            return
+        self._proxy()
+
+    def do_POST(self):
+        self._proxy()
+
+    def _proxy(self):
         # Get the target URL from the request
         target_url = self.path.lstrip('/')
         if not target_url.startswith('http'):
             target_url = 'https://' + target_url
-            
-        print(f"Proxying request to: {target_url}")
-        
+
+        print(f"Proxying {self.command} request to: {target_url}")
+
+        # Forward the request body and the client's own headers
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else None
+        headers = dict(BROWSER_HEADERS)
+        headers.update((name, value) for name, value in self.headers.items() if name.lower() not in HOP_BY_HOP)
+
+        # Serve fresh static assets locally, and revalidate stale ones with their ETag
+        cache_key = entry = None
+        if self.command == 'GET':
+            cache_key = self.cache.key(target_url, headers)
+            entry = self.cache.get(cache_key)
+            if entry and entry.is_fresh():
+                self._send_cached(entry)
+                return
+            if entry and entry.etag and 'If-None-Match' not in self.headers:
+                headers['If-None-Match'] = entry.etag
+            else:
+                entry = None
+
+        headers_sent = False
         try:
-            # Get credentials from environment
-            username = os.getenv('METRO_EMAIL')
-            password = os.getenv('METRO_PASSWORD')
-            
-            # Make authenticated request
-            session = requests.Session()
-            session.auth = HttpNtlmAuth(username, password)
-            
-            # Add headers to look more like a real browser
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-            }
-            
-            response = session.get(target_url, headers=headers, timeout=30)
-            
-            # Forward the response
-            self.send_response(response.status_code)
-            
-            # Forward headers
-            for header, value in response.headers.items():
-                if header.lower() not in ['transfer-encoding', 'connection']:
-                    self.send_header(header, value)
-            
-            self.end_headers()
-            
-            # Send content
-            self.wfile.write(response.content)
-            
+            with self.pool.session(urllib.parse.urlparse(target_url).netloc) as session:
+                response = session.request(self.command, target_url, headers=headers, data=body, stream=True, timeout=30)
+                try:
+                    if entry and response.status_code == 304:
+                        self.cache.refresh(cache_key, entry, response.headers)  # type: ignore
+                        self._send_cached(entry)
+                        return
+
+                    if cache_key:
+                        self.cache.count('misses')
+                    max_age = self.cache.cacheable(target_url, response.status_code, response.headers) if cache_key else None
+                    cached_chunks = [] if max_age is not None else None
+
+                    # Forward the response
+                    self.send_response(response.status_code)
+                    for header, value in response.raw.headers.items():
+                        if header.lower() not in HOP_BY_HOP:
+                            self.send_header(header, value)
+
+                    has_body = response.status_code not in (204, 304)
+                    content_length = response.headers.get('Content-Length')
+                    chunked = has_body and content_length is None
+                    if content_length is not None:
+                        self.send_header('Content-Length', content_length)
+                    if chunked:
+                        self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    headers_sent = True
+
+                    # Stream the still-encoded body to the client as it arrives
+                    if has_body:
+                        for chunk in response.raw.stream(CHUNK_SIZE, decode_content=False):
+                            self.cache.count('bytes_fetched', len(chunk))
+                            if cached_chunks is not None:
+                                cached_chunks.append(chunk)
+                                if sum(map(len, cached_chunks)) > MAX_ENTRY_BYTES:
+                                    cached_chunks = None
+                            if chunked:
+                                self.wfile.write(f'{len(chunk):X}\r\n'.encode() + chunk + b'\r\n')
+                            else:
+                                self.wfile.write(chunk)
+                        if chunked:
+                            self.wfile.write(b'0\r\n\r\n')
+
+                    if cached_chunks is not None:
+                        self.cache.put(cache_key, CacheEntry(  # type: ignore
+                            response.status_code,
+                            [(header, value) for header, value in response.raw.headers.items() if header.lower() not in HOP_BY_HOP],
+                            b''.join(cached_chunks), time.time(), max_age, response.headers.get('ETag'),  # type: ignore
+                        ))
+                finally:
+                    response.close()
+
         except Exception as e:
             print(f"Proxy error: {e}")
-            self.send_error(500, f"Proxy error: {e}")
-    
-    def do_POST(self):
-        # Handle POST requests similarly
-        self.do_GET()
+            if headers_sent:
+                self.close_connection = True
+            else:
+                self.send_error(502, f"Proxy error: {e}")
     
+    def _send_cached(self, entry):
+        self.cache.count('hits')
+        self.cache.count('bytes_served', len(entry.body))
+        self._send_body(entry.status, entry.headers, entry.body)
+
+    def _send_body(self, status, headers, body):
+        self.send_response(status)
+        for header, value in headers:
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def log_message(self, format, *args):
         # Suppress logging for cleaner output
         pass
 
 def start_auth_proxy(port=8080):
-    """Start the authentication proxy server"""
-    server = HTTPServer(('localhost', port), AuthProxyHandler)
+    """Start the authentication proxy server, handling each connection on its own thread"""
+    server = ThreadingHTTPServer(('localhost', port), AuthProxyHandler)
     print(f"Starting auth proxy on port {port}")
     
     # Start server in a separate thread
@@ -94,5 +224,6 @@ if __name__ == "__main__":
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
+        print(f"Cache stats: {AuthProxyHandler.cache.stats()}")
         print("Shutting down proxy...")
         proxy.shutdown() 
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""
+Creates reports for several dashboards and dates in one run, with a pool of browsers sharing one login
+
+The manifest is JSON; every job may override the defaults, and runs once per date:
+
+    {
+        "defaults": {"pages": "1,2,3", "reports": ["union", "daily"]},
+        "jobs": [
+            {
+                "name": "covid",
+                "dashboard": "https://app.powerbi.com/groups/.../reports/...",
+                "dates": {"from": "2026-10-05", "to": "2026-10-11"},
+                "filter": "Calendar/Date eq {date:%Y-%m-%d}",
+                "titles": {"daily": "Daily COVID Report"},
+                "upload": {"site": "COVIDReports", "folder": "/sites/COVIDReports/Shared Documents/Backfill"}
+            },
+            {"name": "operations", "dashboard": "https://...", "bookmark": "Bookmarkc0ffee", "reports": ["daily"]}
+        ]
+    }
+
+"pages" is a comma separated string or a list such as [1, 2, "ReportSection3"]. "dates" is a
+list of ISO dates or a from/to range, and defaults to today. "filter" and "bookmark" become
+the Power BI filter and bookmarkGuid URL parameters, with {date} replaced by the job date; a
+job without {date} in either only shows today's data, so it may only list today. Each job and date writes to its own <output>/<name>/<date>/
+directory, so jobs never overwrite each other's reports or screenshots.
+"""
+
+import os
+import sys
+import json
+import datetime
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+from browser_backend import driver_browser
+from create_reports import capture_in_order, powerbi_login, spawn_driver, spawn_drivers, teardown
+from data_export import require_screenshot_mode
+from quality_gate import gate_pages
+from report_files import parse_pages, report_dates, save_reports
+from session_cache import export_cookies
+from tracing import span, write_run_report
+from upload_report import upload_report
+
+# Browsers working through the jobs at once, and where job output is written
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '3'))
+BATCH_OUTPUT = os.getenv('BATCH_OUTPUT', 'batch')
+
+def expand_dates(spec) -> list:
+    """
+    Lists the report dates of a job
+
+    Args:
+        spec (list | dict | None): ISO dates, a {'from', 'to'} range (inclusive), or None for today
+    Returns:
+        dates (list): datetime.date of every report to create
+    """
+
+    if spec is None:
+        return [datetime.date.today()]
+    if isinstance(spec, dict):
+        start = datetime.date.fromisoformat(spec['from'])
+        end = datetime.date.fromisoformat(spec.get('to', spec['from']))
+        if end < start:
+            raise ValueError(f"Date range ends before it starts: {spec}")
+        return [start + datetime.timedelta(days=day) for day in range((end - start).days + 1)]
+    return [datetime.date.fromisoformat(date) for date in spec]
+
+def load_manifest(path: str) -> list:
+    """
+    Reads a batch manifest and expands it into one unit of work per job and date
+
+    Args:
+        path (String): Location of the manifest JSON
+    Returns:
+        units (list): Job settings, each with the 'date' it is for
+    """
+
+    with open(path) as f:
+        manifest = json.load(f)
+
+    defaults = manifest.get('defaults', {})
+    units = []
+    seen = set()
+    for job in manifest['jobs']:
+        job = {**defaults, **job}
+        missing = [key for key in ('name', 'dashboard') if not job.get(key)]
+        if missing:
+            raise ValueError(f"Batch job is missing {missing}: {job}")
+        dates = expand_dates(job.get('dates'))
+
+        # Without {date} in its filter or bookmark a job captures today's dashboard, which must
+        # never be saved, or uploaded over, as the report of another day
+        dated = any('{date' in (job.get(key) or '') for key in ('filter', 'bookmark'))
+        other_days = [date.isoformat() for date in dates if date != datetime.date.today()]
+        if other_days and not dated:
+            raise ValueError(f"Job {job['name']} lists {other_days} but its filter and bookmark have no {{date}} placeholder")
+        for date in dates:
+            if (job['name'], date) in seen:
+                raise ValueError(f"Job {job['name']} is listed twice for {date}")
+            seen.add((job['name'], date))
+            units.append({**job, 'date': date})
+    return units
+
+def job_url(unit: dict) -> str:
+    """
+    Builds the dashboard URL of a unit, with its filter and bookmark for its date
+
+    Args:
+        unit (dict): Job settings from load_manifest
+    Returns:
+        url (String): Dashboard URL to capture
+    """
+
+    parsed = urllib.parse.urlparse(unit['dashboard'])
+    query = dict(urllib.parse.parse_qsl(parsed.query))
+    if unit.get('filter'):
+        query['filter'] = unit['filter'].format(date=unit['date'])
+    if unit.get('bookmark'):
+        query['bookmarkGuid'] = unit['bookmark'].format(date=unit['date'])
+    return urllib.parse.urlunparse(parsed._replace(query=urllib.parse.urlencode(query)))
+
+# Uploads share one SharePoint context per site, which is not thread safe
+_upload_lock = threading.Lock()
+
+def run_unit(driver, unit: dict, output_root: str) -> dict:
+    """
+    Captures, builds and optionally uploads the reports of one job and date
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver carrying the logged in session
+        unit (dict): Job settings from load_manifest
+        output_root (String): Directory holding the output of every job
+    Returns:
+        result (dict): Job name, date, status, the files it wrote and uploaded, and the quality score of every page
+    """
+
+    directory = os.path.join(output_root, unit['name'], unit['date'].isoformat())
+    _, date_short = report_dates(unit['date'])
+    url = job_url(unit)
+    pages = parse_pages(unit.get('pages', '1,2,3'))
+
+    print(f"Capturing {unit['name']} for {unit['date']}: {len(pages)} pages")
+    def capture(positions):
+        # Page indexes are captured in one pass through the report, not reopened from page 1 each
+        return capture_in_order(driver, url, [pages[position] for position in positions],
+                                [f'{date_short}_{position + 1:02d}' for position in positions],
+                                os.path.join(directory, 'screenshots'))
+
+    # Blank or still loading pages are captured again before they reach a report
+    screenshots = capture(range(len(pages)))
+    quality = gate_pages(screenshots, capture,
+                         labels=[f"{unit['name']} page {page}" for page in pages])
+
+    report_filepaths = save_reports(
+        screenshots, reports=tuple(unit.get('reports', ('union', 'daily'))),
+        output_dir=os.path.join(directory, 'reports'), date=unit['date'], titles=unit.get('titles'),
+    )
+
+    uploads = {}
+    if unit.get('upload'):
+        with _upload_lock:
+            for report, localpath in report_filepaths.items():
+                remotepath = f"{unit['upload']['folder']}/{os.path.basename(localpath)}"
+                uploads[report] = upload_report(unit['upload']['site'], localpath, remotepath, idempotent=True)
+
+    return {
+        'name': unit['name'], 'date': unit['date'].isoformat(), 'status': 'ok',
+        'files': report_filepaths, 'uploads': uploads, 'quality': quality,
+    }
+
+def run_batch(units: list, output_root: str = BATCH_OUTPUT, workers: int = BATCH_WORKERS) -> list:
+    """
+    Runs every unit on a bounded pool of browsers that share one login
+
+    A failing unit is reported and its browser replaced; the other units carry on.
+
+    Args:
+        units (list): Job settings from load_manifest
+        output_root (String): Directory holding the output of every job
+        workers (Integer): Maximum number of browsers working at the same time
+    Returns:
+        results (list): Result of every unit, in manifest order
+    """
+
+    if not units:
+        return []
+    require_screenshot_mode('batch runs')
+
+    # Log in once, every other browser reuses the session cookies
+    user = os.getenv("METRO_EMAIL")
+    driver = powerbi_login(user)  # type: ignore
+    cookies = export_cookies(driver)
+    browser = driver_browser(driver)
+    pool_size = max(1, min(workers, len(units)))
+
+    started = [driver]
+    started_lock = threading.Lock()
+
+    drivers = Queue()
+    drivers.put(driver)
+    try:
+        # Browsers that did start are closed by spawn_drivers if another one fails
+        workers = spawn_drivers(browser, cookies, pool_size - 1)
+        started.extend(workers)
+        for worker in workers:
+            drivers.put(worker)
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            print(f"Running {len(units)} batch jobs with {pool_size} browsers")
+
+            def process(unit):
+                worker = drivers.get()
+                try:
+                    with span('batch.job', job=unit['name'], date=unit['date'].isoformat()):
+                        return run_unit(worker, unit, output_root)
+                except Exception as e:
+                    print(f"✗ Batch job {unit['name']} for {unit['date']} failed: {e}")
+
+                    # The browser may be stuck on a broken page, so replace it when possible
+                    try:
+                        replacement = spawn_driver(browser, cookies)
+                    except Exception as spawn_error:
+                        print(f"Could not start a replacement browser, reusing the old one: {spawn_error}")
+                    else:
+                        with started_lock:
+                            started.remove(worker)
+                            started.append(replacement)
+                        teardown(worker)
+                        worker = replacement
+                    return {'name': unit['name'], 'date': unit['date'].isoformat(), 'status': 'failed', 'error': str(e)}
+                finally:
+                    drivers.put(worker)
+
+            results = list(executor.map(process, units))
+    finally:
+        for worker in started:
+            try:
+                teardown(worker)
+            except Exception as e:
+                print(f"Could not close browser: {e}")
+
+    return results
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit('Usage: python scripts/batch_reports.py <manifest.json>')
+
+    try:
+        results = run_batch(load_manifest(sys.argv[1]))
+    finally:
+        write_run_report()
+
+    os.makedirs(BATCH_OUTPUT, exist_ok=True)
+    with open(os.path.join(BATCH_OUTPUT, 'batch_results.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"Batch finished: {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    if failed:
+        sys.exit(1)
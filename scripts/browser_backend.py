@@ -0,0 +1,134 @@
+"""
+Browsers the COVID Power BI Dashboard can be captured with
+
+Chrome and Edge are both Chromium, so they share one option list and the DevTools commands
+screenshots and the network policy rely on; a backend only knows how to launch its browser.
+"""
+
+import os
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.edge.options import Options as EdgeOptions
+
+from driver_provisioning import driver_service, tune_options
+from network_policy import apply_network_policy, configure_logging
+from tracing import span
+
+# Browser to log in with: 'chrome', 'edge', or 'race' to launch every RACE_BROWSERS at once
+# and keep whichever reaches the dashboard first
+REPORT_BROWSER = os.getenv('REPORT_BROWSER', 'chrome').lower()
+RACE_BROWSERS = [browser.strip() for browser in os.getenv('RACE_BROWSERS', 'chrome,edge').split(',') if browser.strip()]
+
+# Dashboards are rendered small; screenshots are scaled back up by SCREENSHOT_SCALE
+SCALE_FACTOR = 0.2
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+class BrowserBackend:
+    """
+    Launches one browser, configured for the COVID Power BI Dashboard
+    """
+
+    name = ''
+    options_class = ChromeOptions
+    webdriver_class = webdriver.Chrome
+
+    # Chromium only reads the last --enable-features/--disable-features switch, so each
+    # backend lists its features here and they are passed as one switch
+    enable_features = ()
+    disable_features = ('VizDisplayCompositor',)
+
+    def options(self):
+        """
+        Returns:
+            options (Options): Options shared by every backend, plus the backend's own features
+        """
+
+        options = self.options_class()
+        options.add_argument('--headless=new')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument(f"--force-device-scale-factor={SCALE_FACTOR}")
+        options.add_argument('--log-level=1')
+
+        # Additional options for GitHub Actions/CI environment
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-plugins')
+        options.add_argument('--disable-images')
+        options.add_argument('--disable-web-security')
+        options.add_argument('--allow-running-insecure-content')
+        options.add_argument('--window-size=1920,1080')
+        options.add_argument(f'--user-agent={USER_AGENT}')
+        if self.enable_features:
+            options.add_argument(f"--enable-features={','.join(self.enable_features)}")
+        if self.disable_features:
+            options.add_argument(f"--disable-features={','.join(self.disable_features)}")
+
+        # Authentication options for Windows Integrated Auth
+        options.add_argument('--auth-server-whitelist="*"')
+        options.add_argument('--auth-negotiate-delegate-whitelist="*"')
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+        configure_logging(options)
+
+        tune_options(options, self.name)
+        return options
+
+    def create_driver(self):
+        """
+        Returns:
+            driver (Selenium.WebDriver): WebDriver with no page loaded, behind the network policy
+        """
+
+        # Create webdriver with a cached driver, without Selenium Manager or the network
+        options = self.options()
+        with span('driver.launch', browser=self.name):
+            driver = self.webdriver_class(service=driver_service(self.name), options=options)
+
+        # Skip telemetry and other resources the visuals do not need
+        apply_network_policy(driver)
+        return driver
+
+class ChromeBackend(BrowserBackend):
+    name = 'chrome'
+
+class EdgeBackend(BrowserBackend):
+    """
+    Edge sometimes handles Windows Integrated Auth better than Chrome
+    """
+
+    name = 'edge'
+    options_class = EdgeOptions
+    webdriver_class = webdriver.Edge
+    enable_features = ('msImeMenu',)
+    disable_features = ('VizDisplayCompositor', 'TranslateUI')
+
+BACKENDS = {backend.name: backend for backend in (ChromeBackend(), EdgeBackend())}
+
+def get_backend(browser: str | None = None) -> BrowserBackend:
+    """
+    Args:
+        browser (String): 'chrome' or 'edge', defaults to REPORT_BROWSER; 'race' stands for the first of RACE_BROWSERS
+    Returns:
+        backend (BrowserBackend): Backend launching that browser
+    """
+
+    browser = (browser or REPORT_BROWSER).lower()
+    if browser == 'race':
+        browser = RACE_BROWSERS[0]
+    if browser not in BACKENDS:
+        raise ValueError(f"Unknown browser {browser!r}, expected one of {list(BACKENDS)} or 'race'")
+    return BACKENDS[browser]
+
+def driver_browser(driver) -> str:
+    """
+    Args:
+        driver (Selenium.WebDriver): Running WebDriver
+    Returns:
+        browser (String): Backend name of the driver's browser, so more browsers sharing its cookies match it
+    """
+
+    return 'edge' if driver.capabilities.get('browserName', '').lower() in ('msedge', 'microsoftedge') else 'chrome'
@@ -0,0 +1,85 @@
+import os
+import io
+import json
+import hashlib
+
+# Opt-in: where page fingerprints of the last published reports are kept
+CHANGE_INDEX = os.getenv('CHANGE_INDEX')
+
+def page_fingerprint(png: bytes) -> str:
+    """
+    Fingerprints the pixels of a screenshot, independent of how the PNG was compressed
+
+    A single changed digit on the dashboard changes the fingerprint, so an unchanged
+    fingerprint is safe to treat as an unchanged page.
+
+    Args:
+        png (bytes): PNG encoded screenshot
+    Returns:
+        fingerprint (String): Hex digest of the image size and RGB pixels
+    """
+
+    # Only imported when fingerprinting, so reading and recording the index stays light
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png)) as image:
+        rgb = image.convert('RGB')
+        digest = hashlib.sha256(f'{rgb.width}x{rgb.height}'.encode())
+        digest.update(rgb.tobytes())
+    return digest.hexdigest()
+
+class ChangeIndex:
+    """
+    Fingerprints of the pages last published to each destination, stored as JSON
+    """
+
+    def __init__(self, path: str | None = CHANGE_INDEX):
+        """
+        Args:
+            path (String): Location of the index file, None disables change detection
+        """
+
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def unchanged(self, key: str, fingerprints: list) -> bool:
+        """
+        Checks whether every page matches what was last published under a key
+
+        Args:
+            key (String): Report destination, such as a publish route name
+            fingerprints (list): Page fingerprints of the report, in page order
+        Returns:
+            unchanged (Boolean): True if the pages are identical to the last published ones
+        """
+
+        if not self.path:
+            return False
+
+        previous = self.entries.get(key, {})
+        return len(previous) == len(fingerprints) and all(
+            previous.get(str(page)) == fingerprint for page, fingerprint in enumerate(fingerprints, start=1)
+        )
+
+    def record(self, key: str, fingerprints: list) -> None:
+        """
+        Stores the page fingerprints of a report once it has been published, and saves the index
+
+        Args:
+            key (String): Report destination, such as a publish route name
+            fingerprints (list): Page fingerprints of the report, in page order
+        """
+
+        if not self.path:
+            return
+
+        self.entries[key] = {str(page): fingerprint for page, fingerprint in enumerate(fingerprints, start=1)}
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import datetime
+import threading
+
+from tracing import span
+
+# Where in-progress runs keep their screenshots, PDFs and manifest until they succeed
+RUN_DIR = os.getenv('RUN_DIR', 'runs')
+
+# Attempts after the first for each stage, e.g. "capture=2,build=1,upload=3", and the base delay between them
+STAGE_RETRIES = dict(
+    (stage.strip(), int(retries))
+    for stage, _, retries in (entry.partition('=') for entry in os.getenv('STAGE_RETRIES', 'capture=2,build=1,upload=3').split(','))
+    if stage.strip()
+)
+STAGE_BACKOFF = float(os.getenv('STAGE_BACKOFF', '5'))
+
+def bytes_sha256(content: bytes) -> str:
+    """
+    Args:
+        content (bytes): Content to hash
+    Returns:
+        digest (String): Hex SHA-256 of the content
+    """
+
+    return hashlib.sha256(content).hexdigest()
+
+class RunManifest:
+    """
+    Artifacts and stage status of one run, saved as manifest.json in the run directory after every change
+
+    Every artifact is recorded with the SHA-256 of its content, and only counts as done while
+    the file on disk still has that content.
+    """
+
+    def __init__(self, directory: str, data: dict):
+        """
+        Args:
+            directory (String): Run directory
+            data (dict): Parsed manifest
+        """
+
+        self.directory = directory
+        self.data = data
+
+        # Pages arrive from several capture threads at once
+        self._lock = threading.RLock()
+
+    @classmethod
+    def start(cls, routes: list, pages: list, root: str = RUN_DIR, resume: bool = False) -> 'RunManifest':
+        """
+        Opens the run of a set of routes, resuming its last unfinished run when asked to
+
+        Args:
+            routes (list): Publish routes of the run
+            pages (list): Pages the run is expected to capture, as 1-based indexes and/or report page names
+            root (String): Directory holding every run directory
+            resume (Boolean): Continue the last unfinished run of these routes instead of starting afresh
+        Returns:
+            manifest (RunManifest): Manifest of the new or resumed run
+        """
+
+        name = '-'.join(sorted(routes))
+        existing = sorted(
+            entry for entry in (os.listdir(root) if os.path.isdir(root) else [])
+            if entry.endswith(f'_{name}') and os.path.exists(os.path.join(root, entry, 'manifest.json'))
+        )
+
+        if resume and existing:
+            directory = os.path.join(root, existing[-1])
+            with open(os.path.join(directory, 'manifest.json')) as f:
+                manifest = cls(directory, json.load(f))
+            done = [stage for stage, state in manifest.data['stages'].items() if state['status'] == 'done']
+            print(f"Resuming run {directory}, finished stages: {done or 'none'}")
+            return manifest
+
+        if resume:
+            print(f"No unfinished run of {name} to resume, starting a new one")
+
+        # A new run replaces any unfinished run of the same routes
+        for entry in existing:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+        date = datetime.date.today()
+        directory = os.path.join(root, f'{date.isoformat()}_{name}')
+        os.makedirs(directory, exist_ok=True)
+        manifest = cls(directory, {
+            'date': date.isoformat(),
+            'routes': list(routes),
+            'expected_pages': list(pages),
+            'pages': {},
+            'documents': {},
+            'uploads': {},
+            'stages': {},
+        })
+        manifest.save()
+        return manifest
+
+    @property
+    def date(self) -> datetime.date:
+        return datetime.date.fromisoformat(self.data['date'])
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.directory, *parts)
+
+    def save(self) -> None:
+        """
+        Writes the manifest, atomically so an interrupted run never leaves it half written
+        """
+
+        with self._lock:
+            self.data['updated'] = round(time.time(), 3)
+            tmp_path = self.path('manifest.json.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp_path, self.path('manifest.json'))
+
+    def _intact(self, entry: dict | None) -> bool:
+        # The artifact exists and has not changed since it was recorded
+        if not entry or not os.path.exists(self.path(entry['file'])):
+            return False
+        with open(self.path(entry['file']), 'rb') as f:
+            return bytes_sha256(f.read()) == entry['sha256']
+
+    def missing_pages(self) -> list:
+        """
+        Returns:
+            positions (list): 0-based positions in expected_pages of the pages not captured intact yet
+        """
+
+        return [
+            position for position in range(len(self.data['expected_pages']))
+            if not self._intact(self.data['pages'].get(str(position)))
+        ]
+
+    def add_page(self, position: int, png: bytes, fingerprint: str, quality: dict | None = None) -> None:
+        """
+        Saves a captured page and records it
+
+        Args:
+            position (Integer): 0-based position of the page in expected_pages
+            png (bytes): PNG bytes of the screenshot
+            fingerprint (String): Pixel fingerprint of the screenshot, from page_fingerprint
+            quality (dict): Quality gate score of the page, when it was gated on its own
+        """
+
+        file = os.path.join('pages', f'{position + 1:02d}.png')
+        os.makedirs(self.path('pages'), exist_ok=True)
+        with open(self.path(file), 'wb') as f:
+            f.write(png)
+        with self._lock:
+            self.data['pages'][str(position)] = {'file': file, 'sha256': bytes_sha256(png), 'fingerprint': fingerprint}
+            if quality is not None:
+                self.data['pages'][str(position)]['quality'] = quality
+            self.save()
+
+    def set_quality(self, scores: list) -> None:
+        """
+        Records the quality gate score of every page
+
+        Args:
+            scores (list): Score of every page in page order, from gate_pages
+        """
+
+        with self._lock:
+            for position, score in enumerate(scores):
+                self.data['pages'][str(position)]['quality'] = score
+            self.save()
+
+    def screenshots(self) -> list:
+        """
+        Returns:
+            screenshots (list): PNG bytes of every captured page, in page order
+        """
+
+        screenshots = []
+        for position in range(len(self.data['expected_pages'])):
+            with open(self.path(self.data['pages'][str(position)]['file']), 'rb') as f:
+                screenshots.append(f.read())
+        return screenshots
+
+    def fingerprints(self) -> list:
+        """
+        Returns:
+            fingerprints (list): Pixel fingerprint of every captured page, in page order
+        """
+
+        return [self.data['pages'][str(position)]['fingerprint'] for position in range(len(self.data['expected_pages']))]
+
+    def document_key(self, pages: list, profiles: list) -> str:
+        """
+        Identifies the inputs of a document, so it is rebuilt whenever one of its pages is recaptured
+
+        Args:
+            pages (list): 0-based positions of the document's pages
+            profiles (list): PDF output profiles the document is built in
+        Returns:
+            key (String): Hex SHA-256 of the page hashes and profiles
+        """
+
+        inputs = [self.data['pages'][str(page)]['sha256'] for page in pages] + list(profiles)
+        return bytes_sha256('|'.join(inputs).encode())
+
+    def document_built(self, report: str, key: str) -> bool:
+        """
+        Args:
+            report (String): 'union' or 'daily'
+            key (String): Inputs of the document, from document_key
+        Returns:
+            built (Boolean): True if every file of the report was built from exactly these inputs and is intact
+        """
+
+        document = self.data['documents'].get(report)
+        return bool(document) and document['key'] == key and all(
+            self._intact({'file': file, 'sha256': sha256}) for file, sha256 in document['files'].items()
+        )
+
+    def add_document(self, report: str, key: str, filepaths: list) -> None:
+        """
+        Records the built PDFs of a report
+
+        Args:
+            report (String): 'union' or 'daily'
+            key (String): Inputs of the document, from document_key
+            filepaths (list): Paths of the PDFs, one per profile, the published one first
+        """
+
+        files = {}
+        for filepath in filepaths:
+            with open(filepath, 'rb') as f:
+                files[os.path.relpath(filepath, self.directory)] = bytes_sha256(f.read())
+        self.data['documents'][report] = {'key': key, 'files': files}
+        self.save()
+
+    def document_path(self, report: str) -> str:
+        """
+        Returns:
+            filepath (String): Path of the published PDF of a report
+        """
+
+        return self.path(next(iter(self.data['documents'][report]['files'])))
+
+    def document_sha256(self, report: str) -> str:
+        return next(iter(self.data['documents'][report]['files'].values()))
+
+    def uploaded(self, route: str, sha256: str) -> str | None:
+        """
+        Args:
+            route (String): Publish route
+            sha256 (String): Hash of the PDF the route publishes
+        Returns:
+            status (String): Upload status if this exact PDF already reached the route, otherwise None
+        """
+
+        upload = self.data['uploads'].get(route)
+        return upload['status'] if upload and upload['sha256'] == sha256 else None
+
+    def add_upload(self, route: str, sha256: str, remotepath: str, status: str) -> None:
+        self.data['uploads'][route] = {'sha256': sha256, 'remotepath': remotepath, 'status': status}
+        self.save()
+
+    def set_stage(self, stage: str, status: str, error: str | None = None) -> None:
+        state = self.data['stages'].setdefault(stage, {'attempts': 0})
+        state['status'] = status
+        state['error'] = error
+        if status == 'running':
+            state['attempts'] += 1
+        self.save()
+
+    def finish(self) -> None:
+        """
+        Deletes the run directory once every stage has succeeded
+        """
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def delete_reports() -> None:
+    """
+    Deletes 'reports' and 'screenshots' directories
+    """
+
+    if os.path.exists('reports'):
+        shutil.rmtree('reports', ignore_errors=True)
+    if os.path.exists('screenshots'):
+        shutil.rmtree('screenshots', ignore_errors=True)
+
+def run_stage(manifest: RunManifest, stage: str, func, retries: int | None = None, backoff: float = STAGE_BACKOFF):
+    """
+    Runs a stage of a checkpointed run, retrying it with exponential backoff
+
+    func should skip work the manifest already holds, so every retry only redoes what is missing.
+
+    Args:
+        manifest (RunManifest): Manifest of the run
+        stage (String): Stage name, such as 'capture', 'build' or 'upload'
+        func (Callable): Does the stage, taking no arguments
+        retries (Integer): Attempts after the first, defaults to the STAGE_RETRIES entry of the stage
+        backoff (Float): Seconds before the first retry, doubled after every failed retry
+    Returns:
+        result: Return value of func
+    """
+
+    retries = STAGE_RETRIES.get(stage, 0) if retries is None else retries
+    attempt = 0
+    while True:
+        manifest.set_stage(stage, 'running')
+        try:
+            with span(f'stage.{stage}', attempt=attempt + 1):
+                result = func()
+        except Exception as e:
+            manifest.set_stage(stage, 'failed', str(e))
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+            print(f"✗ Stage {stage} failed ({e}), retrying in {delay:.0f}s")
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        manifest.set_stage(stage, 'done')
+        return result
@@ -0,0 +1,177 @@
+"""
+Command line entry point for capturing, exporting, building, uploading and cleaning up the COVID reports
+
+Heavy dependencies are imported inside the subcommand that needs them: uploads and clean-up
+never load Selenium, PIL or NumPy, so they start in tens of milliseconds.
+
+    python scripts/covid_reports.py capture --output pages
+    python scripts/covid_reports.py build-pdf pages/*.png --reports daily
+    python scripts/covid_reports.py export --output reports
+    python scripts/covid_reports.py upload daily "reports/Daily COVID Report (10.17.2026).pdf"
+    python scripts/covid_reports.py publish daily union --resume
+    python scripts/covid_reports.py clean --runs
+    python scripts/covid_reports.py --importtime upload daily report.pdf
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import datetime
+import subprocess
+
+# Lines of python -X importtime: "import time: self [us] | cumulative | imported package"
+IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def capture(args) -> None:
+    from create_reports import capture_all_pages
+    from report_files import report_dates
+
+    _, date_short = report_dates()
+    screenshots = capture_all_pages(browser=args.browser)
+    os.makedirs(args.output, exist_ok=True)
+    for i, png in enumerate(screenshots, start=1):
+        with open(os.path.join(args.output, f'{date_short}_{i:02d}.png'), 'wb') as f:
+            f.write(png)
+    print(f"Saved {len(screenshots)} pages to {args.output}")
+
+def export(args) -> None:
+    from data_export import export_all_reports
+
+    report_filepaths = export_all_reports(browser=args.browser, output_dir=args.output)
+    for report, filepath in report_filepaths.items():
+        print(f"{report}: {filepath}")
+
+def build_pdf(args) -> None:
+    from report_files import save_reports
+
+    screenshots = []
+    for path in args.pages:
+        with open(path, 'rb') as f:
+            screenshots.append(f.read())
+    reports = tuple(report.strip() for report in args.reports.split(',') if report.strip())
+    report_filepaths = save_reports(screenshots, reports=reports, output_dir=args.output, date=args.date)
+    for report, filepath in report_filepaths.items():
+        print(f"{report}: {filepath}")
+
+def upload(args) -> None:
+    from publish_reports import ROUTES
+    from upload_report import get_publisher
+
+    folder = os.getenv(ROUTES[args.route]['folder_env'])
+    files = [(localpath, f'{folder}/{os.path.basename(localpath)}') for localpath in args.files]
+    results = get_publisher(os.getenv('REPORT_SITE_NAME')).publish(files)  # type: ignore
+    for remotepath, status in results.items():
+        print(f"{remotepath}: {status}")
+
+def publish(args) -> None:
+    from publish_reports import ROUTES, publish_reports
+
+    publish_reports(args.routes or list(ROUTES), resume=args.resume)
+
+def clean(args) -> None:
+    import shutil
+    from checkpoint import delete_reports, RUN_DIR
+    from upload_report import UPLOAD_STATE_DIR
+
+    delete_reports()
+    removed = ['reports', 'screenshots']
+    for enabled, directory in ((args.runs, RUN_DIR), (args.upload_state, UPLOAD_STATE_DIR)):
+        if enabled and os.path.exists(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+            removed.append(directory)
+    print(f"Removed {', '.join(removed)}")
+
+def parse_args(argv: list):
+    parser = argparse.ArgumentParser(prog='covid-reports', description='COVID Power BI reports')
+    parser.add_argument('--importtime', action='store_true', help='Report which imports the command spent its startup on')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('capture', help='Log in and save screenshots of the dashboard pages')
+    command.add_argument('--output', default='screenshots', help='Directory to save the PNG files to')
+    command.add_argument('--browser', choices=['chrome', 'edge', 'race'], help='Browser to log in with, defaults to REPORT_BROWSER')
+    command.set_defaults(func=capture)
+
+    command = commands.add_parser('export', help="Build the reports and CSV files from the visuals' data instead of screenshots")
+    command.add_argument('--browser', choices=['chrome', 'edge', 'race'], help='Browser to log in with, defaults to REPORT_BROWSER')
+    command.add_argument('--output', default='reports', help='Directory to write the PDFs and CSV files to')
+    command.set_defaults(func=export)
+
+    command = commands.add_parser('build-pdf', help='Build report PDFs from saved screenshots')
+    command.add_argument('pages', nargs='+', help='PNG files, in page order')
+    command.add_argument('--reports', default='union,daily', help="Reports to build, 'union' and/or 'daily'")
+    command.add_argument('--output', default='reports', help='Directory to write the PDFs to')
+    command.add_argument('--date', type=datetime.date.fromisoformat, help='Report date, YYYY-MM-DD, defaults to today')
+    command.set_defaults(func=build_pdf)
+
+    # Route names are validated when the command runs, so parsing stays free of imports
+    command = commands.add_parser('upload', help="Upload files to a route's SharePoint folder, skipping ones already there")
+    command.add_argument('route', help='Publish route, such as daily, union or weekend')
+    command.add_argument('files', nargs='+', help='Files to upload')
+    command.set_defaults(func=upload)
+
+    command = commands.add_parser('publish', help='Capture, build and upload the reports of some routes')
+    command.add_argument('routes', nargs='*', help='Publish routes, defaults to all of them')
+    command.add_argument('--resume', action='store_true', help='Finish the last failed run of these routes')
+    command.set_defaults(func=publish)
+
+    command = commands.add_parser('clean', help='Delete local reports and screenshots')
+    command.add_argument('--runs', action='store_true', help='Also delete unfinished checkpointed runs')
+    command.add_argument('--upload-state', action='store_true', help='Also delete the upload ledger and resumable upload sessions')
+    command.set_defaults(func=clean)
+
+    return parser.parse_args(argv)
+
+def importtime_report(argv: list) -> int:
+    """
+    Runs a command under python -X importtime and summarises where its startup went
+
+    Args:
+        argv (list): Command line without --importtime
+    Returns:
+        returncode (Integer): Exit status of the command
+    """
+
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), *argv],
+                             stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - start
+
+    packages = {}
+    modules = 0
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if line.startswith('import time: self'):
+            continue
+        if not match:
+            # Anything else the command wrote to stderr is passed on
+            print(line, file=sys.stderr)
+            continue
+        modules += 1
+        # Only top level imports, whose cumulative time includes everything they imported
+        if match.group(3) == ' ':
+            package = match.group(4).split('.')[0]
+            packages[package] = packages.get(package, 0) + int(match.group(2))
+
+    print(f"\nStartup imports: {modules} modules, {sum(packages.values()) / 1000:.1f} ms; command took {seconds * 1000:.0f} ms")
+    for package, microseconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:15]:
+        print(f"  {microseconds / 1000:8.1f} ms  {package}")
+    return process.returncode
+
+def main(argv: list | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.importtime:
+        return importtime_report([arg for arg in argv if arg != '--importtime'])
+
+    if args.command == 'upload':
+        from publish_reports import ROUTES
+        if args.route not in ROUTES:
+            sys.exit(f"Unknown route {args.route!r}, expected one of {list(ROUTES)}")
+
+    args.func(args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,72 +1,80 @@
 import os
-import datetime
 import time
+import base64
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Queue
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import TimeoutException
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
-from PIL import Image
+from browser_backend import driver_browser, get_backend, RACE_BROWSERS, REPORT_BROWSER
+from data_export import export_all_reports, CAPTURE_MODE
+from render_wait import wait_for_render, RenderTimeoutException
+from tracing import record, span
+from report_files import parse_pages, report_dates, save_reports, REPORT_PAGES
+from network_policy import record_network
+from session_cache import (
+    load_session, save_session, session_cache_enabled, session_is_valid, export_cookies, import_cookies, LOGIN_TIMEOUT,
+)
 
-# Dates for report naming
-curr_date = datetime.datetime.now()
-date_formatted = curr_date.strftime('%m.%d.%Y')
-date_short = curr_date.strftime('%m%d%y')
+# Number of browsers capturing a configured page list at once
+CAPTURE_CONCURRENCY = int(os.getenv('CAPTURE_CONCURRENCY', '3'))
 
-def setup_covid_bi():
+# Screenshots stay in memory; set SAVE_SCREENSHOTS to also write them to screenshots/ for debugging
+SAVE_SCREENSHOTS = bool(os.getenv('SAVE_SCREENSHOTS'))
+SCREENSHOT_SCALE = float(os.getenv('SCREENSHOT_SCALE', '1'))
+
+# Fullscreen "next page" button of the report viewer
+NEXT_PAGE_BUTTON = (By.XPATH, '//*[@data-testid="fullscreen-navigate-next-btn"]')
+
+def create_driver(browser: str | None = None):
     """
-    Creates a Chrome WebDriver for COVID Power BI Dashboard
+    Creates a WebDriver configured for the COVID Power BI Dashboard, without navigating
 
+    Args:
+        browser (String): 'chrome' or 'edge', defaults to REPORT_BROWSER
     Returns:
-        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard 
+        driver (Selenium.WebDriver): WebDriver with no page loaded
+    """
+
+    return get_backend(browser).create_driver()
+
+def open_dashboard(driver) -> None:
+    """
+    Navigates a new WebDriver to the COVID Power BI Dashboard, with the cached login session if there is one
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver with no page loaded
     """
 
-    # Set options for WebDriver
-    scale_factor = 0.2
-    options = Options()
-    options.add_argument('--headless=new')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument(f"--force-device-scale-factor={scale_factor}")
-    options.add_argument('--log-level=1')
-
-    # Additional options for GitHub Actions/CI environment
-    options.add_argument('--disable-gpu')
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-plugins')
-    options.add_argument('--disable-images')
-    options.add_argument('--disable-web-security')
-    options.add_argument('--allow-running-insecure-content')
-    options.add_argument('--disable-features=VizDisplayCompositor')
-    options.add_argument('--window-size=1920,1080')
-    options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-
-    # Authentication options for Windows Integrated Auth
-    options.add_argument('--auth-server-whitelist="*"')
-    options.add_argument('--auth-negotiate-delegate-whitelist="*"')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-
-    # Create webdriver
     covid_dash_link = os.getenv("COVID_DASH_LINK")
-    
-    try:
-        service = Service()
-        driver = webdriver.Chrome(service=service, options=options)
-    except:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
 
-    driver.get(covid_dash_link) # type: ignore
+    # Reuse a cached login session if one is configured
+    load_session(driver)
+
+    with span('navigate'):
+        driver.get(covid_dash_link) # type: ignore
+    record_network(driver, 'navigate')
     print(f"Navigated to: {driver.current_url}")
     print(driver.find_element(By.XPATH, "/html/body").text)
 
+def setup_covid_bi(browser: str | None = None):
+    """
+    Creates a WebDriver for COVID Power BI Dashboard
+
+    Args:
+        browser (String): 'chrome' or 'edge', defaults to REPORT_BROWSER
+    Returns:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard 
+    """
+
+    driver = create_driver(browser)
+    open_dashboard(driver)
+
     return driver
 
 def teardown(driver) -> None:
@@ -79,115 +87,248 @@ def teardown(driver) -> None:
     
     driver.quit()
 
-def powerbi_login(user: str):
+def spawn_driver(browser: str, cookies: list):
+    """
+    Starts one more browser sharing an exported login session
+
+    Args:
+        browser (String): 'chrome' or 'edge', matching the browser the cookies came from
+        cookies (list): Session cookies, from export_cookies
+    Returns:
+        driver (Selenium.WebDriver): WebDriver carrying the session, with no page loaded
+    """
+
+    driver = create_driver(browser)
+    try:
+        import_cookies(driver, cookies)
+    except Exception:
+        teardown(driver)
+        raise
+    return driver
+
+def spawn_drivers(browser: str, cookies: list, count: int) -> list:
+    """
+    Starts several browsers sharing an exported login session at once
+
+    Every spawn is waited for before any failure is raised, so no browser that did start is left running.
+
+    Args:
+        browser (String): 'chrome' or 'edge', matching the browser the cookies came from
+        cookies (list): Session cookies, from export_cookies
+        count (Integer): Number of browsers to start
+    Returns:
+        drivers (list): WebDrivers carrying the session
+    """
+
+    if count < 1:
+        return []
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(spawn_driver, browser, cookies) for _ in range(count)]
+
+    drivers, errors = [], []
+    for future in futures:
+        try:
+            drivers.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        print(f"✗ {len(errors)} of {count} browsers failed to start, closing the other {len(drivers)}")
+        for driver in drivers:
+            teardown(driver)
+        raise errors[0]
+    return drivers
+
+def authenticate(driver, user: str) -> None:
+    """
+    Signs in a WebDriver showing the dashboard link, unless its cached session is still valid
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, navigated
+        user (String): Username of login account
+    """
+
+    # Skip the login form entirely when the cached session is still valid
+    if session_cache_enabled():
+        with span('login.session_probe') as probe:
+            probe['valid'] = session_is_valid(driver)
+        if probe['valid']:
+            print('Cached session valid, skipping login')
+            return
+
+    sign_in(driver, user)
+
+def powerbi_login(user: str, browser: str | None = None):
     """
     Logs in to Microsoft Account to access COVID PowerBI Dashboard
     
     Args:
         user (String): Username of login account
+        browser (String): 'chrome', 'edge' or 'race', defaults to REPORT_BROWSER
     Returns:
         driver (Selenium.WebDriver): WebDriver for COVID Power BI Dashboard, logged in 
     """
 
+    if (browser or REPORT_BROWSER).lower() == 'race':
+        return race_login(user)
+
     # Create the webdriver
-    driver = setup_covid_bi()
-    wait = WebDriverWait(driver, 30)  # Increased timeout for CI environment
+    driver = setup_covid_bi(browser)
+
+    try:
+        authenticate(driver, user)
+    except Exception:
+        teardown(driver)
+        raise
+    
+    return driver
+
+def race_login(user: str, browsers: list = RACE_BROWSERS):
+    """
+    Logs in with several browsers at once and keeps the first one that reaches the dashboard
+
+    The other browsers are shut down as soon as there is a winner, which also ends their login attempts.
+
+    Args:
+        user (String): Username of login account
+        browsers (list): Backend names to race, such as ['chrome', 'edge']
+    Returns:
+        driver (Selenium.WebDriver): WebDriver for COVID Power BI Dashboard, logged in
+    """
+
+    # Open browsers of the race; whoever takes a browser out of here closes it
+    drivers = {}
+    winner = []
+    lock = threading.Lock()
+
+    def close(driver):
+        try:
+            teardown(driver)
+        except Exception:
+            pass
+
+    def attempt(browser):
+        start = time.perf_counter()
+        driver = create_driver(browser)
+        with lock:
+            if winner:
+                close(driver)
+                raise RuntimeError('another browser already won')
+            drivers[browser] = driver
+        try:
+            open_dashboard(driver)
+            authenticate(driver, user)
+            if not session_is_valid(driver):
+                raise RuntimeError(f'still not on the dashboard after login, at {driver.current_url}')
+        except Exception:
+            with lock:
+                owned = drivers.pop(browser, None) is not None
+            if owned:
+                close(driver)
+            raise
+        return driver, time.perf_counter() - start
+
+    print(f"Racing logins with {browsers}")
+    executor = ThreadPoolExecutor(max_workers=len(browsers))
+    futures = {executor.submit(attempt, browser): browser for browser in browsers}
+    errors = {}
+    try:
+        for future in as_completed(futures):
+            browser = futures[future]
+            try:
+                driver, seconds = future.result()
+            except Exception as e:
+                print(f"✗ {browser} login failed: {e}")
+                errors[browser] = str(e)
+                continue
+
+            with lock:
+                winner.append(browser)
+                losers = [drivers.pop(other) for other in list(drivers) if other != browser]
+            for other in losers:
+                close(other)
+            record('login.race', seconds, winner=browser, browser_count=len(browsers))
+            print(f"✓ {browser} reached the dashboard first, in {seconds:.1f}s")
+            return driver
+    finally:
+        # Losing attempts fail quickly once their browser is gone; nothing waits for them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    raise RuntimeError(f"No browser could log in: {errors}")
+
+def sign_in(driver, user: str) -> None:
+    """
+    Fills in the Microsoft login form a WebDriver was redirected to, and saves the new session
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver showing the login form
+        user (String): Username of login account
+    """
+
+    wait = WebDriverWait(driver, LOGIN_TIMEOUT)  # Increased timeout for CI environment
 
-    # Open the dashboard and log in with credentials
+    # Log in with credentials
     try:
         print("Waiting for login form...")
-        email_input = wait.until(EC.presence_of_element_located((By.NAME, 'loginfmt')))
-        email_input.clear()
-        email_input.send_keys(user)
-        print(f"Entered email: {user}")
-
-        next_btn = wait.until(EC.element_to_be_clickable((By.ID, 'idSIButton9')))
-        next_btn.click()
-        print("Clicked next button")
+        with span('login.email'):
+            email_input = wait.until(EC.presence_of_element_located((By.NAME, 'loginfmt')))
+            email_input.clear()
+            email_input.send_keys(user)
+            print(f"Entered email: {user}")
+
+            next_btn = wait.until(EC.element_to_be_clickable((By.ID, 'idSIButton9')))
+            next_btn.click()
+            print("Clicked next button")
         
-        # Wait for password field to appear
-        password_input = wait.until(EC.presence_of_element_located((By.NAME, 'passwd')))
-        password = os.getenv("METRO_PASSWORD")
-        
-        password_input.clear()
-        password_input.send_keys(password)  # type: ignore
-        print("Entered password")
-        
-        # Click sign in button
-        signin_btn = wait.until(EC.element_to_be_clickable((By.ID, 'idSIButton9')))
-        signin_btn.click()
-        print("Clicked sign in button")
+        with span('login.password'):
+            # Wait for password field to appear
+            password_input = wait.until(EC.presence_of_element_located((By.NAME, 'passwd')))
+            password = os.getenv("METRO_PASSWORD")
+            
+            password_input.clear()
+            password_input.send_keys(password)  # type: ignore
+            print("Entered password")
+            
+            # Click sign in button
+            signin_btn = wait.until(EC.element_to_be_clickable((By.ID, 'idSIButton9')))
+            signin_btn.click()
+            print("Clicked sign in button")
         
         # Handle "Stay signed in?" dialog if it appears
-        try:
-            stay_signed_in = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.ID, 'idSIButton9'))
-            )
-            stay_signed_in.click()
-            print("Clicked 'Stay signed in' button")
-        except TimeoutException:
-            print("No 'Stay signed in' dialog found, continuing...")
+        with span('login.stay_signed_in'):
+            try:
+                stay_signed_in = WebDriverWait(driver, 10).until(
+                    EC.element_to_be_clickable((By.ID, 'idSIButton9'))
+                )
+                stay_signed_in.click()
+                print("Clicked 'Stay signed in' button")
+            except TimeoutException:
+                print("No 'Stay signed in' dialog found, continuing...")
             
     except TimeoutException as e:
         print(f'Login timeout error: {e}')
         print(f'Current page source: {driver.page_source[:500]}...')
-        teardown(driver)
         raise
     except Exception as e:
         print(f'Login error: {e}')
         print(f'Current page source: {driver.page_source[:500]}...')
-        teardown(driver)
         raise
     
     print('Post login successful')
     print(f'Current URL: {driver.current_url}')
     print(driver.find_element(By.XPATH, "/html/body").text)
-    
-    return driver
 
-def screenshot_bi(driver) -> list:
+    save_session(driver)
+
+def open_fullscreen(driver, wait) -> None:
     """
-    Takes screenshots of first three pages of COVID PowerBI Dashboard, and saves them to a filepath
-    
+    Opens the current dashboard page in fullscreen through the View menu
+
     Args:
-        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in 
-    Returns:
-        img_filepaths (list): List of filepaths for COVID dashboard screenshots 
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in
+        wait (Selenium.WebDriverWait): Wait used to find the menu buttons
     """
 
-    # Get the webdriver and create the output directory
-    wait = WebDriverWait(driver, 20)
-    output_dir = 'screenshots'
-    os.makedirs(output_dir, exist_ok=True)
-
-    try:
-        os.makedirs(output_dir, exist_ok=True)
-        # Test write permissions
-        test_file = os.path.join(output_dir, 'test_write.txt')
-        with open(test_file, 'w') as f:
-            f.write('test')
-        os.remove(test_file)
-        print(f"✓ Directory created and writable: {os.path.abspath(output_dir)}")
-    except Exception as e:
-        print(f"✗ Directory creation/write test failed: {e}")
-        # Fallback to current directory
-        output_dir = '.'
-        print(f"Using current directory: {os.path.abspath(output_dir)}")
-
-    try:
-        current_url = driver.current_url
-        print(f"Driver status OK. Current URL: {current_url}")
-    except Exception as e:
-        print(f"✗ Driver appears to be dead: {e}")
-
-    try:
-        fullscreen_btn = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@data-testid="open-in-full-screen-btn"]')))
-        print("✓ Fullscreen button found")
-    except TimeoutException:
-        print("✗ Fullscreen button not found within timeout period")
-    except Exception as e:
-        print(f"✗ Error checking for fullscreen button: {e}")
-
     # Open the dashboard in fullscreen
     try:
         print("Looking for view menu button...")
@@ -205,77 +346,365 @@ def screenshot_bi(driver) -> list:
     except Exception as e:
         print(f"Error opening fullscreen: {e}")
         print("Attempting to take screenshots without fullscreen...")
+
+def capture_screenshot(driver, name: str, screenshot_dir: str = 'screenshots') -> bytes:
+    """
+    Captures the visible dashboard as PNG bytes through DevTools, without touching the disk
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in
+        name (String): Name of the screenshot, used for the optional debug file
+        screenshot_dir (String): Directory of the optional debug file
+    Returns:
+        png (bytes): PNG encoded screenshot of the viewport
+    """
+
+    with span('page.capture', page=name) as capture:
+        width, height = driver.execute_script('return [window.innerWidth, window.innerHeight];')
+        result = driver.execute_cdp_cmd('Page.captureScreenshot', {
+            'format': 'png',
+            'clip': {'x': 0, 'y': 0, 'width': width, 'height': height, 'scale': SCREENSHOT_SCALE},
+        })
+        png = base64.b64decode(result['data'])
+        capture['bytes'] = len(png)
+
+    # Optional debug artifact
+    if SAVE_SCREENSHOTS:
+        os.makedirs(screenshot_dir, exist_ok=True)
+        with open(os.path.join(screenshot_dir, f'{name}.png'), 'wb') as f:
+            f.write(png)
+
+    print(f"Captured screenshot {name} ({len(png)} bytes)")
+    return png
+
+def screenshot_bi(driver, on_capture=None, keep_driver: bool = False) -> list:
+    """
+    Takes screenshots of first three pages of COVID PowerBI Dashboard
     
-    # Wait for the report to fullscreen
-    time.sleep(5)
-    img_filepaths = ['screenshots/' + date_short + '_0' + str(i) + '.png' for i in range(1, 4)]
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in 
+        on_capture (Callable): Called with the 0-based page index and PNG bytes as soon as each page is captured
+        keep_driver (Boolean): Leave the WebDriver open afterwards instead of tearing it down
+    Returns:
+        screenshots (list): PNG bytes of the COVID dashboard screenshots, in page order
+    """
+
+    # Get the webdriver
+    wait = WebDriverWait(driver, 20)
 
-    # Take screenshots of the first 3 pages of the dashboard
     try:
-        print("Looking for navigation buttons...")
-        next_btn = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@data-testid="fullscreen-navigate-next-btn"]')))
-        print("Taking screenshot of page 1...")
-        driver.save_screenshot(img_filepaths[0])
-        print(f"Saved screenshot to: {img_filepaths[0]}")
-
-        print("Navigating to page 2...")
-        next_btn.click()
-        time.sleep(5)  # Increased wait time for CI
-        print("Taking screenshot of page 2...")
-        driver.save_screenshot(img_filepaths[1])
-        print(f"Saved screenshot to: {img_filepaths[1]}")
-
-        print("Navigating to page 3...")
-        next_btn.click()
-        time.sleep(5)  # Increased wait time for CI
-        print("Taking screenshot of page 3...")
-        driver.save_screenshot(img_filepaths[2])
-        print(f"Saved screenshot to: {img_filepaths[2]}")
-    except TimeoutException as e:
-        print(f"Timeout waiting for navigation elements: {e}")
-        print("Taking single screenshot of current page...")
-        driver.save_screenshot(img_filepaths[0])
+        current_url = driver.current_url
+        print(f"Driver status OK. Current URL: {current_url}")
+    except Exception as e:
+        print(f"✗ Driver appears to be dead: {e}")
+
+    try:
+        wait.until(EC.presence_of_element_located((By.XPATH, '//*[@data-testid="open-in-full-screen-btn"]')))
+        print("✓ Fullscreen button found")
+    except TimeoutException:
+        print("✗ Fullscreen button not found within timeout period")
     except Exception as e:
-        print(f"Error taking screenshots: {e}")
-        print("Taking single screenshot of current page...")
-        driver.save_screenshot(img_filepaths[0])
+        print(f"✗ Error checking for fullscreen button: {e}")
+
+    open_fullscreen(driver, wait)
+
+    _, date_short = report_dates()
+    img_names = [date_short + '_0' + str(i) for i in range(1, 4)]
+    screenshots = []
 
-    teardown(driver)
-    return img_filepaths
+    def captured(index):
+        png = capture_screenshot(driver, img_names[index])
+        screenshots.append(png)
+        if on_capture:
+            on_capture(index, png)
 
-def save_reports(img_filepaths: list) -> None:
+    # Take screenshots of the first 3 pages of the dashboard once each has rendered
+    try:
+        try:
+            wait_for_render(driver, 'page 1')
+            print("Looking for navigation buttons...")
+            next_btn = wait.until(EC.element_to_be_clickable(NEXT_PAGE_BUTTON))
+            print("Taking screenshot of page 1...")
+            captured(0)
+
+            print("Navigating to page 2...")
+            next_btn.click()
+            wait_for_render(driver, 'page 2')
+            print("Taking screenshot of page 2...")
+            captured(1)
+
+            print("Navigating to page 3...")
+            next_btn.click()
+            wait_for_render(driver, 'page 3')
+            print("Taking screenshot of page 3...")
+            captured(2)
+        except RenderTimeoutException as e:
+            # Never fall back to a screenshot of a page that is still loading
+            print(f"Render timeout, not saving partially loaded page: {e}")
+            raise
+        except TimeoutException as e:
+            print(f"Timeout waiting for navigation elements: {e}")
+            if not screenshots:
+                print("Taking single screenshot of current page...")
+                captured(0)
+        except WebDriverException as e:
+            # Only browser errors fall back; errors from on_capture and the quality gate are raised
+            print(f"Error taking screenshots: {e}")
+            if not screenshots:
+                print("Taking single screenshot of current page...")
+                captured(0)
+    finally:
+        if not keep_driver:
+            teardown(driver)
+
+    return screenshots
+
+def _report_path(path: str) -> tuple:
+    # Service URLs carry the open page after the report id: /groups/<group>/reports/<report>/<page>
+    parts = path.split('/')
+    if 'reports' in parts and len(parts) > parts.index('reports') + 2 and parts[parts.index('reports') + 2]:
+        return '/'.join(parts[:parts.index('reports') + 2]), parts[parts.index('reports') + 2]
+    return path, None
+
+def page_url(report_url: str, page) -> str:
+    """
+    Builds the URL that opens a report on a given page
+
+    Args:
+        report_url (String): URL of the report
+        page (int | str): 1-based page index, or report page name
+    Returns:
+        url (String): Report URL opening the named page, or with no page at all for a page index,
+            so the "next" clicks count from the first page
+    """
+
+    parsed = urllib.parse.urlparse(report_url)
+    query = dict(urllib.parse.parse_qsl(parsed.query))
+    path, current = _report_path(parsed.path)
+    query.pop('pageName', None)
+    if not isinstance(page, int):
+        # Keep the form of the link: a page segment in the path, otherwise the pageName parameter
+        if current:
+            path = f'{path}/{page}'
+        else:
+            query['pageName'] = page
+    return urllib.parse.urlunparse(parsed._replace(path=path, query=urllib.parse.urlencode(query)))
+
+def url_page_name(url: str) -> str | None:
     """
-    Takes dashboard screenshots and converts them into pre-outlined report formats
-    
     Args:
-        img_filepaths (list): List of filepaths for COVID dashboard screenshots
+        url (String): URL of an open report
+    Returns:
+        page (String): Name of the page the URL shows, or None if it names none
+    """
+
+    parsed = urllib.parse.urlparse(url)
+    return dict(urllib.parse.parse_qsl(parsed.query)).get('pageName') or _report_path(parsed.path)[1]
+
+def resolve_page_names(driver, report_url: str, pages: list) -> list:
+    """
+    Replaces page indexes with report page names, so every page can be opened directly
+
+    The viewer keeps the open page's name in its URL. The report is opened once and stepped through
+    with the fullscreen "next" button up to the deepest index, reading each name as the URL changes;
+    no page is waited on to render.
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver carrying the logged in session
+        report_url (String): URL of the report, such as COVID_DASH_LINK
+        pages (list): 1-based page indexes and/or report page names
+    Returns:
+        pages (list): Report page names, in the same order
+    """
+
+    deepest = max((page for page in pages if isinstance(page, int)), default=0)
+    if not deepest:
+        return list(pages)
+
+    wait = WebDriverWait(driver, 20)
+    with span('pages.resolve', count=deepest):
+        driver.get(page_url(report_url, 1))
+        open_fullscreen(driver, wait)
+        try:
+            names = [wait.until(lambda d: url_page_name(d.current_url))]
+            if deepest > 1:
+                next_btn = wait.until(EC.element_to_be_clickable(NEXT_PAGE_BUTTON))
+            while len(names) < deepest:
+                next_btn.click()
+                name = wait.until(lambda d: (name := url_page_name(d.current_url)) != names[-1] and name)
+                if name in names:
+                    raise ValueError(f"Page {deepest} was asked for, but the report only has {len(names)} pages")
+                names.append(name)
+        except TimeoutException:
+            raise RuntimeError("The report's page names cannot be read from its URL; list page names instead of indexes")
+
+    print(f"Resolved page indexes to names: {names}")
+    return [names[page - 1] if isinstance(page, int) else page for page in pages]
+
+def capture_page(driver, report_url: str, page, name: str, screenshot_dir: str = 'screenshots') -> bytes:
+    """
+    Opens one report page in fullscreen and screenshots it once it has rendered
+
+    A page index is resolved to its name first; callers capturing several pages should resolve
+    them all at once with resolve_page_names.
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver carrying the logged in session
+        report_url (String): URL of the report, such as COVID_DASH_LINK
+        page (int | str): 1-based page index, or report page name
+        name (String): Name of the screenshot
+        screenshot_dir (String): Directory of the optional debug file
+    Returns:
+        png (bytes): PNG encoded screenshot of the page
+    """
+
+    if isinstance(page, int):
+        page, = resolve_page_names(driver, report_url, [page])
+
+    wait = WebDriverWait(driver, 20)
+    driver.get(page_url(report_url, page))
+    open_fullscreen(driver, wait)
+    wait_for_render(driver, f'page {page}')
+
+    record_network(driver, f'page {page}')
+    return capture_screenshot(driver, name, screenshot_dir)
+
+def capture_in_order(driver, report_url: str, pages: list, names: list, screenshot_dir: str = 'screenshots') -> list:
+    """
+    Captures several report pages with one browser
+
+    Page indexes are captured in one fullscreen pass from the first page, like screenshot_bi, so each
+    page renders once; page names are opened directly.
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver carrying the logged in session
+        report_url (String): URL of the report, such as COVID_DASH_LINK
+        pages (list): 1-based page indexes and/or report page names
+        names (list): Name of the screenshot of every page
+        screenshot_dir (String): Directory of the optional debug files
+    Returns:
+        screenshots (list): PNG bytes of the screenshots, in the order of pages
+    """
+
+    screenshots = [None] * len(pages)
+    by_index = {}
+    for position, page in enumerate(pages):
+        if isinstance(page, int):
+            by_index.setdefault(page, []).append(position)
+        else:
+            screenshots[position] = capture_page(driver, report_url, page, names[position], screenshot_dir)
+
+    if by_index:
+        wait = WebDriverWait(driver, 20)
+        driver.get(page_url(report_url, 1))
+        open_fullscreen(driver, wait)
+        next_btn = None
+        for index in range(1, max(by_index) + 1):
+            if index > 1:
+                next_btn = next_btn or wait.until(EC.element_to_be_clickable(NEXT_PAGE_BUTTON))
+                next_btn.click()
+            wait_for_render(driver, f'page {index}')
+            if index in by_index:
+                # A page listed twice is captured once
+                positions = by_index[index]
+                record_network(driver, f'page {index}')
+                png = capture_screenshot(driver, names[positions[0]], screenshot_dir)
+                for position in positions:
+                    screenshots[position] = png
+    return screenshots
+
+def capture_pages(driver, pages: list, concurrency: int = CAPTURE_CONCURRENCY, on_capture=None, keep_driver: bool = False) -> list:
+    """
+    Captures several dashboard pages at once with a small pool of browsers sharing the login
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in
+        pages (list): 1-based page indexes and/or report page names to capture
+        concurrency (Integer): Maximum number of browsers capturing at the same time
+        on_capture (Callable): Called with the 0-based position in pages and PNG bytes as soon as each page is captured,
+            which may be out of order
+        keep_driver (Boolean): Leave the logged in WebDriver open afterwards; the extra browsers are always closed
+    Returns:
+        screenshots (list): PNG bytes of the screenshots, in page order
     """
 
-    print(os.listdir('screenshots'))
+    _, date_short = report_dates()
+    img_names = [f'{date_short}_{i:02d}' for i in range(1, len(pages) + 1)]
 
-    # Declare the output filepaths
-    output_dir = 'reports'
-    union_data_report_fp = os.path.join(output_dir, f'Union Data Report ({date_formatted}).pdf')
-    daily_covid_report_fp = os.path.join(output_dir, f'Daily COVID Report ({date_formatted}).pdf')
+    # Navigate from the dashboard link, not wherever the logged in driver was left
+    report_url = os.getenv("COVID_DASH_LINK") or driver.current_url
+    cookies = export_cookies(driver)
+    browser = driver_browser(driver)
+    pool_size = max(1, min(concurrency, len(pages)))
+
+    # The logged in driver is reused, the rest of the pool is started in parallel while it
+    # resolves the page indexes to names, so every browser opens its page directly
+    drivers = Queue()
+    drivers.put(driver)
+    workers = []
+    try:
+        with ThreadPoolExecutor(max_workers=1) as starter:
+            spawning = starter.submit(spawn_drivers, browser, cookies, pool_size - 1)
+            try:
+                pages = resolve_page_names(driver, report_url, pages)
+            finally:
+                workers = spawning.result()
+        for worker in workers:
+            drivers.put(worker)
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            print(f"Capturing {len(pages)} pages with {pool_size} browsers")
+
+            def capture(index, page, name):
+                page_driver = drivers.get()
+                try:
+                    png = capture_page(page_driver, report_url, page, name)
+                finally:
+                    drivers.put(page_driver)
+                if on_capture:
+                    on_capture(index, png)
+                return png
+
+            screenshots = list(executor.map(capture, range(len(pages)), pages, img_names))
+    finally:
+        for worker in workers if keep_driver else [driver] + workers:
+            teardown(worker)
+
+    return screenshots
+
+def capture_all_pages(on_capture=None, driver=None, browser: str | None = None) -> list:
+    """
+    Logs in to the COVID PowerBI Dashboard and captures every report page
 
-    # Create the output directory
-    os.makedirs(output_dir, exist_ok=True)
+    Args:
+        on_capture (Callable): Called with the 0-based page index and PNG bytes as soon as each page is captured
+        driver (Selenium.WebDriver): Logged in WebDriver showing the dashboard, reused and left open;
+            a new one is logged in and torn down when None
+        browser (String): Browser to log in with when no driver is given, 'chrome', 'edge' or 'race'
+    Returns:
+        screenshots (list): PNG bytes of the COVID dashboard screenshots, in page order
+    """
 
-    # Save the union data report
-    union_report = Image.open(img_filepaths[0])
-    union_report.convert('RGB').save(union_data_report_fp)
+    keep_driver = driver is not None
+    if driver is None:
+        user = os.getenv("METRO_EMAIL")
+        driver = powerbi_login(user, browser)  # type: ignore 
 
-    # Save the daily COVID report
-    daily_report = union_report.save(
-        daily_covid_report_fp, 'PDF', resolution=100, save_all=True, append_images=[Image.open(fp) for fp in img_filepaths[1:]]
-    )
+    # Capture a configured page list concurrently, otherwise the first three pages in order
+    if REPORT_PAGES:
+        return capture_pages(driver, parse_pages(REPORT_PAGES), on_capture=on_capture, keep_driver=keep_driver)
+    return screenshot_bi(driver, on_capture, keep_driver)
 
-def create_all_reports() -> None:
+def create_all_reports(browser: str | None = None) -> dict:
     """
     Creates and saves all daily reports relating to COVID-19
+
+    Args:
+        browser (String): Browser to log in with, 'chrome', 'edge' or 'race', defaults to REPORT_BROWSER
+    Returns:
+        report_filepaths (dict): Filepaths of the saved reports, keyed by 'union' and 'daily'
     """
 
-    user = os.getenv("METRO_EMAIL")
-    driver = powerbi_login(user)  # type: ignore 
-    image_filepaths = screenshot_bi(driver)
-    save_reports(image_filepaths)
\ No newline at end of file
+    # With CAPTURE_MODE=data the reports are drawn from the visuals' data instead of screenshots
+    if CAPTURE_MODE == 'data':
+        return export_all_reports(browser=browser)
+    return save_reports(capture_all_pages(browser=browser))
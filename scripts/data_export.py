@@ -0,0 +1,352 @@
+"""
+Data-export capture: pulls the data behind the dashboard visuals instead of screenshotting them
+
+The browser is only used to log in. Its session then queries the report's data endpoint for every
+visual listed in EXPORT_VISUALS, and the results are drawn as vector tables and charts into the
+report PDFs and written as CSV files. EXPORT_VISUALS is a JSON file such as:
+
+    {
+        "query_url": "https://wabi-us-gov-virginia-api.analysis.usgovcloudapi.net/explore/querydata",
+        "pages": {"1": "Cases", "2": "Vaccinations"},
+        "visuals": [
+            {"name": "cases_by_day", "title": "New cases by day", "page": 1, "kind": "bar",
+             "query": {"queries": [...], "modelId": 123}}
+        ]
+    }
+
+Each "query" is the request body the report viewer posts for that visual, as copied from the
+browser's network tab, and "kind" is 'table', 'bar' or 'line'.
+"""
+
+import os
+import csv
+import json
+import time
+import hashlib
+import datetime
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from report_files import report_dates, report_filepath, report_pages, REPORT_NAMES, REPORT_PROFILES
+from tracing import span
+
+# 'screenshot' captures the rendered pages, 'data' exports the visuals' data instead
+CAPTURE_MODE = os.getenv('CAPTURE_MODE', 'screenshot').lower()
+
+# Visuals to export, and the data endpoint overriding the query_url of that file
+EXPORT_VISUALS = os.getenv('EXPORT_VISUALS', 'export_visuals.json')
+EXPORT_QUERY_URL = os.getenv('EXPORT_QUERY_URL')
+
+# Query results are cached per visual, so reruns within EXPORT_CACHE_MINUTES send no queries; 0 turns the cache off
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', '.export_cache')
+EXPORT_CACHE_MINUTES = float(os.getenv('EXPORT_CACHE_MINUTES', '30'))
+
+# Visuals queried at once
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', '4'))
+
+VISUAL_KINDS = ('table', 'bar', 'line')
+
+# Value types of the query result format that need converting
+DSR_INTEGER, DSR_DATETIME = 4, 7
+
+class DataExportException(Exception):
+    """Raised when a visual's data cannot be queried or read"""
+
+def require_screenshot_mode(path: str) -> None:
+    """
+    Stops a path that only publishes screenshots from silently ignoring CAPTURE_MODE=data
+
+    Args:
+        path (String): Name of the publishing path, for the error message
+    """
+
+    if CAPTURE_MODE != 'screenshot':
+        raise ValueError(
+            f"CAPTURE_MODE={CAPTURE_MODE} is not supported by {path}, which publishes screenshots; "
+            "build data reports with create_all_reports or covid_reports.py export"
+        )
+
+def load_visuals(path: str = EXPORT_VISUALS) -> dict:
+    """
+    Reads and checks the list of visuals to export
+
+    Args:
+        path (String): JSON file of the visuals, as described at the top of this module
+    Returns:
+        spec (dict): 'query_url', 'pages' titles and 'visuals'
+    """
+
+    with open(path) as f:
+        spec = json.load(f)
+
+    if not spec.get('visuals'):
+        raise ValueError(f"{path} lists no visuals")
+    for visual in spec['visuals']:
+        missing = [key for key in ('name', 'page', 'kind', 'query') if key not in visual]
+        if missing:
+            raise ValueError(f"Visual {visual.get('name', '?')} in {path} is missing {missing}")
+        if visual['kind'] not in VISUAL_KINDS:
+            raise ValueError(f"Visual {visual['name']} has kind {visual['kind']!r}, expected one of {list(VISUAL_KINDS)}")
+    if not (EXPORT_QUERY_URL or spec.get('query_url')):
+        raise ValueError(f"Set EXPORT_QUERY_URL or query_url in {path}")
+
+    spec.setdefault('pages', {})
+    return spec
+
+def session_headers(driver, url: str) -> dict:
+    """
+    Builds request headers carrying a logged in browser's session
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in and showing the report
+        url (String): Data endpoint the headers are for
+    Returns:
+        headers (dict): JSON headers, with the endpoint's cookies and the report viewer's bearer token when it has one
+    """
+
+    from session_cache import export_cookies
+
+    host = urllib.parse.urlparse(url).hostname or ''
+    cookies = [
+        cookie for cookie in export_cookies(driver)
+        if host == cookie['domain'].lstrip('.') or host.endswith('.' + cookie['domain'].lstrip('.'))
+    ]
+
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    if cookies:
+        headers['Cookie'] = '; '.join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)
+
+    # The report viewer keeps the token it queries with in a page global
+    token = driver.execute_script('return window.powerBIAccessToken || null;')
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    return headers
+
+def _column_name(name: str) -> str:
+    # "Cases.Date" becomes "Date", aggregates such as "Sum(Cases.Count)" are kept whole
+    return name if '(' in name else name.rsplit('.', 1)[-1]
+
+def parse_dsr(response: dict) -> dict:
+    """
+    Reads a query result in the report viewer's compressed data shape format
+
+    Rows only carry the values that changed: bit i of 'R' repeats column i from the row before,
+    bit i of 'Ø' makes it empty, and 'C' holds the rest in order. Text columns with a 'DN' are
+    indexes into the ValueDicts.
+
+    Args:
+        response (dict): Parsed JSON response of a query
+    Returns:
+        table (dict): 'columns' names and 'rows' lists of values
+    """
+
+    try:
+        data = response['results'][0]['result']['data']
+        selects = {select['Value']: select.get('Name', select['Value']) for select in data['descriptor']['Select']}
+        dataset = data['dsr']['DS'][0]
+        entries = dataset['PH'][0]['DM0'] if dataset.get('PH') else []
+    except (KeyError, IndexError, TypeError) as e:
+        raise DataExportException(f"Unexpected query result: {e!r}")
+
+    value_dicts = dataset.get('ValueDicts', {})
+    schema, columns, rows, previous = [], [], [], []
+    for entry in entries:
+        if 'S' in entry:
+            schema = entry['S']
+            columns = [_column_name(selects.get(column['N'], column['N'])) for column in schema]
+            previous = [None] * len(schema)
+
+        repeat, empty = entry.get('R', 0), entry.get('Ø', 0)
+        values = iter(entry.get('C', []))
+        row = []
+        for index, column in enumerate(schema):
+            if repeat & (1 << index):
+                value = previous[index]
+            elif empty & (1 << index):
+                value = None
+            else:
+                value = next(values, None)
+                if 'DN' in column and isinstance(value, int):
+                    value = value_dicts[column['DN']][value]
+                elif column.get('T') == DSR_INTEGER and isinstance(value, str):
+                    value = int(value)
+                elif column.get('T') == DSR_DATETIME and value is not None:
+                    moment = datetime.datetime.fromtimestamp(int(value) / 1000, datetime.timezone.utc)
+                    value = moment.date() if moment.time() == datetime.time() else moment.replace(tzinfo=None)
+            row.append(value)
+        rows.append(row)
+        previous = row
+
+    return {'columns': columns, 'rows': rows}
+
+def _cache_path(cache_dir: str, url: str, query: dict) -> str:
+    # Keyed by day too, so a result cached before midnight never fills the next day's report
+    key = hashlib.sha256((datetime.date.today().isoformat() + url + json.dumps(query, sort_keys=True)).encode()).hexdigest()
+    return os.path.join(cache_dir, f'{key}.json')
+
+def query_visual(url: str, headers: dict, visual: dict, cache_dir: str | None = EXPORT_CACHE_DIR,
+                 max_age: float = EXPORT_CACHE_MINUTES * 60) -> dict:
+    """
+    Queries the data of one visual, from the cache while it is fresh
+
+    Args:
+        url (String): Data endpoint
+        headers (dict): Session headers, from session_headers
+        visual (dict): Visual from load_visuals
+        cache_dir (String): Directory of cached results, None to always query
+        max_age (Float): Seconds a cached result stays fresh
+    Returns:
+        table (dict): 'columns' names and 'rows' lists of values, from parse_dsr
+    """
+
+    cache_path = _cache_path(cache_dir, url, visual['query']) if cache_dir and max_age > 0 else None
+    with span('export.query', visual=visual['name']) as query:
+        if cache_path and os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < max_age:
+            with open(cache_path, 'rb') as f:
+                body = f.read()
+            query['cached'] = True
+        else:
+            request = urllib.request.Request(url, data=json.dumps(visual['query']).encode(), headers=headers, method='POST')
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    body = response.read()
+            except urllib.error.HTTPError as e:
+                raise DataExportException(f"Query for visual {visual['name']} failed with HTTP {e.code}")
+            except urllib.error.URLError as e:
+                raise DataExportException(f"Query for visual {visual['name']} failed: {e.reason}")
+            query['cached'] = False
+            if cache_path:
+                os.makedirs(cache_dir, exist_ok=True)  # type: ignore
+                with open(cache_path + '.tmp', 'wb') as f:
+                    f.write(body)
+                os.replace(cache_path + '.tmp', cache_path)
+
+        table = parse_dsr(json.loads(body))
+        query['bytes'] = len(body)
+        query['row_count'] = len(table['rows'])
+
+    # Visuals may rename the columns of their query
+    if visual.get('columns'):
+        table['columns'] = list(visual['columns'])
+    return table
+
+def export_tables(headers: dict, spec: dict, workers: int = EXPORT_WORKERS) -> list:
+    """
+    Queries every visual of a spec at once
+
+    Args:
+        headers (dict): Session headers, from session_headers
+        spec (dict): Visuals to export, from load_visuals
+        workers (Integer): Visuals queried at the same time
+    Returns:
+        visuals (list): Each visual of the spec with its 'table', in spec order
+    """
+
+    url = EXPORT_QUERY_URL or spec['query_url']
+    with span('export', visual_count=len(spec['visuals'])):
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            tables = list(executor.map(lambda visual: query_visual(url, headers, visual), spec['visuals']))
+    return [dict(visual, table=table) for visual, table in zip(spec['visuals'], tables)]
+
+def write_csv(visuals: list, output_dir: str = 'reports', date: datetime.date | None = None) -> list:
+    """
+    Writes the table of every visual as a CSV file
+
+    Args:
+        visuals (list): Visuals with their 'table', from export_tables
+        output_dir (String): Directory of the reports; the CSV files go to its 'data' directory
+        date (datetime.date): Date of the report, today when None
+    Returns:
+        filepaths (list): Paths of the CSV files, in visual order
+    """
+
+    date_formatted, _ = report_dates(date)
+    os.makedirs(os.path.join(output_dir, 'data'), exist_ok=True)
+    filepaths = []
+    for visual in visuals:
+        filepath = os.path.join(output_dir, 'data', f"{visual['name']} ({date_formatted}).csv")
+        with open(filepath, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(visual['table']['columns'])
+            for row in visual['table']['rows']:
+                writer.writerow(['' if value is None else value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+        filepaths.append(filepath)
+    return filepaths
+
+def save_data_reports(visuals: list, spec_pages: dict | None = None, reports: tuple = ('union', 'daily'),
+                      output_dir: str = 'reports', date: datetime.date | None = None, titles: dict | None = None) -> dict:
+    """
+    Draws exported visuals into the report PDFs and writes their CSV files
+
+    Dashboard pages are laid out as in save_reports: the union data report is the first page,
+    the daily report every page.
+
+    Args:
+        visuals (list): Visuals with their 'table', from export_tables
+        spec_pages (dict): Title of each dashboard page, keyed by page number as a string
+        reports (tuple): Reports to build, 'union' and/or 'daily'
+        output_dir (String): Directory the PDFs are written to
+        date (datetime.date): Date of the report, today when None
+        titles (dict): Report titles overriding REPORT_NAMES
+    Returns:
+        report_filepaths (dict): Filepaths of the built reports, keyed by 'union' and 'daily'
+    """
+
+    # The PDF drawing code is only imported here
+    from vector_pages import build_vector_document
+
+    os.makedirs(output_dir, exist_ok=True)
+    date_formatted, _ = report_dates(date)
+    pages = sorted({visual['page'] for visual in visuals})
+
+    report_filepaths = {}
+    for report in reports:
+        title = (titles or {}).get(report, REPORT_NAMES[report])
+        document = []
+        for position in report_pages(report, len(pages)):
+            page = pages[position]
+            page_title = (spec_pages or {}).get(str(page), f'Page {page}')
+            document.append((f'{title} ({date_formatted}) - {page_title}', [visual for visual in visuals if visual['page'] == page]))
+
+        # Vector pages look the same in every profile, so only the published file is built
+        filepath = report_filepath(report, REPORT_PROFILES[0], REPORT_PROFILES, output_dir, date, titles)
+        build_vector_document(filepath, document)
+        report_filepaths[report] = filepath
+
+    for filepath in write_csv(visuals, output_dir, date):
+        print(f"Wrote {filepath}")
+    return report_filepaths
+
+def export_all_reports(driver=None, browser: str | None = None, output_dir: str = 'reports') -> dict:
+    """
+    Logs in, exports the data of every visual and saves the reports built from it
+
+    The queries return what the dashboard shows now, so the reports are always dated today.
+
+    Args:
+        driver (Selenium.WebDriver): Logged in WebDriver showing the dashboard, left open;
+            a new one is logged in and torn down as soon as its session is read when None
+        browser (String): Browser to log in with when no driver is given, 'chrome', 'edge' or 'race'
+        output_dir (String): Directory the PDFs and CSV files are written to
+    Returns:
+        report_filepaths (dict): Filepaths of the built reports, keyed by 'union' and 'daily'
+    """
+
+    spec = load_visuals()
+    url = EXPORT_QUERY_URL or spec['query_url']
+
+    keep_driver = driver is not None
+    if driver is None:
+        from create_reports import powerbi_login
+        driver = powerbi_login(os.getenv('METRO_EMAIL'), browser)  # type: ignore
+    try:
+        headers = session_headers(driver, url)
+    finally:
+        # Nothing is rendered, so the browser is done once the session is read
+        if not keep_driver:
+            driver.quit()
+
+    visuals = export_tables(headers, spec)
+    return save_data_reports(visuals, spec['pages'], output_dir=output_dir)
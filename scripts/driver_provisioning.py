@@ -0,0 +1,311 @@
+"""
+Provisions browser drivers from a local cache keyed by browser major version
+
+A cached driver is found with a few file system checks, without Selenium Manager or the
+network, so launching a browser is a fixed, small cost. Pre-warm the cache when building
+an image or runner, and profile how long a browser takes to start:
+
+    python scripts/driver_provisioning.py prewarm chrome edge
+    python scripts/driver_provisioning.py profile chrome --url https://app.powerbi.com
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import threading
+import subprocess
+
+from tracing import span, spans
+
+# Where provisioned drivers and the version index are kept
+DRIVER_CACHE = os.getenv('DRIVER_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'covid-reports', 'drivers'))
+
+# Opt-in: start the browser with FAST_START_FLAGS, skipping background services a report run never uses
+BROWSER_FAST_START = bool(os.getenv('BROWSER_FAST_START'))
+
+FAST_START_FLAGS = (
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-client-side-phishing-detection',
+    '--disable-domain-reliability',
+    '--disable-breakpad',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--password-store=basic',
+    '--use-mock-keychain',
+)
+
+# Browser executables, in the order they are looked for, and the matching driver of each browser
+BROWSERS = {
+    'chrome': {
+        'binary_env': 'CHROME_BINARY',
+        'binaries': ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome'),
+        'paths': (
+            r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+            r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+            '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+        ),
+        'driver': 'chromedriver',
+    },
+    'edge': {
+        'binary_env': 'EDGE_BINARY',
+        'binaries': ('microsoft-edge', 'microsoft-edge-stable', 'msedge'),
+        'paths': (
+            r'C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe',
+            r'C:\Program Files\Microsoft\Edge\Application\msedge.exe',
+            '/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge',
+        ),
+        'driver': 'msedgedriver',
+    },
+}
+
+VERSION = re.compile(r'(\d+)\.(\d+)\.(\d+)\.(\d+)')
+
+# Browsers of a capture pool start at once, but the cache is filled by one of them
+_provision_lock = threading.Lock()
+
+def find_browser(browser: str) -> str | None:
+    """
+    Locates a browser executable
+
+    Args:
+        browser (String): 'chrome' or 'edge'
+    Returns:
+        path (String): Path of the executable, or None if the browser is not installed
+    """
+
+    config = BROWSERS[browser]
+    if os.getenv(config['binary_env']):
+        return os.getenv(config['binary_env'])
+    for name in config['binaries']:
+        path = shutil.which(name)
+        if path:
+            return os.path.realpath(path)
+    for path in config['paths']:
+        if os.path.isfile(path):
+            return path
+    return None
+
+def _index_path() -> str:
+    return os.path.join(DRIVER_CACHE, 'index.json')
+
+def _load_index() -> dict:
+    if os.path.exists(_index_path()):
+        with open(_index_path()) as f:
+            return json.load(f)
+    return {'browsers': {}, 'drivers': {}}
+
+def _save_index(index: dict) -> None:
+    os.makedirs(DRIVER_CACHE, exist_ok=True)
+    with open(_index_path() + '.tmp', 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(_index_path() + '.tmp', _index_path())
+
+def _run_version(path: str) -> str | None:
+    try:
+        output = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=30).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = VERSION.search(output)
+    return match.group(0) if match else None
+
+def browser_version(browser: str, binary: str, index: dict | None = None) -> str | None:
+    """
+    Reads the version of an installed browser, remembering it until the executable changes
+
+    Args:
+        browser (String): 'chrome' or 'edge'
+        binary (String): Path of the browser executable
+        index (dict): Loaded cache index, read from DRIVER_CACHE when None
+    Returns:
+        version (String): Full version such as '131.0.6778.85', or None if it cannot be read
+    """
+
+    index = index if index is not None else _load_index()
+    stat = os.stat(binary)
+    key = f'{browser}|{binary}|{stat.st_size}|{stat.st_mtime_ns}'
+    if key in index['browsers']:
+        return index['browsers'][key]
+
+    if platform.system() == 'Windows':
+        # chrome.exe --version prints nothing; the installer keeps a directory named after the version
+        versions = [entry for entry in os.listdir(os.path.dirname(binary)) if VERSION.fullmatch(entry)]
+        version = max(versions, key=lambda v: tuple(int(part) for part in v.split('.'))) if versions else None
+    else:
+        version = _run_version(binary)
+
+    if version:
+        index['browsers'][key] = version
+        _save_index(index)
+    return version
+
+def _download_driver(browser: str) -> str:
+    # The one step that needs the network; only runs when the cache has no driver for this major version
+    if browser == 'chrome':
+        from webdriver_manager.chrome import ChromeDriverManager
+        return ChromeDriverManager().install()
+    from webdriver_manager.microsoft import EdgeChromiumDriverManager
+    return EdgeChromiumDriverManager().install()
+
+def provision_driver(browser: str) -> str:
+    """
+    Returns a driver matching the installed browser, from the cache when possible
+
+    The cache is keyed by browser major version. On a miss, a matching driver on PATH is copied
+    into the cache, otherwise one is downloaded once with webdriver_manager.
+
+    Args:
+        browser (String): 'chrome' or 'edge'
+    Returns:
+        path (String): Path of the cached driver executable
+    """
+
+    binary = find_browser(browser)
+    if not binary:
+        raise FileNotFoundError(f"{browser} is not installed; set {BROWSERS[browser]['binary_env']} to its executable")
+
+    with _provision_lock:
+        return _provision(browser, binary)
+
+def _provision(browser: str, binary: str) -> str:
+    index = _load_index()
+    version = browser_version(browser, binary, index)
+    if not version:
+        raise RuntimeError(f"Could not read the version of {binary}")
+    major = version.split('.')[0]
+
+    cached = index['drivers'].get(f'{browser}|{major}')
+    if cached and os.access(cached['path'], os.X_OK):
+        return cached['path']
+
+    # Prefer a driver already installed next to the browser, if it matches
+    driver_name = BROWSERS[browser]['driver']
+    source = shutil.which(driver_name)
+    driver_version = _run_version(source) if source else None
+    if not driver_version or driver_version.split('.')[0] != major:
+        print(f"No {driver_name} for {browser} {major} in the cache, downloading one")
+        source = _download_driver(browser)
+        driver_version = _run_version(source)
+
+    suffix = '.exe' if platform.system() == 'Windows' else ''
+    path = os.path.join(DRIVER_CACHE, browser, major, driver_name + suffix)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    shutil.copy2(source, path)
+    os.chmod(path, 0o755)
+
+    index['drivers'][f'{browser}|{major}'] = {
+        'path': path, 'driver_version': driver_version, 'browser_version': version, 'provisioned': round(time.time()),
+    }
+    _save_index(index)
+    print(f"Cached {driver_name} {driver_version} for {browser} {version} at {path}")
+    return path
+
+def driver_service(browser: str = 'chrome'):
+    """
+    Creates the Selenium service of a browser, pointing at the cached driver so Selenium Manager is skipped
+
+    Falls back to Selenium's own driver discovery when the browser or its version cannot be found.
+
+    Args:
+        browser (String): 'chrome' or 'edge'
+    Returns:
+        service (Service): Chrome or Edge service, whose driver process start is recorded as 'driver.spawn'
+    """
+
+    if browser == 'chrome':
+        from selenium.webdriver.chrome.service import Service
+    else:
+        from selenium.webdriver.edge.service import Service
+
+    class TimedService(Service):
+        def start(self):
+            with span('driver.spawn', browser=browser):
+                super().start()
+
+    try:
+        with span('driver.provision', browser=browser):
+            return TimedService(executable_path=provision_driver(browser))
+    except Exception as e:
+        print(f"Could not provision {browser} driver from the cache, falling back to Selenium Manager: {e}")
+        return TimedService()
+
+def tune_options(options, browser: str = 'chrome') -> None:
+    """
+    Points options at the installed browser and, with BROWSER_FAST_START, adds FAST_START_FLAGS
+
+    Args:
+        options (Options): Chrome or Edge options of a WebDriver about to be created
+        browser (String): 'chrome' or 'edge'
+    """
+
+    binary = find_browser(browser)
+    if binary:
+        options.binary_location = binary
+    if BROWSER_FAST_START:
+        for flag in FAST_START_FLAGS:
+            if flag not in options.arguments:
+                options.add_argument(flag)
+
+def profile_startup(browser: str = 'chrome', url: str = 'about:blank') -> dict:
+    """
+    Launches a browser once and measures every step of its cold start
+
+    Args:
+        browser (String): 'chrome' or 'edge'
+        url (String): Page to load first
+    Returns:
+        profile (dict): Seconds to provision the driver, spawn its process, start the browser session and load the page
+    """
+
+    from browser_backend import get_backend
+
+    start = time.perf_counter()
+    driver = get_backend(browser).create_driver()
+    launched = time.perf_counter()
+    try:
+        with span('driver.first_get', url=url):
+            driver.get(url)
+        loaded = time.perf_counter()
+    finally:
+        driver.quit()
+
+    recorded = {entry['name']: entry['seconds'] for entry in spans()}
+    profile = {
+        'browser': browser,
+        'provision_seconds': recorded.get('driver.provision'),
+        'spawn_seconds': recorded.get('driver.spawn'),
+        'session_seconds': round(launched - start - recorded.get('driver.provision', 0) - recorded.get('driver.spawn', 0), 4),
+        'first_get_seconds': round(loaded - launched, 4),
+        'total_seconds': round(loaded - start, 4),
+    }
+    return profile
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Browser driver cache and cold start profile')
+    commands = parser.add_subparsers(dest='command', required=True)
+    prewarm = commands.add_parser('prewarm', help='Provision drivers into the cache, e.g. while building an image')
+    # argparse checks an empty nargs='*' list against choices as a whole, so browsers are checked below
+    prewarm.add_argument('browsers', nargs='*', help=f"Browsers to provision, some of {list(BROWSERS)}, defaults to chrome")
+    profile = commands.add_parser('profile', help='Measure how long a browser takes to start and load a page')
+    profile.add_argument('browser', nargs='?', default='chrome', choices=list(BROWSERS))
+    profile.add_argument('--url', default='about:blank', help='Page to load first')
+    args = parser.parse_args()
+
+    if args.command == 'prewarm':
+        unknown = [name for name in args.browsers if name not in BROWSERS]
+        if unknown:
+            parser.error(f"unknown browsers {unknown}, expected some of {list(BROWSERS)}")
+        for name in args.browsers or ['chrome']:
+            print(f"{name}: {provision_driver(name)}")
+    else:
+        print(json.dumps(profile_startup(args.browser, args.url), indent=2))
+    sys.exit(0)
@@ -0,0 +1,162 @@
+import os
+import json
+import fnmatch
+
+from tracing import record
+
+# Set NETWORK_POLICY=off to load every resource the dashboard asks for
+NETWORK_POLICY = os.getenv('NETWORK_POLICY', 'on').lower() not in ('off', '0', 'false', 'no')
+
+# Telemetry and analytics the Power BI viewer and Microsoft login pull in; none of it paints a visual
+DEFAULT_DENY = (
+    '*dc.services.visualstudio.com*',
+    '*.applicationinsights.azure.com*',
+    '*js.monitor.azure.com*',
+    '*browser.events.data.microsoft.com*',
+    '*mobile.events.data.microsoft.com*',
+    '*.aria.microsoft.com*',
+    '*google-analytics.com*',
+    '*googletagmanager.com*',
+    '*.clarity.ms*',
+)
+
+# URL patterns (Chrome wildcards, '*' only) never to load, replacing the defaults when set
+NETWORK_DENY = [pattern.strip() for pattern in os.getenv('NETWORK_DENY', ','.join(DEFAULT_DENY)).split(',') if pattern.strip()]
+
+# Resource types never to load, by file extension, e.g. "Media,Font"
+RESOURCE_TYPE_PATTERNS = {
+    'Font': ('*.woff', '*.woff?*', '*.woff2', '*.woff2?*', '*.ttf', '*.ttf?*', '*.otf', '*.otf?*', '*.eot', '*.eot?*'),
+    'Media': ('*.mp4', '*.mp4?*', '*.webm', '*.webm?*', '*.mp3', '*.mp3?*', '*.ogg', '*.ogg?*', '*.wav', '*.wav?*'),
+    'Image': ('*.png', '*.png?*', '*.jpg', '*.jpg?*', '*.jpeg', '*.jpeg?*', '*.gif', '*.gif?*', '*.webp', '*.webp?*', '*.ico', '*.ico?*'),
+}
+NETWORK_BLOCK_TYPES = [kind.strip() for kind in os.getenv('NETWORK_BLOCK_TYPES', 'Media').split(',') if kind.strip()]
+
+# Requests the dashboard needs; any of them being blocked is reported as a policy conflict
+NETWORK_ALLOW = [
+    pattern.strip() for pattern in os.getenv('NETWORK_ALLOW', '*.powerbi.com/*,*login.microsoftonline.com/*').split(',') if pattern.strip()
+]
+
+def blocked_patterns(deny: list = NETWORK_DENY, block_types: list = NETWORK_BLOCK_TYPES) -> list:
+    """
+    Lists the URL patterns the browser is told to block
+
+    Args:
+        deny (list): URL patterns to block
+        block_types (list): Resource types to block, keys of RESOURCE_TYPE_PATTERNS
+    Returns:
+        patterns (list): URL patterns for the DevTools Network.setBlockedURLs command
+    """
+
+    unknown = [kind for kind in block_types if kind not in RESOURCE_TYPE_PATTERNS]
+    if unknown:
+        raise ValueError(f"Unknown resource types to block: {unknown}, expected some of {list(RESOURCE_TYPE_PATTERNS)}")
+
+    patterns = list(deny)
+    for kind in block_types:
+        patterns += [pattern for pattern in RESOURCE_TYPE_PATTERNS[kind] if pattern not in patterns]
+    return patterns
+
+def configure_logging(options) -> None:
+    """
+    Turns on the browser's network log, which apply_network_policy's statistics are read from
+
+    Args:
+        options (Options): Chrome or Edge options of a WebDriver about to be created
+    """
+
+    if not NETWORK_POLICY:
+        return
+    # Logging preferences carry the driver's vendor prefix, 'goog' for Chrome and 'ms' for Edge
+    vendor = options.KEY.split(':')[0]
+    options.set_capability(f'{vendor}:loggingPrefs', {'performance': 'ALL'})
+    options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+
+def apply_network_policy(driver) -> list:
+    """
+    Blocks the configured URLs in a browser, for every page it loads from now on
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver to apply the policy to, before it navigates
+    Returns:
+        patterns (list): URL patterns being blocked, empty when NETWORK_POLICY is off
+    """
+
+    if not NETWORK_POLICY:
+        return []
+
+    patterns = blocked_patterns()
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    return patterns
+
+def network_stats(log: list) -> dict:
+    """
+    Summarises the requests in a network log
+
+    Blocked requests never download, so the bytes they would have cost are estimated from the
+    average size of the requests of the same type that did load.
+
+    Args:
+        log (list): Entries of the browser's performance log
+    Returns:
+        stats (dict): Request, blocked and conflict counts, bytes loaded and estimated bytes saved
+    """
+
+    requests, loaded, blocked = {}, {}, []
+    for entry in log:
+        message = json.loads(entry['message'])['message']
+        params = message.get('params', {})
+        if message['method'] == 'Network.requestWillBeSent':
+            requests[params['requestId']] = (params['request']['url'], params.get('type', 'Other'))
+        elif message['method'] == 'Network.loadingFinished':
+            loaded[params['requestId']] = params.get('encodedDataLength', 0)
+        elif message['method'] == 'Network.loadingFailed' and params.get('blockedReason') == 'inspector':
+            blocked.append(params['requestId'])
+
+    sizes = {}
+    for request_id, size in loaded.items():
+        _, kind = requests.get(request_id, ('', 'Other'))
+        sizes.setdefault(kind, []).append(size)
+    all_sizes = [size for kind_sizes in sizes.values() for size in kind_sizes]
+    overall = sum(all_sizes) / len(all_sizes) if all_sizes else 0
+
+    saved = 0.0
+    conflicts = []
+    for request_id in blocked:
+        url, kind = requests.get(request_id, ('', 'Other'))
+        kind_sizes = sizes.get(kind)
+        saved += sum(kind_sizes) / len(kind_sizes) if kind_sizes else overall
+        if any(fnmatch.fnmatchcase(url, pattern) for pattern in NETWORK_ALLOW):
+            conflicts.append(url)
+
+    return {
+        'requests': len(requests),
+        'blocked': len(blocked),
+        'conflicts': conflicts,
+        'loaded_bytes': sum(loaded.values()),
+        'saved_bytes': int(saved),
+    }
+
+def record_network(driver, stage: str) -> dict | None:
+    """
+    Records the requests a browser made since the last call as a network span of the run
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver the policy was applied to
+        stage (String): What the browser was loading, such as 'navigate' or 'page 2'
+    Returns:
+        stats (dict): Statistics from network_stats, or None when NETWORK_POLICY is off
+    """
+
+    if not NETWORK_POLICY:
+        return None
+
+    # Reading the log also clears it, so every request is counted once
+    stats = network_stats(driver.get_log('performance'))
+    for url in stats['conflicts']:
+        print(f"Network policy blocked a request the dashboard needs: {url}")
+    print(f"Network ({stage}): {stats['requests']} requests, {stats['blocked']} blocked, "
+          f"~{stats['saved_bytes'] / 1024:.0f} KB saved")
+    record('network', 0, stage=stage, request_count=stats['requests'], blocked_count=stats['blocked'],
+           loaded_bytes=stats['loaded_bytes'], saved_bytes=stats['saved_bytes'])
+    return stats
@@ -0,0 +1,351 @@
+import os
+import io
+import sys
+import time
+import zlib
+import threading
+from queue import Queue
+
+from PIL import Image
+
+from tracing import record
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Most decoded screenshots held in memory at once while building PDFs
+MAX_RESIDENT_PAGES = int(os.getenv('MAX_RESIDENT_PAGES', '2'))
+
+# Screenshots are laid out at this many pixels per inch at full size
+SOURCE_DPI = 100
+
+# Named PDF output profiles: page DPI, JPEG quality, palette size (Flate encoded instead of JPEG) and grayscale
+PDF_PROFILES = {
+    'standard': {'dpi': 100, 'quality': 75, 'colors': None, 'grayscale': False},
+    'archive': {'dpi': 100, 'quality': 95, 'colors': None, 'grayscale': False},
+    'email': {'dpi': 100, 'quality': None, 'colors': 64, 'grayscale': False},
+    'mobile': {'dpi': 60, 'quality': 50, 'colors': None, 'grayscale': False},
+    'print': {'dpi': 100, 'quality': 70, 'colors': None, 'grayscale': True},
+}
+
+def prepare_page(image: Image.Image, profile: str) -> Image.Image:
+    """
+    Converts a decoded screenshot to the resolution and colors of an output profile
+
+    Args:
+        image (PIL.Image): Decoded screenshot, RGB
+        profile (String): Name of a profile in PDF_PROFILES
+    Returns:
+        page (PIL.Image): Page image, RGB, L or P (palette)
+    """
+
+    settings = PDF_PROFILES[profile]
+
+    if settings['dpi'] != SOURCE_DPI:
+        scale = settings['dpi'] / SOURCE_DPI
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    if settings['grayscale']:
+        image = image.convert('L')
+    if settings['colors']:
+        # Dashboards are mostly flat colors, so a small palette compresses far better than JPEG
+        image = image.convert('RGB').quantize(settings['colors'], method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+
+    return image
+
+def validate_profiles(profiles) -> None:
+    """
+    Raises ValueError for profile names that are not in PDF_PROFILES
+
+    Args:
+        profiles (Iterable): Profile names
+    """
+
+    unknown = set(profiles) - set(PDF_PROFILES)
+    if unknown:
+        raise ValueError(f"Unknown PDF profiles: {sorted(unknown)}, expected some of {list(PDF_PROFILES)}")
+
+def profile_writer(filepath: str, profile: str) -> 'StreamingPdfWriter':
+    """
+    Opens a streaming PDF at the resolution and JPEG quality of an output profile
+
+    Args:
+        filepath (String): Path of the PDF to write
+        profile (String): Name of a profile in PDF_PROFILES
+    Returns:
+        writer (StreamingPdfWriter): Writer ready for pages prepared with prepare_page
+    """
+
+    settings = PDF_PROFILES[profile]
+    return StreamingPdfWriter(filepath, resolution=settings['dpi'], quality=settings['quality'])
+
+def peak_rss_mb() -> float | None:
+    """
+    Returns the peak resident set size of this process so far
+
+    It only ever grows and covers everything the process did, so it is no measure of a single document.
+
+    Returns:
+        peak_rss (Float): Peak RSS in megabytes, or None where it cannot be measured
+    """
+
+    if resource is None:
+        return None
+
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+class StreamingPdfWriter:
+    """
+    Writes a PDF of full-page images, or vector pages, one page at a time
+
+    Each page is encoded and written as soon as it is added, so only the object
+    offsets are kept in memory, no matter how many pages the document has.
+    """
+
+    def __init__(self, filepath: str, resolution: float = 100, quality: int | None = 75):
+        """
+        Args:
+            filepath (String): Path of the PDF to write
+            resolution (Float): Pixels per inch, sets the page size of each image
+            quality (Integer): JPEG quality of the embedded RGB and grayscale images
+        """
+
+        self.filepath = filepath
+        self.resolution = resolution
+        self.quality = quality
+        self.offsets = {}
+        self.page_refs = []
+        self.bytes_written = 0
+        self._fonts = None
+        self._next_id = 3  # 1 is the catalog, 2 is the page tree
+        self._file = open(filepath, 'wb')
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def _reserve(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id: int, body: bytes, stream: bytes | None = None) -> None:
+        self.offsets[obj_id] = self.bytes_written
+        self._write(f'{obj_id} 0 obj\n'.encode() + body)
+        if stream is not None:
+            self._write(b'\nstream\n' + stream + b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def add_page(self, image: Image.Image) -> None:
+        """
+        Encodes an image and writes it as the next page
+
+        Args:
+            image (PIL.Image): Decoded page, RGB, L or P
+        """
+
+        if image.mode not in ('RGB', 'L', 'P'):
+            image = image.convert('RGB')
+
+        # Palette images are Flate compressed, everything else is JPEG
+        if image.mode == 'P':
+            data = zlib.compress(image.tobytes(), 9)
+            palette = bytes(image.getpalette()[:3 * (image.getextrema()[1] + 1)])  # type: ignore
+            colorspace = f'[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]'
+            encoding = '/FlateDecode'
+        else:
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=self.quality or 75)
+            data = buffer.getvalue()
+            colorspace = '/DeviceRGB' if image.mode == 'RGB' else '/DeviceGray'
+            encoding = '/DCTDecode'
+
+        width, height = image.size
+        page_width = width * 72 / self.resolution
+        page_height = height * 72 / self.resolution
+
+        image_id, content_id, page_id = self._reserve(), self._reserve(), self._reserve()
+        self._write_object(image_id, (
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace {colorspace} /BitsPerComponent 8 /Filter {encoding} /Length {len(data)} >>'
+        ).encode(), data)
+
+        content = f'q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im0 Do Q'.encode()
+        self._write_object(content_id, f'<< /Length {len(content)} >>'.encode(), content)
+
+        self._write_object(page_id, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.2f} {page_height:.2f}] '
+            f'/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>'
+        ).encode())
+        self.page_refs.append(page_id)
+
+    def add_vector_page(self, content: bytes, width: float, height: float) -> None:
+        """
+        Writes a page drawn with PDF operators, such as a table or chart, as the next page
+
+        Args:
+            content (bytes): Content stream; text uses /F1 (Helvetica) and /F2 (Helvetica-Bold)
+            width (Float): Page width in points
+            height (Float): Page height in points
+        """
+
+        # The standard fonts are never embedded, so they are written once and shared by every page
+        if self._fonts is None:
+            self._fonts = {}
+            for name, base_font in (('F1', 'Helvetica'), ('F2', 'Helvetica-Bold')):
+                self._fonts[name] = self._reserve()
+                self._write_object(self._fonts[name], (
+                    f'<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} /Encoding /WinAnsiEncoding >>'
+                ).encode())
+        fonts = ' '.join(f'/{name} {font_id} 0 R' for name, font_id in self._fonts.items())
+
+        data = zlib.compress(content, 9)
+        content_id, page_id = self._reserve(), self._reserve()
+        self._write_object(content_id, f'<< /Length {len(data)} /Filter /FlateDecode >>'.encode(), data)
+        self._write_object(page_id, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] '
+            f'/Resources << /Font << {fonts} >> >> /Contents {content_id} 0 R >>'
+        ).encode())
+        self.page_refs.append(page_id)
+
+    def close(self) -> None:
+        """
+        Writes the page tree, cross-reference table and trailer, then closes the file
+        """
+
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.page_refs)
+        self._write_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_refs)} >>'.encode())
+
+        xref_offset = self.bytes_written
+        xref = [f'xref\n0 {self._next_id}\n', '0000000000 65535 f \n']
+        xref += [f'{self.offsets[obj_id]:010d} 00000 n \n' for obj_id in range(1, self._next_id)]
+        self._write(''.join(xref).encode())
+        self._write(f'trailer\n<< /Size {self._next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode())
+        self._file.close()
+
+class _SharedFrame:
+    """A decoded screenshot shared by every document that includes it"""
+
+    def __init__(self, image: Image.Image, users: int, on_release):
+        self.image = image
+        self._users = users
+        self._on_release = on_release
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def page(self, profile: str) -> Image.Image:
+        # Each profile is prepared once per screenshot, however many documents use it
+        with self._lock:
+            if profile not in self._pages:
+                self._pages[profile] = prepare_page(self.image, profile)
+            return self._pages[profile]
+
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            done = self._users == 0
+        if done:
+            for page in self._pages.values():
+                page.close()
+            self.image.close()
+            self._pages.clear()
+            self._on_release()
+
+def build_documents(screenshots: list, documents: dict, max_resident: int = MAX_RESIDENT_PAGES) -> dict:
+    """
+    Builds several PDFs at once from one decode of each screenshot
+
+    Screenshots are decoded one at a time, in page order, with at most max_resident
+    decoded pages in memory. Each document is encoded on its own thread, in its
+    own output profile.
+
+    Args:
+        screenshots (list): PNG bytes of the dashboard screenshots, in page order
+        documents (dict): Output filepath mapped to {'pages': 0-based screenshot indexes, 'profile': PDF_PROFILES name}
+        max_resident (Integer): Most decoded screenshots held in memory at once
+    Returns:
+        stats (dict): Output filepath mapped to its profile, pages, bytes, encode seconds and the process peak RSS so far
+    """
+
+    validate_profiles(document['profile'] for document in documents.values())
+
+    resident = threading.BoundedSemaphore(max(1, max_resident))
+    queues = {filepath: Queue() for filepath in documents}
+    stats = {}
+    errors = {}
+
+    def encode(filepath):
+        profile = documents[filepath]['profile']
+        writer = None
+        finished = False
+        # Only the encoding is timed, not the waits for the next decoded page
+        encode_seconds = 0.0
+        try:
+            writer = profile_writer(filepath, profile)
+            while (frame := queues[filepath].get()) is not None:
+                start = time.perf_counter()
+                try:
+                    writer.add_page(frame.page(profile))
+                finally:
+                    frame.release()
+                encode_seconds += time.perf_counter() - start
+            finished = True
+            start = time.perf_counter()
+            writer.close()
+            encode_seconds += time.perf_counter() - start
+        except Exception as e:
+            errors[filepath] = e
+            if writer is not None:
+                writer._file.close()
+            # Keep releasing frames so the other documents are not blocked
+            while not finished and (frame := queues[filepath].get()) is not None:
+                frame.release()
+            return
+
+        stats[filepath] = {
+            'profile': profile,
+            'pages': len(writer.page_refs),
+            'bytes': writer.bytes_written,
+            'encode_seconds': round(encode_seconds, 3),
+            'process_peak_rss_mb': peak_rss_mb(),
+        }
+        record('pdf.encode', stats[filepath]['encode_seconds'], document=os.path.basename(filepath),
+               profile=profile, pages=stats[filepath]['pages'], bytes=writer.bytes_written)
+
+    threads = [threading.Thread(target=encode, args=(filepath,)) for filepath in documents]
+    for thread in threads:
+        thread.start()
+
+    # Decode each screenshot once and hand it to every document that uses it
+    try:
+        for index, png in enumerate(screenshots):
+            users = [filepath for filepath, document in documents.items() if index in document['pages']]
+            if not users:
+                continue
+            resident.acquire()
+            image = Image.open(io.BytesIO(png)).convert('RGB')
+            frame = _SharedFrame(image, len(users), resident.release)
+            for filepath in users:
+                queues[filepath].put(frame)
+    finally:
+        for filepath in documents:
+            queues[filepath].put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise next(iter(errors.values()))
+
+    for filepath, doc_stats in stats.items():
+        peak = doc_stats['process_peak_rss_mb']
+        peak_text = f"{peak:.1f} MB" if peak is not None else 'n/a'
+        print(f"Built {filepath} ({doc_stats['profile']}): {doc_stats['pages']} pages, {doc_stats['bytes']} bytes "
+              f"in {doc_stats['encode_seconds']}s (process peak RSS {peak_text})")
+
+    return stats
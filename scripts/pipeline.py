@@ -0,0 +1,254 @@
+import io
+import os
+import sys
+import time
+import asyncio
+import itertools
+
+from PIL import Image
+
+from change_index import ChangeIndex, page_fingerprint
+from checkpoint import RunManifest
+from create_reports import capture_all_pages
+from data_export import require_screenshot_mode
+from pdf_builder import prepare_page, profile_writer, validate_profiles
+from publish_reports import ROUTES, delete_reports
+from quality_gate import gate_pages
+from report_files import configured_pages, report_filepath, report_pages, REPORT_PROFILES
+from tracing import record, write_run_report
+from upload_report import file_sha256, get_publisher
+
+class PageStream:
+    """
+    Screenshots handed from the capture thread to the asyncio stages as soon as each is taken
+    """
+
+    def __init__(self):
+        self.count = None
+        self.error = None
+        self._pages = {}
+
+    def _page(self, index: int) -> asyncio.Future:
+        if index not in self._pages:
+            self._pages[index] = asyncio.get_running_loop().create_future()
+        return self._pages[index]
+
+    def put(self, index: int, png: bytes) -> None:
+        # Runs on the event loop, scheduled from the capture thread
+        page = self._page(index)
+        if not page.done():
+            page.set_result(png)
+
+    def finish(self, count: int | None = None, error: BaseException | None = None) -> None:
+        """
+        Marks the capture as done, waking every stage still waiting for a page
+
+        Args:
+            count (Integer): Number of pages captured
+            error (Exception): Why the capture failed, if it did
+        """
+
+        self.count = count
+        self.error = error
+        for page in self._pages.values():
+            if not page.done():
+                page.set_result(None)
+
+    async def get(self, index: int) -> bytes | None:
+        """
+        Waits for a page
+
+        Args:
+            index (Integer): 0-based page index
+        Returns:
+            png (bytes): PNG bytes of the page, or None if the capture finished without it
+        """
+
+        if self.error:
+            raise self.error
+        if self.count is not None and index not in self._pages:
+            return None
+        png = await self._page(index)
+        if png is None and self.error:
+            raise self.error
+        return png
+
+def _add_screenshot(writer, png: bytes, profile: str) -> None:
+    with Image.open(io.BytesIO(png)) as image:
+        page = prepare_page(image.convert('RGB'), profile)
+        writer.add_page(page)
+        page.close()
+
+async def encode_document(stream: PageStream, filepath: str, pages: list | None, profile: str) -> list:
+    """
+    Encodes a PDF page by page while the remaining pages are still being captured
+
+    Args:
+        stream (PageStream): Captured screenshots
+        filepath (String): Path of the PDF to write
+        pages (list): 0-based page indexes of the document, None for every captured page
+        profile (String): PDF output profile
+    Returns:
+        pages (list): 0-based page indexes written to the document
+    """
+
+    loop = asyncio.get_running_loop()
+    writer = await loop.run_in_executor(None, profile_writer, filepath, profile)
+    written = []
+    encode_seconds = 0.0
+    try:
+        for index in pages if pages is not None else itertools.count():
+            png = await stream.get(index)
+            if png is None:
+                break
+            start = time.perf_counter()
+            await loop.run_in_executor(None, _add_screenshot, writer, png, profile)
+            encode_seconds += time.perf_counter() - start
+            written.append(index)
+        await loop.run_in_executor(None, writer.close)
+    except BaseException:
+        writer._file.close()
+        raise
+
+    record('pdf.encode', encode_seconds, document=os.path.basename(filepath), profile=profile,
+           pages=len(written), bytes=writer.bytes_written)
+    print(f"Built {filepath} ({profile}): {len(written)} pages, {writer.bytes_written} bytes "
+          f"in {encode_seconds:.3f}s of encoding")
+    return written
+
+async def publish_pipelined_async(routes: list) -> dict:
+    """
+    Captures, builds and uploads the reports as one pipeline
+
+    Each page is handed to the PDF encoders as soon as it is captured, and each report is
+    uploaded as soon as its own pages are encoded, so the union report (page 1 only) is
+    usually published before the last daily page has been captured. Selenium, PIL and
+    SharePoint calls run in the default executor; uploads go one at a time over the
+    shared SharePoint context.
+
+    Every page passes the quality gate before it is encoded, and the gated pages and
+    uploads are checkpointed like publish_reports does, so a failed run can be finished
+    with publish_reports and resume.
+
+    Args:
+        routes (list): Names of the routes in ROUTES to publish to
+    Returns:
+        statuses (dict): Route name mapped to 'unchanged', 'uploaded', 'skipped-identical' or 'replaced'
+    """
+
+    unknown = [route for route in routes if route not in ROUTES]
+    if unknown:
+        raise ValueError(f"Unknown report routes: {unknown}, expected some of {list(ROUTES)}")
+    require_screenshot_mode('the pipelined publish')
+    validate_profiles(REPORT_PROFILES)
+
+    loop = asyncio.get_running_loop()
+    site_path = os.getenv('REPORT_SITE_NAME')
+    reports = sorted({ROUTES[route]['report'] for route in routes})
+
+    # Declare paths to upload to and from; file names only depend on the date
+    uploads = {}
+    for route in routes:
+        localpath = report_filepath(ROUTES[route]['report'], REPORT_PROFILES[0])
+        uploads[route] = (localpath, f"{os.getenv(ROUTES[route]['folder_env'])}/{os.path.basename(localpath)}")
+
+    manifest = RunManifest.start(routes, configured_pages())
+    expected = manifest.data['expected_pages']
+
+    def recapture(index):
+        from create_reports import capture_pages, powerbi_login
+        return capture_pages(powerbi_login(os.getenv('METRO_EMAIL')), [expected[index]])  # type: ignore
+
+    def on_capture(index, png):
+        # Runs on the capture threads: never hand a blank or still loading page to the encoders,
+        # a page that keeps failing stops the capture and with it the pipeline
+        screenshots = [png]
+        score, = gate_pages(screenshots, lambda failing: recapture(index), labels=[f'page {expected[index]}'])
+        manifest.add_page(index, screenshots[0], page_fingerprint(screenshots[0]), score)
+        loop.call_soon_threadsafe(stream.put, index, screenshots[0])
+
+    # Capture on its own thread, streaming every page into the pipeline
+    stream = PageStream()
+    os.makedirs('reports', exist_ok=True)
+    capture = loop.run_in_executor(None, capture_all_pages, on_capture)
+    capture.add_done_callback(
+        lambda done: stream.finish(error=done.exception()) if done.exception() else stream.finish(count=len(done.result()))
+    )
+
+    # Sign in to SharePoint and look up the existing files while the dashboard loads
+    def lookup():
+        publisher = get_publisher(site_path)  # type: ignore
+        return publisher, publisher.remote_files([remotepath for _, remotepath in uploads.values()])
+    remote_lookup = loop.run_in_executor(None, lookup)
+
+    documents = {
+        (report, profile): asyncio.ensure_future(
+            encode_document(stream, report_filepath(report, profile), [0] if report == 'union' else None, profile)
+        )
+        for report in reports
+        for profile in REPORT_PROFILES
+    }
+
+    index = ChangeIndex()
+    upload_lock = asyncio.Lock()
+
+    async def publish_route(route):
+        localpath, remotepath = uploads[route]
+        pages = await documents[(ROUTES[route]['report'], REPORT_PROFILES[0])]
+        missing = [expected[page] for page in report_pages(ROUTES[route]['report'], len(expected)) if page not in pages]
+        if missing:
+            raise RuntimeError(f"Pages missing after capture: {missing}")
+        fingerprints = [await loop.run_in_executor(None, page_fingerprint, await stream.get(page)) for page in pages]
+        if index.unchanged(route, fingerprints):
+            print(f"{route} report unchanged since last publish, skipping upload")
+            return 'unchanged'
+
+        # The SharePoint context is not thread safe, so uploads are serialised
+        async with upload_lock:
+            publisher, remote = await remote_lookup
+            print(f"Uploading {route} report to: {remotepath}")
+            status = await loop.run_in_executor(None, publisher.upload_if_changed, localpath, remotepath, remote)
+            manifest.add_upload(route, await loop.run_in_executor(None, file_sha256, localpath), remotepath, status)
+            index.record(route, fingerprints)
+        return status
+
+    tasks = [asyncio.ensure_future(publish_route(route)) for route in routes]
+    try:
+        results = await asyncio.gather(*tasks, *documents.values())
+    except Exception:
+        print(f"Run stopped, its progress is kept in {manifest.directory}; "
+              f"finish it with publish_reports.py {' '.join(routes)} --resume")
+        raise
+    else:
+        manifest.finish()
+    finally:
+        for task in [*tasks, *documents.values()]:
+            task.cancel()
+        # Blocking calls cannot be interrupted, so let the browsers and uploads close first
+        await asyncio.gather(capture, remote_lookup, *tasks, *documents.values(), return_exceptions=True)
+
+    statuses = dict(zip(routes, results))
+    print(f"Publish status: {statuses}")
+    return statuses
+
+def publish_pipelined(routes: list) -> dict:
+    """
+    Creates all reports and uploads them to every requested SharePoint destination, overlapping the stages
+
+    Args:
+        routes (list): Names of the routes in ROUTES to publish to
+    Returns:
+        statuses (dict): Route name mapped to 'unchanged', 'uploaded', 'skipped-identical' or 'replaced'
+    """
+
+    try:
+        statuses = asyncio.run(publish_pipelined_async(routes))
+        # Delete local directories of reports; a failed run keeps them for the debugging artifacts
+        delete_reports()
+        return statuses
+    finally:
+        write_run_report()
+
+if __name__ == '__main__':
+    # Publish to the routes given on the command line, or all of them
+    publish_pipelined(sys.argv[1:] or list(ROUTES))
@@ -0,0 +1,163 @@
+import os, sys
+
+from change_index import ChangeIndex, page_fingerprint
+from checkpoint import RunManifest, delete_reports, run_stage
+from data_export import require_screenshot_mode
+from report_files import configured_pages, report_filepath, report_pages, save_reports, REPORT_PROFILES
+from tracing import span, write_run_report
+
+# Selenium, PIL, NumPy and the SharePoint client are imported by the stages that use them,
+# so resuming a run that only has uploads left never loads the browser stack
+
+# SharePoint destinations: which report goes to which document library folder
+ROUTES = {
+    'daily': {'report': 'daily', 'folder_env': 'DAILY_REPORT_EXT'},
+    'union': {'report': 'union', 'folder_env': 'UNION_REPORT_EXT'},
+    'weekend': {'report': 'daily', 'folder_env': 'WEEKEND_REPORT_EXT'},
+}
+
+def publish_reports(routes: list, driver=None, resume: bool = False) -> dict:
+    """
+    Creates all reports once and uploads them to every requested SharePoint destination
+
+    Routes whose pages are identical to what was last published are neither rebuilt
+    nor uploaded, when a CHANGE_INDEX is configured.
+
+    Every captured page, built PDF and upload is checkpointed in a run directory under
+    RUN_DIR, and each stage is retried with backoff. A run that still fails keeps its
+    directory, so running again with resume only redoes the missing pages, PDFs and uploads.
+
+    Args:
+        routes (list): Names of the routes in ROUTES to publish to
+        driver (Selenium.WebDriver): Logged in WebDriver showing the dashboard to reuse and leave open,
+            such as the daemon's warm browser; a new one is logged in when None
+        resume (Boolean): Continue the last unfinished run of these routes instead of starting afresh
+    Returns:
+        statuses (dict): Route name mapped to 'unchanged', 'uploaded', 'skipped-identical' or 'replaced'
+    """
+
+    unknown = [route for route in routes if route not in ROUTES]
+    if unknown:
+        raise ValueError(f"Unknown report routes: {unknown}, expected some of {list(ROUTES)}")
+    require_screenshot_mode('publish_reports')
+
+    site_path = os.getenv('REPORT_SITE_NAME')
+    manifest = RunManifest.start(routes, configured_pages(), resume=resume)
+    expected = manifest.data['expected_pages']
+    reports_dir = manifest.path('reports')
+    index = ChangeIndex()
+    statuses = {}
+
+    def checkpoint(position, png):
+        manifest.add_page(position, png, page_fingerprint(png))
+
+    def capture_positions(positions):
+        from create_reports import capture_pages, powerbi_login
+        print(f"Capturing pages: {[expected[position] for position in positions]}")
+        page_driver = driver or powerbi_login(os.getenv('METRO_EMAIL'))  # type: ignore
+        capture_pages(
+            page_driver, [expected[position] for position in positions],
+            on_capture=lambda i, png: checkpoint(positions[i], png), keep_driver=driver is not None,
+        )
+        if manifest.missing_pages():
+            raise RuntimeError(f"Pages still missing after capture: {manifest.missing_pages()}")
+
+    def capture():
+        from create_reports import capture_all_pages
+        from quality_gate import gate_pages
+
+        missing = manifest.missing_pages()
+        if len(missing) == len(expected):
+            # Capture once for every route; pages it could not reach fail the stage, so the
+            # retry or a --resume run captures only those
+            capture_all_pages(checkpoint, driver=driver)
+            if manifest.missing_pages():
+                raise RuntimeError(f"Pages missing after capture: {[expected[position] for position in manifest.missing_pages()]}")
+        elif missing:
+            capture_positions(missing)
+
+        # Never publish a blank or still loading page
+        def recapture(positions):
+            capture_positions(positions)
+            screenshots = manifest.screenshots()
+            return [screenshots[position] for position in positions]
+
+        scores = gate_pages(manifest.screenshots(), recapture, labels=[f'page {page}' for page in expected])
+        manifest.set_quality(scores)
+
+    def build():
+        # Only build the reports that at least one route still needs, and that are not built from these pages yet
+        page_count = len(expected)
+        reports = sorted({ROUTES[route]['report'] for route in routes if route not in statuses})
+        keys = {report: manifest.document_key(report_pages(report, page_count), REPORT_PROFILES) for report in reports}
+        stale = tuple(report for report in reports if not manifest.document_built(report, keys[report]))
+        if not stale:
+            return
+
+        save_reports(manifest.screenshots(), reports=stale, output_dir=reports_dir, date=manifest.date)
+        for report in stale:
+            manifest.add_document(report, keys[report], [
+                report_filepath(report, profile, output_dir=reports_dir, date=manifest.date) for profile in REPORT_PROFILES
+            ])
+
+    def upload():
+        # Declare paths to upload to and from, skipping routes this run already delivered
+        uploads = {}
+        for route in routes:
+            if statuses.get(route) == 'unchanged':
+                continue
+            report = ROUTES[route]['report']
+            localpath, sha256 = manifest.document_path(report), manifest.document_sha256(report)
+            delivered = manifest.uploaded(route, sha256)
+            if delivered:
+                statuses[route] = delivered
+            else:
+                uploads[route] = (localpath, sha256, f"{os.getenv(ROUTES[route]['folder_env'])}/{os.path.basename(localpath)}")
+
+        # Upload reports to SharePoint, skipping files that already arrived in an earlier attempt
+        if uploads:
+            from upload_report import get_publisher
+            publisher = get_publisher(site_path)  # type: ignore
+            with span('upload.lookup', files=len(uploads)):
+                remote = publisher.remote_files([remotepath for _, _, remotepath in uploads.values()])
+            for route, (localpath, sha256, remotepath) in uploads.items():
+                print(f"Uploading {route} report to: {remotepath}")
+                statuses[route] = publisher.upload_if_changed(localpath, remotepath, remote)
+                manifest.add_upload(route, sha256, remotepath, statuses[route])
+                index.record(route, route_fingerprints[route])
+
+    # The run report is written even when a stage fails, so the failing stage shows up in it
+    try:
+        run_stage(manifest, 'capture', capture)
+
+        fingerprints = manifest.fingerprints()
+        route_fingerprints = {
+            route: [fingerprints[page] for page in report_pages(ROUTES[route]['report'], len(fingerprints))]
+            for route in routes
+        }
+        for route in routes:
+            # A route this run already uploaded keeps its upload status
+            if route not in manifest.data['uploads'] and index.unchanged(route, route_fingerprints[route]):
+                print(f"{route} report unchanged since last publish, skipping upload")
+                statuses[route] = 'unchanged'
+
+        run_stage(manifest, 'build', build)
+        run_stage(manifest, 'upload', upload)
+    except Exception:
+        print(f"Run stopped, its progress is kept in {manifest.directory}; run again with --resume to finish it")
+        raise
+    else:
+        manifest.finish()
+        # Delete local directories of reports; a failed run keeps them for the debugging artifacts
+        delete_reports()
+    finally:
+        write_run_report()
+
+    statuses = {route: statuses[route] for route in routes}
+    print(f"Publish status: {statuses}")
+    return statuses
+
+if __name__ == '__main__':
+    # Publish to the routes given on the command line, or all of them
+    args = [arg for arg in sys.argv[1:] if arg != '--resume']
+    publish_reports(args or list(ROUTES), resume='--resume' in sys.argv[1:])
@@ -0,0 +1,204 @@
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from tracing import record
+
+# Set QUALITY_GATE=off to publish screenshots without checking them
+QUALITY_GATE = os.getenv('QUALITY_GATE', 'on').lower() not in ('off', '0', 'false', 'no')
+
+# A page fails when its grey levels barely vary, or too little of it differs from the background
+QUALITY_MIN_STD = float(os.getenv('QUALITY_MIN_STD', '4'))
+QUALITY_MIN_CONTENT = float(os.getenv('QUALITY_MIN_CONTENT', '0.03'))
+
+# Optional directory of PNG crops, such as the loading spinner or an empty visual placeholder,
+# taken from screenshots at the same SCREENSHOT_SCALE; a page showing any of them fails
+QUALITY_TEMPLATES = os.getenv('QUALITY_TEMPLATES')
+QUALITY_MATCH = float(os.getenv('QUALITY_MATCH', '0.9'))
+
+# How many times failing pages are captured again before the run gives up
+QUALITY_RECAPTURES = int(os.getenv('QUALITY_RECAPTURES', '2'))
+
+# Pages are scored at a fraction of their size; the checks only need the overall layout
+SAMPLE_WIDTH = 480
+
+# Colour distance from the background below which a pixel counts as background
+BACKGROUND_TOLERANCE = 12
+
+class QualityGateException(Exception):
+    """Raised when pages still fail the quality gate after every recapture"""
+
+def _grey(image: Image.Image, factor: int) -> np.ndarray:
+    if factor > 1:
+        image = image.reduce(factor)
+    return np.asarray(image.convert('L'), dtype=np.float32)
+
+def load_templates(directory: str | None = QUALITY_TEMPLATES) -> dict:
+    """
+    Loads the spinner and placeholder templates pages are checked against
+
+    Args:
+        directory (String): Directory of PNG crops, None for no templates
+    Returns:
+        templates (dict): File name mapped to the full size greyscale template
+    """
+
+    templates = {}
+    if not directory:
+        return templates
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith('.png'):
+            with Image.open(os.path.join(directory, name)) as image:
+                templates[name] = image.convert('L').copy()
+    return templates
+
+def match_template(grey: np.ndarray, template: np.ndarray) -> float:
+    """
+    Finds the best normalised cross-correlation of a template anywhere in an image
+
+    The correlation is computed with FFTs and the window statistics with summed-area tables,
+    so the cost does not grow with the template size.
+
+    Args:
+        grey (np.ndarray): Greyscale image
+        template (np.ndarray): Greyscale template, smaller than the image
+    Returns:
+        score (Float): Best match, from -1 to 1; 0 when the template does not fit or is uniform
+    """
+
+    th, tw = template.shape
+    height, width = grey.shape
+    if th > height or tw > width:
+        return 0.0
+
+    template = template - template.mean()
+    template_norm = np.sqrt((template ** 2).sum())
+    if template_norm == 0:
+        return 0.0
+
+    # Correlation of the zero-mean template with every window of the image
+    shape = (height + th - 1, width + tw - 1)
+    correlation = np.fft.irfft2(np.fft.rfft2(grey, shape) * np.fft.rfft2(template[::-1, ::-1], shape), shape)
+    correlation = correlation[th - 1:height, tw - 1:width]
+
+    # Sum and sum of squares of every window, from summed-area tables
+    def window_sums(values):
+        table = np.pad(values, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+        return table[th:, tw:] - table[:-th, tw:] - table[th:, :-tw] + table[:-th, :-tw]
+
+    grey64 = grey.astype(np.float64)
+    sums = window_sums(grey64)
+    variance = window_sums(grey64 ** 2) - sums ** 2 / (th * tw)
+    denominator = np.sqrt(np.clip(variance, 0, None)) * template_norm
+
+    # Flat windows (grey level spread under 1) cannot match a non-uniform template, and
+    # would only divide rounding errors
+    flat = variance < th * tw
+    scores = np.where(flat, 0.0, correlation / np.where(flat, 1.0, denominator))
+    return float(np.clip(scores, -1, 1).max())
+
+def score_page(png: bytes, templates: dict | None = None) -> dict:
+    """
+    Scores whether a screenshot shows a rendered dashboard page
+
+    Args:
+        png (bytes): PNG encoded screenshot
+        templates (dict): Spinner and placeholder templates, from load_templates
+    Returns:
+        score (dict): Grey level spread ('std_score'), fraction of non-background pixels ('content_score'),
+            best template match ('template_score' and 'template'), 'passed' and the 'reasons' it failed
+    """
+
+    with Image.open(io.BytesIO(png)) as image:
+        image = image.convert('RGB')
+    factor = max(1, image.width // SAMPLE_WIDTH)
+    rgb = np.asarray(image.reduce(factor) if factor > 1 else image, dtype=np.int16)
+    grey = (rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).astype(np.float32)
+
+    # The background is the most common colour, quantised so JPEG-like noise and anti-aliasing fold into it
+    quantised = (rgb >> 3).reshape(-1, 3)
+    keys = (quantised[:, 0] << 10) | (quantised[:, 1] << 5) | quantised[:, 2]
+    background = np.bincount(keys).argmax()
+    background_rgb = (np.array([background >> 10, (background >> 5) & 31, background & 31]) << 3) + 4
+    distance = np.abs(rgb - background_rgb).max(axis=2)
+    content = float((distance > BACKGROUND_TOLERANCE).mean())
+    std = float(grey.std())
+
+    # Templates are small, so they are matched at twice the sampling resolution
+    best_template, best_match = None, 0.0
+    if templates:
+        match_factor = max(1, factor // 2)
+        fine = _grey(image, match_factor)
+        for name, template in templates.items():
+            if min(template.size) // match_factor < 4:
+                continue
+            match = match_template(fine, _grey(template, match_factor))
+            if match > best_match:
+                best_template, best_match = name, match
+
+    reasons = []
+    if std < QUALITY_MIN_STD:
+        reasons.append(f'near uniform (std {std:.1f})')
+    if content < QUALITY_MIN_CONTENT:
+        reasons.append(f'mostly background ({content:.1%} content)')
+    if best_match >= QUALITY_MATCH:
+        reasons.append(f'shows {best_template} (match {best_match:.2f})')
+
+    return {
+        'std_score': round(std, 2),
+        'content_score': round(content, 4),
+        'template_score': round(best_match, 3),
+        'template': best_template,
+        'passed': not reasons,
+        'reasons': reasons,
+    }
+
+def gate_pages(screenshots: list, recapture, retries: int = QUALITY_RECAPTURES, labels: list | None = None) -> list:
+    """
+    Checks every screenshot and captures the failing ones again until they pass
+
+    Args:
+        screenshots (list): PNG bytes of the pages, in page order; failing pages are replaced in place
+        recapture (Callable): Takes the 0-based indexes of failing pages and returns their new PNG bytes, in the same order
+        retries (Integer): Recaptures before giving up
+        labels (list): Page names for logging and the run report, defaults to 'page <n>'
+    Returns:
+        scores (list): Quality score of every page, from score_page
+    """
+
+    labels = labels or [f'page {index + 1}' for index in range(len(screenshots))]
+    if not QUALITY_GATE:
+        return [None] * len(screenshots)
+
+    templates = load_templates()
+    start = time.perf_counter()
+    scores = [score_page(png, templates) for png in screenshots]
+    seconds = time.perf_counter() - start
+
+    attempt = 0
+    while True:
+        failing = [index for index, score in enumerate(scores) if not score['passed']]
+        if not failing:
+            break
+        for index in failing:
+            print(f"✗ {labels[index]} failed the quality gate: {', '.join(scores[index]['reasons'])}")
+        if attempt == retries:
+            raise QualityGateException(f"Pages failed the quality gate after {retries} recaptures: {[labels[index] for index in failing]}")
+
+        attempt += 1
+        print(f"Recapturing {len(failing)} pages, attempt {attempt} of {retries}")
+        for index, png in zip(failing, recapture(failing)):
+            screenshots[index] = png
+            score_start = time.perf_counter()
+            scores[index] = score_page(png, templates)
+            seconds += time.perf_counter() - score_start
+
+    for label, score in zip(labels, scores):
+        record('quality', 0, page=label, std_score=score['std_score'], content_score=score['content_score'],
+               template_score=score['template_score'])
+    record('quality.check', seconds, pages=len(screenshots), recapture_count=attempt)
+    print(f"Quality gate passed for {len(screenshots)} pages in {seconds:.3f}s of checks")
+    return scores
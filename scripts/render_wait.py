@@ -0,0 +1,75 @@
+import os
+import time
+
+from selenium.common.exceptions import TimeoutException
+
+from tracing import record
+
+# Upper bound and DOM quiet period for a page to count as rendered
+RENDER_TIMEOUT = float(os.getenv('RENDER_TIMEOUT', '30'))
+RENDER_QUIET_MS = int(os.getenv('RENDER_QUIET_MS', '750'))
+
+# Runs inside the browser: resolves once visual containers exist, no loading
+# indicator is left on the page and the DOM has been quiet for quietMs
+RENDER_READY_JS = """
+const [timeoutMs, quietMs, done] = arguments;
+const VISUALS = 'visual-container, .visual-container, .visualContainer';
+const LOADING = '.powerbi-spinner, .spinner, .loading, .circle, [aria-busy="true"]';
+const start = performance.now();
+let lastMutation = start;
+
+const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+observer.observe(document.body, {subtree: true, childList: true, attributes: true, characterData: true});
+
+const poll = () => {
+    const now = performance.now();
+    const visuals = Array.from(document.querySelectorAll(VISUALS))
+        .filter(el => el.offsetWidth > 0 && el.offsetHeight > 0).length;
+    const loading = Array.from(document.querySelectorAll(LOADING))
+        .filter(el => el.offsetWidth > 0 || el.offsetHeight > 0).length;
+    const ready = visuals > 0 && loading === 0 && now - lastMutation >= quietMs;
+
+    if (ready || now - start >= timeoutMs) {
+        observer.disconnect();
+        done({ready: ready, elapsed: (now - start) / 1000, visuals: visuals, loading: loading});
+    } else {
+        setTimeout(poll, 100);
+    }
+};
+poll();
+"""
+
+class RenderTimeoutException(TimeoutException):
+    """Raised when a dashboard page is still loading after the render timeout"""
+
+def wait_for_render(driver, label: str = 'page', timeout: float | None = None, quiet_ms: int | None = None) -> float:
+    """
+    Waits until the current Power BI page has finished painting its visuals
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in
+        label (String): Name of the page, used for logging
+        timeout (Float): Upper bound in seconds, defaults to RENDER_TIMEOUT
+        quiet_ms (Integer): Milliseconds without DOM mutations, defaults to RENDER_QUIET_MS
+    Returns:
+        elapsed (Float): Seconds the page took to render
+    """
+
+    timeout = RENDER_TIMEOUT if timeout is None else timeout
+    quiet_ms = RENDER_QUIET_MS if quiet_ms is None else quiet_ms
+
+    # Give the script a little longer than the in-page timeout so it can report back
+    driver.set_script_timeout(timeout + 5)
+    start = time.perf_counter()
+    state = driver.execute_async_script(RENDER_READY_JS, int(timeout * 1000), quiet_ms)
+
+    if not state or not state.get('ready'):
+        elapsed = time.perf_counter() - start
+        record('page.render', elapsed, 'error', page=label)
+        print(f"✗ {label} not rendered after {elapsed:.2f}s: {state}")
+        raise RenderTimeoutException(f"{label} did not finish rendering within {timeout}s")
+
+    record('page.render', state['elapsed'], page=label, visuals=state['visuals'])
+
+    print(f"✓ {label} rendered in {state['elapsed']:.2f}s ({state['visuals']} visuals)")
+    return state['elapsed']
@@ -0,0 +1,387 @@
+"""
+Long-running report service: one warm, logged in browser publishing reports on a cron-style schedule
+
+The browser, driver and login are started once. The session is refreshed in the background,
+the browser is recycled after a number of runs or when its memory grows, and GET /healthz
+reports the state of the service.
+"""
+
+import os
+import sys
+import json
+import signal
+import datetime
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import tracing
+from browser_backend import REPORT_BROWSER
+from create_reports import create_driver, race_login, sign_in, teardown
+from data_export import require_screenshot_mode
+from network_policy import record_network
+from publish_reports import ROUTES, publish_reports
+from session_cache import load_session, session_is_valid
+
+# "routes=cron" entries separated by ';', e.g. "daily=0 7 * * 1-5; daily,union=0 7 * * 1"
+DAEMON_SCHEDULE = os.getenv('DAEMON_SCHEDULE', 'daily=0 7 * * 1-5; weekend=0 9 * * 6; union=0 8 * * 1')
+
+# Session refresh interval, browser recycling limits and health check port
+DAEMON_REFRESH_MINUTES = float(os.getenv('DAEMON_REFRESH_MINUTES', '30'))
+DAEMON_RECYCLE_RUNS = int(os.getenv('DAEMON_RECYCLE_RUNS', '20'))
+DAEMON_MAX_BROWSER_MB = float(os.getenv('DAEMON_MAX_BROWSER_MB', '1500'))
+DAEMON_HEALTH_PORT = int(os.getenv('DAEMON_HEALTH_PORT', '8081'))
+
+def parse_cron_field(field: str, low: int, high: int) -> set:
+    """
+    Expands one cron field, such as '*', '*/15', '1-5' or '0,30'
+
+    Args:
+        field (String): The field
+        low (Integer): Smallest allowed value
+        high (Integer): Largest allowed value
+    Returns:
+        values (set): Every value the field matches
+    """
+
+    values = set()
+    for part in field.split(','):
+        spec, _, step = part.partition('/')
+        if spec == '*':
+            start, end = low, high
+        elif '-' in spec:
+            start, end = (int(value) for value in spec.split('-', 1))
+        else:
+            start = end = int(spec)
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field {field!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+class CronSchedule:
+    """
+    Five-field cron expression: minute, hour, day of month, month and day of week (0 or 7 is Sunday)
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression {expression!r} must have 5 fields")
+
+        self.expression = expression
+        self.minutes = parse_cron_field(fields[0], 0, 59)
+        self.hours = parse_cron_field(fields[1], 0, 23)
+        self.days = parse_cron_field(fields[2], 1, 31)
+        self.months = parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in parse_cron_field(fields[4], 0, 7)}
+
+        # Like cron, a restricted day of month and day of week match when either one does
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, when: datetime.datetime) -> bool:
+        day = when.day in self.days
+        weekday = (when.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, when: datetime.datetime) -> datetime.datetime:
+        """
+        Finds the next time the schedule fires
+
+        Args:
+            when (datetime.datetime): Time to search from, exclusive
+        Returns:
+            next_run (datetime.datetime): First matching minute after when
+        """
+
+        candidate = when.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = candidate + datetime.timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = (candidate + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + datetime.timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += datetime.timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
+
+def parse_schedule(spec: str) -> dict:
+    """
+    Parses DAEMON_SCHEDULE
+
+    Args:
+        spec (String): "routes=cron" entries separated by ';', routes separated by ','
+    Returns:
+        schedule (dict): Job label mapped to (routes, CronSchedule)
+    """
+
+    schedule = {}
+    for entry in spec.split(';'):
+        if not entry.strip():
+            continue
+        label, _, expression = entry.partition('=')
+        routes = [route.strip() for route in label.split(',') if route.strip()]
+        unknown = [route for route in routes if route not in ROUTES]
+        if not routes or unknown:
+            raise ValueError(f"Schedule entry {entry.strip()!r} has unknown routes, expected some of {list(ROUTES)}")
+        schedule[','.join(routes)] = (routes, CronSchedule(expression.strip()))
+    return schedule
+
+class ReportDaemon:
+    """
+    Keeps one logged in browser warm and publishes the scheduled reports with it
+    """
+
+    def __init__(self, schedule: dict, refresh_minutes: float = DAEMON_REFRESH_MINUTES,
+                 recycle_runs: int = DAEMON_RECYCLE_RUNS, max_browser_mb: float = DAEMON_MAX_BROWSER_MB):
+        """
+        Args:
+            schedule (dict): Job label mapped to (routes, CronSchedule), from parse_schedule
+            refresh_minutes (Float): How often the idle browser's session is checked and renewed
+            recycle_runs (Integer): Runs after which the browser is restarted
+            max_browser_mb (Float): Browser memory above which it is restarted before the next run
+        """
+
+        self.schedule = schedule
+        self.refresh_minutes = refresh_minutes
+        self.recycle_runs = recycle_runs
+        self.max_browser_mb = max_browser_mb
+        self.driver = None
+
+        # Only one thing drives the browser at a time: a run, a refresh or a recycle
+        self._browser_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        now = datetime.datetime.now()
+        self.state = {
+            'started': now.isoformat(timespec='seconds'),
+            'browser_started': None,
+            'browser_ok': False,
+            'browser_mb': None,
+            'runs_since_recycle': 0,
+            'recycles': 0,
+            'last_refresh': None,
+            'last_error': None,
+            'jobs': {
+                label: {'routes': routes, 'cron': cron.expression, 'next_run': cron.next_after(now).isoformat(),
+                        'last_run': None, 'last_status': None}
+                for label, (routes, cron) in schedule.items()
+            },
+        }
+
+    def _ensure_session(self) -> None:
+        # Reload the dashboard, signing in again only if the session has expired
+        self.driver.get(os.getenv('COVID_DASH_LINK'))  # type: ignore
+        if not session_is_valid(self.driver):
+            print('Session expired, signing in again')
+            sign_in(self.driver, os.getenv('METRO_EMAIL'))  # type: ignore
+        record_network(self.driver, 'session refresh')
+        self.state['browser_ok'] = True
+        self.state['last_refresh'] = datetime.datetime.now().isoformat(timespec='seconds')
+
+    def _start_browser(self) -> None:
+        with tracing.span('daemon.start_browser'):
+            if REPORT_BROWSER == 'race':
+                # Every restart races again, so the daemon moves to whichever browser works now
+                self.driver = race_login(os.getenv('METRO_EMAIL'))  # type: ignore
+            else:
+                self.driver = create_driver()
+                load_session(self.driver)
+            self._ensure_session()
+        self.state['browser_started'] = datetime.datetime.now().isoformat(timespec='seconds')
+        self.state['runs_since_recycle'] = 0
+        print('Warm browser ready')
+
+    def _stop_browser(self) -> None:
+        if self.driver is not None:
+            try:
+                teardown(self.driver)
+            except Exception as e:
+                print(f"Could not close browser cleanly: {e}")
+        self.driver = None
+        self.state['browser_ok'] = False
+
+    def _recycle(self, reason: str) -> None:
+        print(f"Recycling browser: {reason}")
+        self._stop_browser()
+        self.state['recycles'] += 1
+        self._start_browser()
+
+    def browser_mb(self) -> float | None:
+        """
+        Returns:
+            rss (Float): Resident memory of the driver and browser processes in megabytes, or None if unknown
+        """
+
+        try:
+            rss = tracing.process_tree_rss(self.driver.service.process.pid)  # type: ignore
+        except AttributeError:
+            return None
+        return None if rss is None else rss / 1024 / 1024
+
+    def refresh(self) -> None:
+        """
+        Renews the session of the idle browser, restarting it if it stopped responding
+        """
+
+        # A running job keeps the session fresh itself
+        if not self._browser_lock.acquire(blocking=False):
+            return
+        try:
+            if self.driver is None:
+                self._start_browser()
+            else:
+                self._ensure_session()
+            self.state['browser_mb'] = self.browser_mb()
+        except Exception as e:
+            print(f"Session refresh failed: {e}")
+            self.state['last_error'] = f'refresh: {e}'
+            self.state['browser_ok'] = False
+            self._stop_browser()
+        finally:
+            self._browser_lock.release()
+
+    def run_job(self, label: str) -> dict | None:
+        """
+        Publishes the routes of one scheduled job with the warm browser
+
+        Args:
+            label (String): Job label in the schedule
+        Returns:
+            statuses (dict): Publish status of every route, or None if the run failed
+        """
+
+        routes, _ = self.schedule[label]
+        job_state = self.state['jobs'][label]
+        print(f"Running scheduled job {label} at {datetime.datetime.now():%Y-%m-%d %H:%M}")
+
+        with self._browser_lock:
+            statuses = None
+            try:
+                if self.driver is None:
+                    self._start_browser()
+                else:
+                    browser_mb = self.browser_mb()
+                    self.state['browser_mb'] = browser_mb
+                    if self.state['runs_since_recycle'] >= self.recycle_runs:
+                        self._recycle(f"{self.state['runs_since_recycle']} runs")
+                    elif browser_mb is not None and browser_mb > self.max_browser_mb:
+                        self._recycle(f"browser uses {browser_mb:.0f} MB")
+                    else:
+                        self._ensure_session()
+
+                tracing.reset()
+                statuses = publish_reports(routes, driver=self.driver)
+                job_state['last_status'] = 'ok'
+            except Exception as e:
+                print(f"✗ Scheduled job {label} failed: {e}")
+                job_state['last_status'] = 'failed'
+                self.state['last_error'] = f'{label}: {e}'
+
+                # The browser may be stuck on a broken page, start afresh next time
+                self._stop_browser()
+            finally:
+                self.state['runs_since_recycle'] += 1
+                job_state['last_run'] = datetime.datetime.now().isoformat(timespec='seconds')
+
+        return statuses
+
+    def health(self) -> tuple:
+        """
+        Returns:
+            healthy (Boolean): True while the browser is logged in and the scheduler is running
+            state (dict): Browser, session and job state
+        """
+
+        healthy = not self._stop.is_set() and self.state['browser_ok']
+        return healthy, self.state
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_minutes * 60):
+            self.refresh()
+
+    def run_forever(self) -> None:
+        """
+        Starts the browser and runs the schedule until stop() is called
+        """
+
+        with self._browser_lock:
+            self._start_browser()
+        threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+        next_runs = {label: cron.next_after(datetime.datetime.now()) for label, (_, cron) in self.schedule.items()}
+        try:
+            while not self._stop.is_set():
+                label = min(next_runs, key=next_runs.get)  # type: ignore
+                delay = (next_runs[label] - datetime.datetime.now()).total_seconds()
+                if delay > 0:
+                    # Wake at least every minute so clock changes are noticed
+                    self._stop.wait(min(delay, 60))
+                    continue
+
+                self.run_job(label)
+
+                # Runs missed while this one was busy are skipped, not queued
+                next_runs[label] = self.schedule[label][1].next_after(datetime.datetime.now())
+                self.state['jobs'][label]['next_run'] = next_runs[label].isoformat()
+        finally:
+            with self._browser_lock:
+                self._stop_browser()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """Serves the daemon's health as JSON on GET /healthz"""
+
+    daemon = None
+
+    def do_GET(self):
+        if self.path != '/healthz':
+            self.send_error(404)
+            return
+
+        healthy, state = self.daemon.health()  # type: ignore
+        body = json.dumps(dict(state, healthy=healthy)).encode()
+        self.send_response(200 if healthy else 503)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_health_server(daemon: ReportDaemon, port: int = DAEMON_HEALTH_PORT):
+    """Start the health check server on a background thread"""
+    HealthHandler.daemon = daemon  # type: ignore
+    server = ThreadingHTTPServer(('localhost', port), HealthHandler)
+    print(f"Health check on http://localhost:{server.server_port}/healthz")
+
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    return server
+
+if __name__ == '__main__':
+    # Fail at start up rather than on every scheduled run
+    require_screenshot_mode('the report daemon')
+    daemon = ReportDaemon(parse_schedule(DAEMON_SCHEDULE))
+    for label, job in daemon.state['jobs'].items():
+        print(f"Scheduled {label} ({job['cron']}), next run {job['next_run']}")
+
+    health_server = start_health_server(daemon)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        daemon.stop()
+    finally:
+        health_server.shutdown()
+        print("Report daemon stopped")
+    sys.exit(0)
@@ -0,0 +1,127 @@
+"""
+Names, dates and page layout of the report files, without any browser or imaging dependency
+
+Kept apart from create_reports so that upload, resume and clean-up runs can name report
+files without importing Selenium or PIL.
+"""
+
+import os
+import datetime
+
+# Optional page list ("1,2,3" or ReportSection page names)
+REPORT_PAGES = os.getenv('REPORT_PAGES')
+
+# PDF output profiles to build; the first is published, the others are saved alongside it with the profile name
+REPORT_PROFILES = [profile.strip() for profile in os.getenv('REPORT_PROFILES', 'standard').split(',') if profile.strip()]
+
+# Title of each report in its file name
+REPORT_NAMES = {'union': 'Union Data Report', 'daily': 'Daily COVID Report'}
+
+def report_dates(date: datetime.date | None = None) -> tuple:
+    """
+    Formats the date of a report for file names, at the time of the call rather than of the import
+
+    Args:
+        date (datetime.date): Date of the report, today when None
+    Returns:
+        date_formatted (String): Date in report names, e.g. 10.17.2026
+        date_short (String): Date in screenshot names, e.g. 101726
+    """
+
+    date = date or datetime.date.today()
+    return date.strftime('%m.%d.%Y'), date.strftime('%m%d%y')
+
+def parse_pages(pages_spec: str | list) -> list:
+    """
+    Parses a page list into page indexes and page names
+
+    Args:
+        pages_spec (String | list): Pages such as "1,2,3" or "ReportSection1,ReportSection2",
+            or a list such as [1, 2, "ReportSection3"]
+    Returns:
+        pages (list): 1-based page indexes (int) and report page names (str), in order
+    """
+
+    parts = pages_spec.split(',') if isinstance(pages_spec, str) else pages_spec
+    pages = [str(page).strip() for page in parts if str(page).strip()]
+    return [int(page) if page.isdigit() else page for page in pages]
+
+def configured_pages() -> list:
+    """
+    Lists the pages a run captures
+
+    Returns:
+        pages (list): Pages of REPORT_PAGES, otherwise the first three pages
+    """
+
+    return parse_pages(REPORT_PAGES) if REPORT_PAGES else [1, 2, 3]
+
+def report_pages(report: str, page_count: int) -> list:
+    """
+    Lists which screenshots make up a report
+
+    Args:
+        report (String): 'union' or 'daily'
+        page_count (Integer): Number of screenshots captured
+    Returns:
+        pages (list): 0-based screenshot indexes of the report
+    """
+
+    # The union data report is the first page only, the daily report is every page
+    return [0] if report == 'union' else list(range(page_count))
+
+def report_filepath(report: str, profile: str, profiles: list = REPORT_PROFILES, output_dir: str = 'reports',
+                    date: datetime.date | None = None, titles: dict | None = None) -> str:
+    """
+    Names the PDF of a report in an output profile
+
+    Args:
+        report (String): 'union' or 'daily'
+        profile (String): PDF output profile of the file
+        profiles (list): Profiles being built; the first one is published without a suffix
+        output_dir (String): Directory of the PDF
+        date (datetime.date): Date of the report, today when None
+        titles (dict): Report titles overriding REPORT_NAMES
+    Returns:
+        filepath (String): Path of the PDF in the output directory
+    """
+
+    date_formatted, _ = report_dates(date)
+    title = (titles or {}).get(report, REPORT_NAMES[report])
+    suffix = '' if profile == profiles[0] else f' - {profile}'
+    return os.path.join(output_dir, f'{title} ({date_formatted}){suffix}.pdf')
+
+def save_reports(screenshots: list, profiles: list = REPORT_PROFILES, reports: tuple = ('union', 'daily'),
+                 output_dir: str = 'reports', date: datetime.date | None = None, titles: dict | None = None) -> dict:
+    """
+    Takes dashboard screenshots and converts them into pre-outlined report formats
+    
+    Args:
+        screenshots (list): PNG bytes of the COVID dashboard screenshots, in page order
+        profiles (list): PDF output profiles to build, the first one is the published report
+        reports (tuple): Reports to build, 'union' and/or 'daily'
+        output_dir (String): Directory the PDFs are written to
+        date (datetime.date): Date of the report, today when None
+        titles (dict): Report titles overriding REPORT_NAMES
+    Returns:
+        report_filepaths (dict): Filepaths of the published reports that were built, keyed by 'union' and 'daily'
+    """
+
+    # Create the output directory
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Declare the output filepaths for every profile
+    documents = {}
+    report_filepaths = {}
+    for profile in profiles:
+        for report in reports:
+            filepath = report_filepath(report, profile, profiles, output_dir, date, titles)
+            documents[filepath] = {'pages': report_pages(report, len(screenshots)), 'profile': profile}
+            if profile == profiles[0]:
+                report_filepaths[report] = filepath
+
+    # Build every report at once, decoding each screenshot a single time; PIL is only imported here
+    from pdf_builder import build_documents
+    build_documents(screenshots, documents)
+
+    return report_filepaths
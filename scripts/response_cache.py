@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+# Memory and on-disk size caps; the disk tier is only used when a directory is configured
+MEMORY_CACHE_BYTES = int(os.getenv('AUTH_PROXY_MEMORY_CACHE_MB', '64')) * 1024 * 1024
+DISK_CACHE_BYTES = int(os.getenv('AUTH_PROXY_DISK_CACHE_MB', '512')) * 1024 * 1024
+CACHE_DIR = os.getenv('AUTH_PROXY_CACHE_DIR')
+MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+# Only static dashboard assets are cached, unless AUTH_PROXY_CACHE_ALL explicitly allows data responses
+STATIC_EXTENSIONS = ('.js', '.css', '.woff', '.woff2', '.ttf', '.otf', '.eot', '.svg', '.png', '.gif', '.jpg', '.jpeg', '.ico', '.map')
+CACHE_ALL = bool(os.getenv('AUTH_PROXY_CACHE_ALL'))
+
+def parse_cache_control(value: str | None) -> dict:
+    """
+    Parses a Cache-Control header into its directives
+
+    Args:
+        value (String): Cache-Control header value
+    Returns:
+        directives (dict): Lowercase directive names mapped to their value, or True
+    """
+
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+class CacheEntry:
+    """A cached upstream response"""
+
+    def __init__(self, status: int, headers: list, body: bytes, stored_at: float, max_age: float, etag: str | None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+        self.max_age = max_age
+        self.etag = etag
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.stored_at < self.max_age
+
+    def meta(self) -> dict:
+        return {
+            'status': self.status, 'headers': self.headers, 'stored_at': self.stored_at,
+            'max_age': self.max_age, 'etag': self.etag,
+        }
+
+class ResponseCache:
+    """
+    Two-tier LRU cache of static upstream responses, in memory and optionally on disk
+
+    Entries follow Cache-Control max-age and are revalidated with If-None-Match once stale.
+    """
+
+    def __init__(self, cache_dir: str | None = CACHE_DIR, memory_bytes: int = MEMORY_CACHE_BYTES, disk_bytes: int = DISK_CACHE_BYTES):
+        """
+        Args:
+            cache_dir (String): Directory of the on-disk tier, None keeps the cache in memory only
+            memory_bytes (Integer): Size cap of the in-memory tier
+            disk_bytes (Integer): Size cap of the on-disk tier
+        """
+
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.counters = {
+            'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0,
+            'bytes_served': 0, 'bytes_fetched': 0,
+        }
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += amount
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            stats (dict): Hit, miss and byte counters, and the current size of each tier
+        """
+
+        with self._lock:
+            return dict(self.counters, memory_entries=len(self._memory), memory_bytes=self._memory_size)
+
+    @staticmethod
+    def key(url: str, headers: dict) -> str:
+        # Bodies are stored still encoded, so the accepted encodings are part of the key
+        accept_encoding = next((value for name, value in headers.items() if name.lower() == 'accept-encoding'), '')
+        return hashlib.sha256(f'{url}\n{accept_encoding}'.encode()).hexdigest()
+
+    @staticmethod
+    def cacheable(url: str, status: int, headers) -> float | None:
+        """
+        Decides whether a response may be cached, and for how long it stays fresh
+
+        Args:
+            url (String): Upstream URL of the request
+            status (Integer): Response status code
+            headers (Mapping): Response headers
+        Returns:
+            max_age (Float): Seconds the response stays fresh, or None if it must not be cached
+        """
+
+        directives = parse_cache_control(headers.get('Cache-Control'))
+        if status != 200 or 'no-store' in directives or 'private' in directives:
+            return None
+        if headers.get('Set-Cookie') or headers.get('Vary', 'Accept-Encoding').lower() not in ('accept-encoding', ''):
+            return None
+
+        # Anything that is not a static asset may be per-user data
+        path = urllib.parse.urlparse(url).path.lower()
+        if not CACHE_ALL and not path.endswith(STATIC_EXTENSIONS):
+            return None
+
+        if 'no-cache' in directives:
+            max_age = 0.0
+        elif 's-maxage' in directives or 'max-age' in directives:
+            try:
+                max_age = float(directives.get('s-maxage', directives.get('max-age')))  # type: ignore
+            except ValueError:
+                max_age = 0.0
+        else:
+            max_age = 0.0
+
+        # Without freshness or a validator the entry could never be used
+        if max_age <= 0 and not headers.get('ETag'):
+            return None
+        return max_age
+
+    def _paths(self, key: str) -> tuple:
+        return os.path.join(self.cache_dir, f'{key}.json'), os.path.join(self.cache_dir, f'{key}.body')  # type: ignore
+
+    def get(self, key: str) -> CacheEntry | None:
+        """
+        Looks up an entry, from memory first and then from disk
+
+        Args:
+            key (String): Cache key from ResponseCache.key
+        Returns:
+            entry (CacheEntry): Cached response, or None
+        """
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if not self.cache_dir:
+            return None
+
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        # Touch the files so disk eviction stays least-recently-used
+        os.utime(meta_path)
+        entry = CacheEntry(meta['status'], meta['headers'], body, meta['stored_at'], meta['max_age'], meta['etag'])
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        """
+        Stores an entry in memory and, when configured, on disk
+
+        Args:
+            key (String): Cache key from ResponseCache.key
+            entry (CacheEntry): Response to store
+        """
+
+        if len(entry.body) > MAX_ENTRY_BYTES:
+            return
+
+        self._remember(key, entry)
+        self.count('stores')
+
+        if self.cache_dir:
+            meta_path, body_path = self._paths(key)
+            tmp_suffix = f'.{threading.get_ident()}.tmp'
+            with open(body_path + tmp_suffix, 'wb') as f:
+                f.write(entry.body)
+            with open(meta_path + tmp_suffix, 'w') as f:
+                json.dump(entry.meta(), f)
+            os.replace(body_path + tmp_suffix, body_path)
+            os.replace(meta_path + tmp_suffix, meta_path)
+            self._evict_disk()
+
+    def refresh(self, key: str, entry: CacheEntry, headers) -> None:
+        """
+        Marks a stale entry fresh again after the upstream answered 304 Not Modified
+
+        Args:
+            key (String): Cache key from ResponseCache.key
+            entry (CacheEntry): The revalidated entry
+            headers (Mapping): Headers of the 304 response
+        """
+
+        directives = parse_cache_control(headers.get('Cache-Control'))
+        try:
+            max_age = float(directives.get('s-maxage', directives.get('max-age', entry.max_age)))  # type: ignore
+        except ValueError:
+            max_age = entry.max_age
+
+        entry.stored_at = time.time()
+        entry.max_age = max_age
+        self.count('revalidated')
+        self.put(key, entry)
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            if key in self._memory:
+                self._memory_size -= len(self._memory.pop(key).body)
+            self._memory[key] = entry
+            self._memory_size += len(entry.body)
+
+            while self._memory_size > self.memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted.body)
+                self.counters['evictions'] += 1
+
+    def _evict_disk(self) -> None:
+        # Oldest-used entries go first until the directory fits under the cap
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):  # type: ignore
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            meta_path, body_path = self._paths(key)
+            try:
+                size = os.path.getsize(body_path) + os.path.getsize(meta_path)
+                entries.append((os.path.getmtime(meta_path), size, key))
+            except OSError:
+                continue
+            total += size
+
+        for _, size, key in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            self.count('evictions')
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import tempfile
+
+from cryptography.fernet import Fernet, InvalidToken
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+# Opt-in: both the cache location and a Fernet key (Fernet.generate_key()) must be set
+SESSION_CACHE = os.getenv('BI_SESSION_CACHE')
+SESSION_KEY = os.getenv('BI_SESSION_KEY')
+
+# Seconds to wait for the dashboard or the login form; the probe waits as long as signing in does,
+# so a slow dashboard is never taken for an expired session
+LOGIN_TIMEOUT = 30
+
+# Fields accepted by the DevTools Network.setCookies command
+COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires', 'priority')
+
+def session_cache_enabled() -> bool:
+    """
+    Checks whether the encrypted session cache is configured
+
+    Returns:
+        enabled (Boolean): True if BI_SESSION_CACHE and BI_SESSION_KEY are both set
+    """
+
+    return bool(SESSION_CACHE and SESSION_KEY)
+
+def export_cookies(driver) -> list:
+    """
+    Exports every cookie of a browser, including the login.microsoftonline.com cookies
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in
+    Returns:
+        cookies (list): Cookies as returned by the DevTools Network.getAllCookies command
+    """
+
+    return driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+
+def import_cookies(driver, cookies: list) -> int:
+    """
+    Loads exported cookies into a browser, skipping expired ones
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver to load the cookies into
+        cookies (list): Cookies as returned by export_cookies
+    Returns:
+        count (Integer): Number of cookies loaded
+    """
+
+    # Drop expired cookies and fields setCookies does not accept
+    now = time.time()
+    cookies = [
+        {field: cookie[field] for field in COOKIE_FIELDS if field in cookie}
+        for cookie in cookies
+        if cookie.get('session') or cookie.get('expires', -1) <= 0 or cookie['expires'] > now
+    ]
+    if cookies:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+
+    return len(cookies)
+
+def save_session(driver) -> None:
+    """
+    Exports every cookie of the logged in browser and stores them encrypted at BI_SESSION_CACHE
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, logged in
+    """
+
+    if not session_cache_enabled():
+        return
+
+    cookies = export_cookies(driver)
+    token = Fernet(SESSION_KEY).encrypt(json.dumps(cookies).encode())  # type: ignore
+
+    # Write to a private temporary file first so a crash never leaves a truncated cache; each save
+    # gets its own file, as the browsers of a login race may save at the same time
+    directory = os.path.dirname(os.path.abspath(SESSION_CACHE))  # type: ignore
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(SESSION_CACHE) + '.', suffix='.tmp')  # type: ignore
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(token)
+        os.replace(tmp_path, SESSION_CACHE)  # type: ignore
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    print(f"Saved {len(cookies)} session cookies to: {SESSION_CACHE}")
+
+def load_session(driver) -> bool:
+    """
+    Restores cached session cookies into a new browser before it opens the dashboard
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, not yet navigated
+    Returns:
+        restored (Boolean): True if any cached cookies were loaded
+    """
+
+    if not session_cache_enabled() or not os.path.exists(SESSION_CACHE):  # type: ignore
+        return False
+
+    try:
+        with open(SESSION_CACHE, 'rb') as f:  # type: ignore
+            cookies = json.loads(Fernet(SESSION_KEY).decrypt(f.read()))  # type: ignore
+    except (InvalidToken, ValueError) as e:
+        print(f"✗ Session cache unreadable, ignoring it: {e!r}")
+        return False
+
+    count = import_cookies(driver, cookies)
+    if count:
+        print(f"Restored {count} session cookies from: {SESSION_CACHE}")
+    return count > 0
+
+def session_is_valid(driver, timeout: float = LOGIN_TIMEOUT) -> bool:
+    """
+    Probes whether the browser landed on the dashboard or on the Microsoft login form
+
+    Args:
+        driver (Selenium.WebDriver): WebDriver for COVID PowerBI Dashboard, navigated
+        timeout (Float): Seconds to wait for either page to appear
+    Returns:
+        valid (Boolean): True if the dashboard loaded without a login prompt
+    """
+
+    try:
+        element = WebDriverWait(driver, timeout).until(EC.any_of(
+            EC.presence_of_element_located((By.XPATH, '//*[@data-testid="app-bar-view-menu-btn"]')),
+            EC.presence_of_element_located((By.NAME, 'loginfmt')),
+        ))
+    except TimeoutException:
+        return False
+
+    return element.get_attribute('name') != 'loginfmt'
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Optional outputs: a JSON run report and a node-exporter textfile collector file
+TRACE_REPORT = os.getenv('TRACE_REPORT')
+TRACE_TEXTFILE = os.getenv('TRACE_TEXTFILE')
+
+# Numeric attributes exported as metrics, by name suffix, rather than as labels
+METRIC_ATTRS = {
+    'bytes': 'Bytes handled by each stage of the last report run',
+    'count': 'Items, such as requests, counted by each stage of the last report run',
+    'score': 'Scores, such as page quality, measured by each stage of the last report run',
+}
+
+_spans = []
+_lock = threading.Lock()
+_run_started = time.time()
+
+def record(name: str, seconds: float, status: str = 'ok', **attrs) -> None:
+    """
+    Records a finished stage of the run
+
+    Args:
+        name (String): Stage name, such as 'login.password' or 'upload'
+        seconds (Float): How long the stage took
+        status (String): 'ok' or 'error'
+        attrs: Extra details; attributes ending in a METRIC_ATTRS suffix are exported as metrics, the rest as labels
+    """
+
+    with _lock:
+        _spans.append({
+            'name': name,
+            'start': round(time.time() - seconds, 3),
+            'seconds': round(seconds, 4),
+            'status': status,
+            'thread': threading.current_thread().name,
+            'attrs': attrs,
+        })
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times the enclosed block as a stage of the run
+
+    The yielded dict can be updated inside the block, e.g. with a byte count once it is known.
+
+    Args:
+        name (String): Stage name, such as 'login.password' or 'upload'
+        attrs: Extra details known up front
+    """
+
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield attrs
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        record(name, time.perf_counter() - start, status, **attrs)
+
+def spans() -> list:
+    """
+    Returns:
+        spans (list): Copies of every span recorded so far
+    """
+
+    with _lock:
+        return [dict(recorded) for recorded in _spans]
+
+def reset() -> None:
+    """
+    Forgets every recorded span and starts a new run
+    """
+
+    global _run_started
+    with _lock:
+        _spans.clear()
+        _run_started = time.time()
+
+def process_tree_rss(pid: int | None = None) -> int | None:
+    """
+    Measures the resident memory of a process and all of its descendants, such as a driver and its browser
+
+    Args:
+        pid (Integer): Process id of the tree root, defaults to this process
+    Returns:
+        rss (Integer): Resident bytes of the tree, or None where /proc is not available
+    """
+
+    if not os.path.isdir('/proc'):
+        return None
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    parents, rss = {}, {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Fields after the parenthesised command name, starting with the state
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        parents[int(entry)] = int(fields[1])
+        rss[int(entry)] = int(fields[21]) * page_size
+
+    tree = {os.getpid() if pid is None else pid}
+    while True:
+        children = {child for child, parent in parents.items() if parent in tree} - tree
+        if not children:
+            break
+        tree |= children
+    return sum(rss.get(member, 0) for member in tree)
+
+def _labels(recorded: dict) -> str:
+    labels = {'span': recorded['name'], 'status': recorded['status']}
+    labels.update((key, str(value)) for key, value in recorded['attrs'].items() if not key.endswith(tuple(METRIC_ATTRS)))
+    return ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in sorted(labels.items()))
+
+def write_run_report(report_path: str | None = TRACE_REPORT, textfile_path: str | None = TRACE_TEXTFILE) -> None:
+    """
+    Prints a timing summary and writes the configured JSON report and Prometheus textfile
+
+    Args:
+        report_path (String): Where to write the JSON run report, None to skip it
+        textfile_path (String): Where to write the node-exporter textfile, None to skip it
+    """
+
+    recorded = spans()
+    totals = {}
+    for entry in recorded:
+        totals[entry['name']] = totals.get(entry['name'], 0) + entry['seconds']
+    print('Stage timings: ' + ', '.join(f'{name} {seconds:.2f}s' for name, seconds in totals.items()))
+
+    if report_path:
+        report = {
+            'started': _run_started,
+            'seconds': round(time.time() - _run_started, 3),
+            'spans': recorded,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote run report to: {report_path}")
+
+    if textfile_path:
+        lines = [
+            '# HELP covid_reports_span_seconds Duration of each stage of the last report run',
+            '# TYPE covid_reports_span_seconds gauge',
+        ]
+        metrics = {}
+        for entry in recorded:
+            name = f'covid_reports_span_seconds{{{_labels(entry)}}}'
+            metrics[name] = metrics.get(name, 0) + entry['seconds']
+        lines += [f'{name} {value}' for name, value in metrics.items()]
+
+        for suffix, description in METRIC_ATTRS.items():
+            lines += [
+                f'# HELP covid_reports_span_{suffix} {description}',
+                f'# TYPE covid_reports_span_{suffix} gauge',
+            ]
+            metrics = {}
+            for entry in recorded:
+                for key, value in entry['attrs'].items():
+                    if key.endswith(suffix) and isinstance(value, (int, float)):
+                        name = f'covid_reports_span_{suffix}{{{_labels(entry)},kind="{key}"}}'
+                        metrics[name] = metrics.get(name, 0) + value
+            lines += [f'{name} {value}' for name, value in metrics.items()]
+
+        lines += [
+            '# HELP covid_reports_last_run_timestamp_seconds When the last report run finished',
+            '# TYPE covid_reports_last_run_timestamp_seconds gauge',
+            f'covid_reports_last_run_timestamp_seconds {time.time():.0f}',
+        ]
+
+        # node-exporter may read at any time, so replace the file atomically
+        os.makedirs(os.path.dirname(os.path.abspath(textfile_path)), exist_ok=True)
+        with open(textfile_path + '.tmp', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(textfile_path + '.tmp', textfile_path)
+        print(f"Wrote metrics to: {textfile_path}")
@@ -1,9 +1,285 @@
 import os
+import json
+import time
+import uuid
+import hashlib
+import threading
 
-from office365.runtime.auth.authentication_context import AuthenticationContext
-from office365.sharepoint.client_context import ClientContext
+from tracing import span
 
-def upload_report(site: str, localpath: str, remotepath: str) -> None:
+# Files larger than one chunk go through a resumable upload session
+CHUNK_SIZE = int(os.getenv('SHAREPOINT_CHUNK_MB', '4')) * 1024 * 1024
+UPLOAD_RETRIES = int(os.getenv('SHAREPOINT_UPLOAD_RETRIES', '3'))
+UPLOAD_STATE_DIR = os.getenv('UPLOAD_STATE_DIR', '.upload_state')
+
+# Content hash and ETag of every file this machine uploaded, used to skip identical re-uploads.
+# CI keeps UPLOAD_STATE_DIR between runs with actions/cache, so a rerun skips what already arrived
+UPLOAD_LEDGER = os.path.join(UPLOAD_STATE_DIR, 'ledger.json')
+
+def file_sha256(localpath: str) -> str:
+    """
+    Hashes a file in blocks, without reading it into memory at once
+
+    Args:
+        localpath (string): Path of file to hash
+    Returns:
+        digest (string): Hex SHA-256 of the file contents
+    """
+
+    digest = hashlib.sha256()
+    with open(localpath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# The pipeline and batch runs upload from several threads through one publisher
+_ledger_lock = threading.Lock()
+
+def _read_ledger() -> dict:
+    with _ledger_lock:
+        if not os.path.exists(UPLOAD_LEDGER):
+            return {}
+        with open(UPLOAD_LEDGER) as f:
+            return json.load(f)
+
+def _record_upload(key: str, entry: dict) -> None:
+    # Read, update and write under the lock, so concurrent uploads never drop each other's entries
+    with _ledger_lock:
+        ledger = {}
+        if os.path.exists(UPLOAD_LEDGER):
+            with open(UPLOAD_LEDGER) as f:
+                ledger = json.load(f)
+        ledger[key] = entry
+
+        os.makedirs(UPLOAD_STATE_DIR, exist_ok=True)
+        with open(UPLOAD_LEDGER + '.tmp', 'w') as f:
+            json.dump(ledger, f, indent=2)
+        os.replace(UPLOAD_LEDGER + '.tmp', UPLOAD_LEDGER)
+
+class SharePointPublisher:
+    """
+    Uploads files to one LA County Metro SharePoint site over a single authenticated context
+    """
+
+    def __init__(self, site: str, chunk_size: int = CHUNK_SIZE):
+        """
+        Args:
+            site (string): SharePoint site to upload to
+            chunk_size (int): Size of each fragment of a chunked upload, in bytes
+        """
+
+        # office365 is only imported once something is actually uploaded
+        from office365.runtime.auth.authentication_context import AuthenticationContext
+        from office365.sharepoint.client_context import ClientContext
+
+        # Get user variables
+        username = os.getenv('METRO_EMAIL')
+        password = os.getenv('METRO_PASSWORD')
+        base_url = os.getenv('SHAREPOINT_URL')
+
+        self.site_url = f'{base_url}sites/{site}'
+        self.chunk_size = chunk_size
+
+        # Creates an authentication token for SharePoint site, once for every upload
+        with span('upload.auth', site=site):
+            ctx_auth = AuthenticationContext(self.site_url)
+            ctx_auth.acquire_token_for_user(username, password)  # type: ignore
+
+        # Log in to SharePoint site
+        self.ctx = ClientContext(self.site_url, ctx_auth)
+
+    def upload(self, localpath: str, remotepath: str):
+        """
+        Uploads a file, in chunks when it is larger than the chunk size
+
+        Args:
+            localpath (string): Path of file to upload
+            remotepath (string): Location to upload file to
+        Returns:
+            file (office365.File): The uploaded file, with its new ETag
+        """
+
+        directory, name = os.path.split(remotepath)
+        folder = self.ctx.web.get_folder_by_server_relative_url(directory)
+        size = os.path.getsize(localpath)
+
+        with span('upload', remotepath=remotepath, bytes=size):
+            if size <= self.chunk_size:
+                # Convert file into binary file
+                with open(localpath, 'rb') as f:
+                    file_content = f.read()
+
+                # Upload the file to SharePoint
+                uploaded = folder.upload_file(name, file_content).execute_query()
+            else:
+                uploaded = self._upload_chunked(folder, localpath, name, remotepath)
+
+        print(f"Uploaded {localpath} to {remotepath}")
+        return uploaded
+
+    def remote_files(self, remotepaths: list) -> dict:
+        """
+        Looks up the size and ETag of the existing files in every target folder, in one batch request
+
+        Args:
+            remotepaths (list): Locations files will be uploaded to
+        Returns:
+            remote (dict): Remote path mapped to {'length', 'etag'} for files that already exist
+        """
+
+        folders = {os.path.dirname(remotepath) for remotepath in remotepaths}
+        collections = {
+            directory: self.ctx.web.get_folder_by_server_relative_url(directory).files.get().select(['Name', 'Length', 'ETag'])
+            for directory in folders
+        }
+
+        try:
+            self.ctx.execute_batch()
+        except Exception as e:
+            # Without metadata every file is simply uploaded
+            print(f"Could not list target folders, uploading everything: {e}")
+            return {}
+
+        return {
+            f'{directory}/{remote_file.name}': {'length': remote_file.length, 'etag': remote_file.properties.get('ETag')}
+            for directory, files in collections.items()
+            for remote_file in files
+        }
+
+    def upload_if_changed(self, localpath: str, remotepath: str, remote: dict) -> str:
+        """
+        Uploads a file unless the remote copy is the one this machine last uploaded, unchanged since
+
+        Args:
+            localpath (string): Path of file to upload
+            remotepath (string): Location to upload file to
+            remote (dict): Existing remote files, from remote_files
+        Returns:
+            status (string): 'uploaded', 'skipped-identical' or 'replaced'
+        """
+
+        key = f'{self.site_url}|{remotepath}'
+        digest = file_sha256(localpath)
+        existing = remote.get(remotepath)
+        recorded = _read_ledger().get(key)
+
+        # Same content as our last upload, and nobody has changed the remote file since
+        if existing and recorded and recorded['sha256'] == digest \
+                and recorded['etag'] == existing['etag'] and existing['length'] == os.path.getsize(localpath):
+            print(f"{remotepath} already up to date, skipping upload")
+            return 'skipped-identical'
+
+        uploaded = self.upload(localpath, remotepath)
+        _record_upload(key, {'sha256': digest, 'etag': uploaded.properties.get('ETag')})
+
+        return 'replaced' if existing else 'uploaded'
+
+    def publish(self, files: list) -> dict:
+        """
+        Uploads several files idempotently, with one metadata lookup for all of them
+
+        Args:
+            files (list): (localpath, remotepath) pairs
+        Returns:
+            results (dict): Remote path mapped to 'uploaded', 'skipped-identical' or 'replaced'
+        """
+
+        remote = self.remote_files([remotepath for _, remotepath in files])
+        return {remotepath: self.upload_if_changed(localpath, remotepath, remote) for localpath, remotepath in files}
+
+    def _state_path(self, localpath: str, remotepath: str) -> str:
+        # The session only resumes for the same destination and the same local file contents
+        stat = os.stat(localpath)
+        key = f'{self.site_url}|{remotepath}|{stat.st_size}|{stat.st_mtime_ns}'
+        return os.path.join(UPLOAD_STATE_DIR, hashlib.sha256(key.encode()).hexdigest() + '.json')
+
+    def _upload_chunked(self, folder, localpath: str, name: str, remotepath: str):
+        size = os.path.getsize(localpath)
+        state_path = self._state_path(localpath, remotepath)
+
+        # Resume from the last committed offset of an interrupted upload
+        state = {'upload_id': str(uuid.uuid4()), 'offset': 0}
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+            print(f"Resuming upload of {localpath} at byte {state['offset']} of {size}")
+
+        if state['offset'] == 0:
+            target = folder.files.add(name, None, True).execute_query()
+        else:
+            target = folder.files.get_by_url(name)
+
+        resumed = state['offset'] > 0
+        with open(localpath, 'rb') as f:
+            while True:
+                f.seek(state['offset'])
+                chunk = f.read(self.chunk_size)
+                last = state['offset'] + len(chunk) >= size
+
+                try:
+                    state['offset'] = self._send_chunk(target, state, chunk, last)
+                except Exception:
+                    if not resumed:
+                        raise
+                    # The server-side session may have expired, so start over once
+                    print("Could not resume upload session, restarting from the beginning")
+                    resumed = False
+                    state = {'upload_id': str(uuid.uuid4()), 'offset': 0}
+                    target = folder.files.add(name, None, True).execute_query()
+                    continue
+
+                if last:
+                    break
+
+                os.makedirs(UPLOAD_STATE_DIR, exist_ok=True)
+                with open(state_path, 'w') as state_file:
+                    json.dump(state, state_file)
+                print(f"Uploaded {state['offset']} of {size} bytes")
+
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+        return target
+
+    def _send_chunk(self, target, state: dict, chunk: bytes, last: bool) -> int:
+        # Network hiccups are retried from the same offset with a growing delay
+        attempt = 0
+        while True:
+            try:
+                if state['offset'] == 0:
+                    result = target.start_upload(state['upload_id'], chunk)
+                elif last:
+                    result = target.finish_upload(state['upload_id'], state['offset'], chunk)
+                else:
+                    result = target.continue_upload(state['upload_id'], state['offset'], chunk)
+                self.ctx.execute_query()
+                # Verbose OData serialises the Int64 offset as a string
+                return state['offset'] + len(chunk) if last else int(result.value)
+            except Exception as e:
+                if attempt == UPLOAD_RETRIES:
+                    raise
+                print(f"Chunk upload failed ({e}), retrying in {2 ** attempt}s")
+                time.sleep(2 ** attempt)
+                attempt += 1
+
+# One publisher, and so one token, per site for the whole run
+_publishers = {}
+
+def get_publisher(site: str) -> SharePointPublisher:
+    """
+    Returns the shared publisher of a SharePoint site, logging in on first use
+
+    Args:
+        site (string): SharePoint site to upload to
+    Returns:
+        publisher (SharePointPublisher): Authenticated publisher for the site
+    """
+
+    if site not in _publishers:
+        _publishers[site] = SharePointPublisher(site)
+    return _publishers[site]
+
+def upload_report(site: str, localpath: str, remotepath: str, idempotent: bool = False) -> str:
     """
     Uploads a file to an LA County Metro SharePoint site
 
@@ -11,25 +287,14 @@ def upload_report(site: str, localpath: str, remotepath: str) -> None:
         site (string): SharePoint site to upload to
         localpath (string): Path of file to upload
         remotepath (string): Location to upload file to
+        idempotent (bool): Skip the upload if the remote file already has this content
+    Returns:
+        status (string): 'uploaded', 'skipped-identical' or 'replaced'
     """
-    # Get user variables
-    username = os.getenv('METRO_EMAIL')
-    password = os.getenv('METRO_PASSWORD')
-    base_url = os.getenv('SHAREPOINT_URL')
-
-    site_url = f'{base_url}sites/{site}'
-    
-    # Creates an authentication token for SharePoint site
-    ctx_auth = AuthenticationContext(site_url)
-    ctx_auth.acquire_token_for_user(username, password)  # type: ignore
 
-    # Log in to SharePoint site
-    ctx = ClientContext(site_url, ctx_auth)
-
-    # Convert file into binary file
-    with open(localpath, 'rb') as f:
-        file_content = f.read()
+    publisher = get_publisher(site)
+    if idempotent:
+        return publisher.publish([(localpath, remotepath)])[remotepath]
 
-    # Upload the file to SharePoint
-    directory, name = os.path.split(remotepath)
-    ctx.web.get_folder_by_server_relative_url(directory).upload_file(name, file_content).execute_query()
\ No newline at end of file
+    publisher.upload(localpath, remotepath)
+    return 'uploaded'
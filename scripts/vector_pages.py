@@ -0,0 +1,352 @@
+"""
+Draws exported dashboard data as vector PDF pages: tables, bar charts and line charts
+
+Text is set in the standard Helvetica fonts, which every PDF reader has, so pages stay sharp
+at any zoom and cost a few kilobytes each.
+"""
+
+import os
+import math
+import time
+import datetime
+
+from pdf_builder import StreamingPdfWriter, peak_rss_mb
+from tracing import record
+
+# US Letter, landscape
+PAGE_WIDTH, PAGE_HEIGHT = 792, 612
+MARGIN = 28
+
+# Series colors, as PDF RGB fractions
+PALETTE = (
+    (0.07, 0.40, 0.67), (0.91, 0.45, 0.13), (0.20, 0.60, 0.33), (0.75, 0.19, 0.23),
+    (0.50, 0.36, 0.66), (0.55, 0.34, 0.29), (0.85, 0.40, 0.69), (0.45, 0.45, 0.45),
+)
+
+# Helvetica advance widths of ASCII 32 to 126, in thousandths of the font size; bold is close
+# enough to regular for fitting text into a column
+HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+
+def text_width(text: str, size: float) -> float:
+    """
+    Args:
+        text (String): Text set in Helvetica
+        size (Float): Font size in points
+    Returns:
+        width (Float): Width of the text in points
+    """
+
+    return sum(HELVETICA_WIDTHS[ord(char) - 32] if 32 <= ord(char) <= 126 else 556 for char in text) * size / 1000
+
+def fit_text(text: str, size: float, width: float) -> str:
+    """
+    Shortens text with an ellipsis until it fits a width
+
+    Args:
+        text (String): Text set in Helvetica
+        size (Float): Font size in points
+        width (Float): Space available in points
+    Returns:
+        text (String): The text, or as much of it as fits followed by '...'
+    """
+
+    if text_width(text, size) <= width:
+        return text
+    while text and text_width(text + '...', size) > width:
+        text = text[:-1]
+    return text + '...' if text else ''
+
+def format_value(value) -> str:
+    """
+    Args:
+        value: Cell value of an exported table
+    Returns:
+        text (String): Value as shown in a table or axis label
+    """
+
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, int):
+        return f'{value:,}'
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return f'{int(value):,}'
+        return f'{value:,.1f}' if abs(value) >= 100 else f'{value:,.2f}'
+    if isinstance(value, datetime.date):
+        return value.strftime('%m/%d/%Y')
+    return str(value)
+
+def nice_max(value: float) -> float:
+    """
+    Rounds the top of a chart axis up to 1, 2, 2.5 or 5 times a power of ten
+
+    Args:
+        value (Float): Largest value on the axis
+    Returns:
+        top (Float): Axis maximum
+    """
+
+    if value <= 0:
+        return 1.0
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 2.5, 5, 10):
+        if value <= step * magnitude:
+            return step * magnitude
+    return 10 * magnitude
+
+class Canvas:
+    """
+    Collects PDF drawing operators for one page, with the origin at the bottom left
+    """
+
+    def __init__(self):
+        self.ops = []
+
+    def fill(self, color: tuple) -> None:
+        self.ops.append(f'{color[0]:.3f} {color[1]:.3f} {color[2]:.3f} rg')
+
+    def stroke(self, color: tuple, width: float = 0.5) -> None:
+        self.ops.append(f'{color[0]:.3f} {color[1]:.3f} {color[2]:.3f} RG {width:.2f} w')
+
+    def rect(self, x: float, y: float, width: float, height: float, fill: bool = True) -> None:
+        self.ops.append(f'{x:.2f} {y:.2f} {width:.2f} {height:.2f} re {"f" if fill else "S"}')
+
+    def polyline(self, points: list) -> None:
+        path = ' '.join(f'{x:.2f} {y:.2f} {"m" if index == 0 else "l"}' for index, (x, y) in enumerate(points))
+        self.ops.append(f'{path} S')
+
+    def text(self, x: float, y: float, text: str, size: float = 8, bold: bool = False, align: str = 'left') -> None:
+        """
+        Args:
+            x (Float): Left edge, center or right edge of the text, depending on align
+            y (Float): Baseline
+            text (String): Text to draw, in Windows-1252 characters
+            size (Float): Font size in points
+            bold (Boolean): Helvetica-Bold instead of Helvetica
+            align (String): 'left', 'center' or 'right'
+        """
+
+        if align != 'left':
+            x -= text_width(text, size) / (2 if align == 'center' else 1)
+        escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        self.ops.append(f'BT /{"F2" if bold else "F1"} {size:g} Tf {x:.2f} {y:.2f} Td ({escaped}) Tj ET')
+
+    def content(self) -> bytes:
+        return '\n'.join(self.ops).encode('cp1252', errors='replace')
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def draw_table(canvas: Canvas, table: dict, x: float, y: float, width: float, height: float) -> None:
+    """
+    Draws a table into a box, with as many rows as fit
+
+    Args:
+        canvas (Canvas): Page being drawn
+        table (dict): 'columns' names and 'rows' of values, from data_export
+        x (Float): Left edge of the box
+        y (Float): Bottom edge of the box
+        width (Float): Box width
+        height (Float): Box height
+    """
+
+    columns, rows = table['columns'], table['rows']
+    size, row_height, padding = 7, 10, 3
+    cells = [[format_value(value) for value in row] for row in rows]
+
+    # Columns share the width in proportion to their longest text, numbers are right aligned
+    natural = [
+        max([text_width(column, size)] + [text_width(row[index], size) for row in cells[:200]]) + 2 * padding
+        for index, column in enumerate(columns)
+    ]
+    scale = min(1.0, width / sum(natural)) if natural else 1.0
+    widths = [natural_width * scale for natural_width in natural]
+    numeric = [any(_is_number(row[index]) for row in rows[:200]) for index in range(len(columns))]
+
+    def draw_row(values, top, bold=False):
+        left = x
+        for index, text in enumerate(values):
+            text = fit_text(text, size, widths[index] - 2 * padding)
+            if numeric[index]:
+                canvas.text(left + widths[index] - padding, top - row_height + 3, text, size, bold, 'right')
+            else:
+                canvas.text(left + padding, top - row_height + 3, text, size, bold)
+            left += widths[index]
+
+    top = y + height
+    canvas.fill((0.88, 0.90, 0.93))
+    canvas.rect(x, top - row_height, width, row_height)
+    canvas.fill((0, 0, 0))
+    draw_row(columns, top, bold=True)
+
+    fits = int(height // row_height) - 1
+    shown = cells if len(cells) <= fits else cells[:max(0, fits - 1)]
+    for index, row in enumerate(shown):
+        top -= row_height
+        if index % 2:
+            canvas.fill((0.96, 0.96, 0.97))
+            canvas.rect(x, top - row_height, width, row_height)
+            canvas.fill((0, 0, 0))
+        draw_row(row, top)
+
+    if len(shown) < len(cells):
+        canvas.fill((0.4, 0.4, 0.4))
+        canvas.text(x + padding, top - row_height + 3, f'{len(cells) - len(shown):,} more rows in the CSV export', size)
+        canvas.fill((0, 0, 0))
+
+def draw_chart(canvas: Canvas, table: dict, kind: str, x: float, y: float, width: float, height: float) -> None:
+    """
+    Draws a bar or line chart of a table into a box: the first column along the bottom, one series per numeric column
+
+    Args:
+        canvas (Canvas): Page being drawn
+        table (dict): 'columns' names and 'rows' of values, from data_export
+        kind (String): 'bar' or 'line'
+        x (Float): Left edge of the box
+        y (Float): Bottom edge of the box
+        width (Float): Box width
+        height (Float): Box height
+    """
+
+    columns, rows = table['columns'], table['rows']
+    series = [index for index in range(1, len(columns)) if any(_is_number(row[index]) for row in rows)]
+    if not rows or not series:
+        canvas.fill((0.4, 0.4, 0.4))
+        canvas.text(x + width / 2, y + height / 2, 'No data', 8, align='center')
+        canvas.fill((0, 0, 0))
+        return
+
+    # Legend along the top when there is more than one series
+    if len(series) > 1:
+        left = x
+        for number, index in enumerate(series):
+            canvas.fill(PALETTE[number % len(PALETTE)])
+            canvas.rect(left, y + height - 7, 6, 6)
+            canvas.fill((0, 0, 0))
+            canvas.text(left + 9, y + height - 7, columns[index], 6.5)
+            left += text_width(columns[index], 6.5) + 20
+        height -= 12
+
+    values = [row[index] for row in rows for index in series if _is_number(row[index])]
+    top_value = nice_max(max(values + [0]))
+    axis_width = max(text_width(format_value(top_value), 6.5), text_width('0', 6.5)) + 6
+    plot_x, plot_y = x + axis_width, y + 12
+    plot_width, plot_height = width - axis_width, height - 16
+
+    # Gridlines and value labels
+    canvas.stroke((0.85, 0.85, 0.85))
+    for step in range(5):
+        level = plot_y + plot_height * step / 4
+        canvas.polyline([(plot_x, level), (plot_x + plot_width, level)])
+        canvas.text(plot_x - 3, level - 2, format_value(top_value * step / 4), 6.5, align='right')
+
+    # Category labels, thinned out so they do not overlap
+    slot = plot_width / len(rows)
+    labels = [format_value(row[0]) for row in rows]
+    every = max(1, int((max(text_width(label, 6.5) for label in labels) + 6) // slot) + 1)
+    for index in range(0, len(rows), every):
+        label = fit_text(labels[index], 6.5, slot * every - 2)
+        canvas.text(plot_x + slot * (index + 0.5), y + 3, label, 6.5, align='center')
+
+    def level(value):
+        return plot_y + plot_height * (value / top_value if _is_number(value) else 0)
+
+    if kind == 'bar':
+        bar_width = slot * 0.8 / len(series)
+        for number, index in enumerate(series):
+            canvas.fill(PALETTE[number % len(PALETTE)])
+            for position, row in enumerate(rows):
+                if _is_number(row[index]) and row[index] > 0:
+                    left = plot_x + slot * (position + 0.1) + bar_width * number
+                    canvas.rect(left, plot_y, bar_width, level(row[index]) - plot_y)
+        canvas.fill((0, 0, 0))
+    else:
+        for number, index in enumerate(series):
+            canvas.stroke(PALETTE[number % len(PALETTE)], 1.2)
+            points = [(plot_x + slot * (position + 0.5), level(row[index])) for position, row in enumerate(rows)]
+            canvas.polyline(points)
+
+    canvas.stroke((0.3, 0.3, 0.3))
+    canvas.polyline([(plot_x, plot_y), (plot_x + plot_width, plot_y)])
+
+def render_page(title: str, visuals: list) -> bytes:
+    """
+    Lays out the exported visuals of one dashboard page on a landscape page
+
+    Args:
+        title (String): Heading of the page
+        visuals (list): Dicts with the visual's 'name', optional 'title', 'kind' ('table', 'bar' or 'line') and exported 'table'
+    Returns:
+        content (bytes): Content stream of the page, for StreamingPdfWriter.add_vector_page
+    """
+
+    canvas = Canvas()
+    canvas.fill((0, 0, 0))
+    canvas.text(MARGIN, PAGE_HEIGHT - MARGIN - 12, title, 14, bold=True)
+
+    # Visuals share a grid of two columns, one column when a page has a single visual
+    count = max(1, len(visuals))
+    columns = 1 if count == 1 else 2
+    rows = -(-count // columns)
+    gap = 12
+    area_top = PAGE_HEIGHT - MARGIN - 26
+    cell_width = (PAGE_WIDTH - 2 * MARGIN - gap * (columns - 1)) / columns
+    cell_height = (area_top - MARGIN - gap * (rows - 1)) / rows
+
+    for index, visual in enumerate(visuals):
+        left = MARGIN + (index % columns) * (cell_width + gap)
+        bottom = area_top - (index // columns + 1) * cell_height - (index // columns) * gap
+        canvas.stroke((0.8, 0.8, 0.8))
+        canvas.rect(left, bottom, cell_width, cell_height, fill=False)
+        canvas.fill((0, 0, 0))
+        canvas.text(left + 6, bottom + cell_height - 14, fit_text(visual.get('title', visual['name']), 9, cell_width - 12), 9, bold=True)
+
+        box = (left + 6, bottom + 6, cell_width - 12, cell_height - 26)
+        if visual['kind'] == 'table':
+            draw_table(canvas, visual['table'], *box)
+        else:
+            draw_chart(canvas, visual['table'], visual['kind'], *box)
+
+    return canvas.content()
+
+def build_vector_document(filepath: str, pages: list) -> dict:
+    """
+    Writes a PDF with one vector page per dashboard page
+
+    Args:
+        filepath (String): Path of the PDF to write
+        pages (list): (title, visuals) of every page, visuals as in render_page
+    Returns:
+        stats (dict): Pages, bytes and encode seconds of the PDF, and the process peak RSS so far
+    """
+
+    start = time.perf_counter()
+    writer = StreamingPdfWriter(filepath)
+    try:
+        for title, visuals in pages:
+            writer.add_vector_page(render_page(title, visuals), PAGE_WIDTH, PAGE_HEIGHT)
+    except Exception:
+        writer._file.close()
+        raise
+    writer.close()
+
+    stats = {
+        'profile': 'vector',
+        'pages': len(writer.page_refs),
+        'bytes': writer.bytes_written,
+        'encode_seconds': round(time.perf_counter() - start, 3),
+        'process_peak_rss_mb': peak_rss_mb(),
+    }
+    record('pdf.encode', stats['encode_seconds'], document=os.path.basename(filepath), profile='vector',
+           pages=stats['pages'], bytes=stats['bytes'])
+    print(f"Built {filepath} (vector): {stats['pages']} pages, {stats['bytes']} bytes in {stats['encode_seconds']}s")
+    return stats
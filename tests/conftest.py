@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import each other by module name, as they do when run from scripts/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ('scripts', 'benchmarks'):
+    sys.path.insert(0, os.path.join(ROOT, directory))
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from checkpoint import RunManifest, bytes_sha256, run_stage
+
+PAGES = [1, 2, 'ReportSection3']
+
+def start(root, resume=False):
+    return RunManifest.start(['union', 'daily'], PAGES, root=str(root), resume=resume)
+
+def test_new_run_expects_every_page(tmp_path):
+    manifest = start(tmp_path)
+
+    assert os.path.basename(manifest.directory).endswith('_daily-union')
+    assert manifest.data['expected_pages'] == PAGES
+    assert manifest.missing_pages() == [0, 1, 2]
+
+def test_resume_keeps_intact_pages_and_finished_stages(tmp_path):
+    manifest = start(tmp_path)
+    manifest.add_page(0, b'page one', 'fp1')
+    manifest.add_page(2, b'page three', 'fp3')
+    manifest.set_stage('capture', 'failed', 'page 2 timed out')
+
+    resumed = start(tmp_path, resume=True)
+
+    assert resumed.directory == manifest.directory
+    assert resumed.missing_pages() == [1]
+    assert resumed.data['stages']['capture']['status'] == 'failed'
+
+def test_changed_page_file_counts_as_missing(tmp_path):
+    manifest = start(tmp_path)
+    manifest.add_page(0, b'page one', 'fp1')
+    with open(manifest.path('pages', '01.png'), 'wb') as f:
+        f.write(b'truncated')
+
+    assert 0 in start(tmp_path, resume=True).missing_pages()
+
+def test_new_run_replaces_an_unfinished_one(tmp_path):
+    manifest = start(tmp_path)
+    manifest.add_page(0, b'page one', 'fp1')
+
+    fresh = start(tmp_path)
+
+    assert fresh.missing_pages() == [0, 1, 2]
+    assert os.listdir(tmp_path) == [os.path.basename(fresh.directory)]
+
+def test_finish_deletes_the_run(tmp_path):
+    manifest = start(tmp_path)
+    manifest.finish()
+
+    assert not os.path.exists(manifest.directory)
+    assert start(tmp_path, resume=True).missing_pages() == [0, 1, 2]
+
+def test_uploads_match_the_exact_document(tmp_path):
+    manifest = start(tmp_path)
+    manifest.add_upload('daily', bytes_sha256(b'pdf'), '/Shared Documents/daily.pdf', 'uploaded')
+
+    assert manifest.uploaded('daily', bytes_sha256(b'pdf')) == 'uploaded'
+    assert manifest.uploaded('daily', bytes_sha256(b'rebuilt pdf')) is None
+    assert manifest.uploaded('union', bytes_sha256(b'pdf')) is None
+
+def test_run_stage_retries_only_what_is_missing(tmp_path):
+    manifest = start(tmp_path)
+    captured = []
+
+    def capture():
+        # Every attempt captures the missing pages, one of them fails until the third attempt
+        for position in manifest.missing_pages():
+            if position == 1 and len(captured) < 3:
+                captured.append(position)
+                raise RuntimeError('page 2 did not render')
+            captured.append(position)
+            manifest.add_page(position, f'page {position}'.encode(), f'fp{position}')
+
+    run_stage(manifest, 'capture', capture, retries=2, backoff=0)
+
+    assert captured == [0, 1, 1, 1, 2]
+    assert manifest.missing_pages() == []
+    assert manifest.data['stages']['capture'] == {'attempts': 3, 'status': 'done', 'error': None}
+
+def test_run_stage_gives_up_after_its_retries(tmp_path):
+    manifest = start(tmp_path)
+    attempts = []
+
+    def upload():
+        attempts.append(1)
+        raise ConnectionError('SharePoint unavailable')
+
+    with pytest.raises(ConnectionError):
+        run_stage(manifest, 'upload', upload, retries=1, backoff=0)
+
+    assert len(attempts) == 2
+    resumed = start(tmp_path, resume=True)
+    assert resumed.data['stages']['upload'] == {'attempts': 2, 'status': 'failed', 'error': 'SharePoint unavailable'}
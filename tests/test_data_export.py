@@ -0,0 +1,141 @@
+import os
+import json
+import datetime
+import urllib.parse
+import urllib.request
+
+import pytest
+from pypdf import PdfReader
+
+import data_export
+from data_export import DataExportException, export_all_reports, parse_dsr
+from vector_pages import render_page
+from fake_powerbi import SESSION_COOKIE, fake_query, fake_query_result, start_fake_powerbi
+
+def dsr_response(select: list, entries: list, value_dicts: dict | None = None) -> dict:
+    dataset = {'N': 'DS0', 'PH': [{'DM0': entries}]}
+    if value_dicts:
+        dataset['ValueDicts'] = value_dicts
+    return {'results': [{'result': {'data': {
+        'descriptor': {'Select': [{'Value': value, 'Name': name} for value, name in select]},
+        'dsr': {'DS': [dataset]},
+    }}}]}
+
+def test_parse_dsr_expands_repeated_empty_and_dictionary_values():
+    response = dsr_response(
+        [('G0', 'Divisions.Division'), ('M0', 'Sum(Cases.Active)'), ('M1', 'Cases.Reported')],
+        [
+            {'S': [{'N': 'G0', 'T': 1, 'DN': 'D0'}, {'N': 'M0', 'T': 4}, {'N': 'M1', 'T': 7}],
+             'C': [0, '12', 1767225600000]},
+            # Repeats M0 from the row before, M1 is empty
+            {'R': 0b010, 'Ø': 0b100, 'C': [1]},
+            {'C': [0, 7, 1767227400000]},
+        ],
+        {'D0': ['North', 'South']},
+    )
+
+    table = parse_dsr(response)
+
+    assert table['columns'] == ['Division', 'Sum(Cases.Active)', 'Reported']
+    assert table['rows'] == [
+        ['North', 12, datetime.date(2026, 1, 1)],
+        ['South', 12, None],
+        ['North', 7, datetime.datetime(2026, 1, 1, 0, 30)],
+    ]
+
+def test_parse_dsr_reads_the_fake_endpoint_format():
+    query = fake_query(['Cases.Date', 'Sum(Cases.Active)', 'Sum(Cases.Recovered)'], rows=30)
+
+    table = parse_dsr(json.loads(fake_query_result(query)))
+
+    assert table['columns'] == ['Date', 'Sum(Cases.Active)', 'Sum(Cases.Recovered)']
+    assert len(table['rows']) == 30
+    assert [row[0] for row in table['rows']] == [datetime.date(2026, 1, 1) + datetime.timedelta(days=day) for day in range(30)]
+    assert all(isinstance(row[1], int) for row in table['rows'])
+    # Every 13th row of the fake data has an empty value
+    assert table['rows'][12][2] is None
+
+def test_parse_dsr_rejects_other_responses():
+    with pytest.raises(DataExportException):
+        parse_dsr({'error': {'code': 'QueryUserError'}})
+
+def test_render_page_heads_untitled_visuals_with_their_name():
+    content = render_page('Cases', [{'name': 'cases', 'kind': 'table', 'table': {'columns': ['Date', 'New'], 'rows': [['2026-01-01', 1]]}}])
+
+    assert b'(cases) Tj' in content
+
+class SessionDriver:
+    """Stands in for a logged in browser, holding the fake dashboard's session cookie"""
+
+    def __init__(self, cookie: str):
+        self.cookie = cookie
+        self.quit_count = 0
+
+    def execute_cdp_cmd(self, command, params):
+        return {'cookies': [{'name': SESSION_COOKIE, 'value': self.cookie, 'domain': '127.0.0.1'}]}
+
+    def execute_script(self, script):
+        return None
+
+    def quit(self):
+        self.quit_count += 1
+
+@pytest.fixture
+def fake_powerbi():
+    server, dash_link = start_fake_powerbi(pages=2, render_ms=0, telemetry_ms=0, query_ms=0)
+    yield server, dash_link.split('/report')[0]
+    server.shutdown()
+
+def login(base: str) -> str:
+    form = urllib.parse.urlencode({'loginfmt': 'test@example.com', 'passwd': 'test'}).encode()
+    with urllib.request.urlopen(urllib.request.Request(f'{base}/login', data=form, method='POST')) as response:
+        return response.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+
+def test_export_all_reports_against_the_fake_dashboard(fake_powerbi, tmp_path, monkeypatch):
+    server, base = fake_powerbi
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_export, 'EXPORT_QUERY_URL', None)
+    spec = {
+        'query_url': f'{base}/explore/querydata',
+        'pages': {'1': 'Cases', '2': 'Divisions'},
+        'visuals': [
+            {'name': 'cases_by_day', 'title': 'New cases by day', 'page': 1, 'kind': 'bar',
+             'query': fake_query(['Cases.Date', 'Sum(Cases.New)'], rows=30)},
+            {'name': 'trend', 'title': 'Trend', 'page': 1, 'kind': 'line',
+             'query': fake_query(['Cases.Date', 'Sum(Cases.Tested)', 'Sum(Cases.Positive)'], rows=60)},
+            {'name': 'divisions', 'title': 'Cases by division', 'page': 2, 'kind': 'table',
+             'query': fake_query(['Divisions.Division', 'Sum(Cases.Active)'], rows=40)},
+        ],
+    }
+    with open(data_export.EXPORT_VISUALS, 'w') as f:
+        json.dump(spec, f)
+    driver = SessionDriver(login(base))
+
+    report_filepaths = export_all_reports(driver=driver, output_dir='reports')
+
+    # A driver that was passed in is left open
+    assert driver.quit_count == 0
+    assert server.query_count == 3
+    assert sorted(report_filepaths) == ['daily', 'union']
+    assert len(PdfReader(report_filepaths['union']).pages) == 1
+    assert len(PdfReader(report_filepaths['daily']).pages) == 2
+    csv_files = sorted(os.listdir(os.path.join('reports', 'data')))
+    assert [name.split(' (')[0] for name in csv_files] == ['cases_by_day', 'divisions', 'trend']
+    with open(os.path.join('reports', 'data', csv_files[1])) as f:
+        assert len(f.read().splitlines()) == 41
+
+    # A second export within EXPORT_CACHE_MINUTES reads every visual from the cache
+    export_all_reports(driver=driver, output_dir='reports')
+    assert server.query_count == 3
+
+def test_export_all_reports_needs_a_session(fake_powerbi, tmp_path, monkeypatch):
+    _, base = fake_powerbi
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_export, 'EXPORT_QUERY_URL', None)
+    with open(data_export.EXPORT_VISUALS, 'w') as f:
+        json.dump({'query_url': f'{base}/explore/querydata', 'visuals': [
+            {'name': 'cases', 'page': 1, 'kind': 'table', 'query': fake_query(['Cases.Date', 'Sum(Cases.New)'])},
+        ]}, f)
+
+    with pytest.raises(DataExportException, match='HTTP 401'):
+        export_all_reports(driver=SessionDriver('expired'), output_dir='reports')
@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+from report_daemon import CronSchedule, parse_cron_field, parse_schedule
+
+@pytest.mark.parametrize('field, low, high, expected', [
+    ('*', 0, 6, set(range(7))),
+    ('*/15', 0, 59, {0, 15, 30, 45}),
+    ('1-5', 0, 7, {1, 2, 3, 4, 5}),
+    ('0,30', 0, 59, {0, 30}),
+    ('1-10/3,20', 0, 59, {1, 4, 7, 10, 20}),
+])
+def test_parse_cron_field(field, low, high, expected):
+    assert parse_cron_field(field, low, high) == expected
+
+@pytest.mark.parametrize('field', ['60', '5-1', '-1', 'mon'])
+def test_parse_cron_field_rejects_bad_values(field):
+    with pytest.raises(ValueError):
+        parse_cron_field(field, 0, 59)
+
+def test_weekday_schedule_skips_the_weekend():
+    schedule = CronSchedule('0 7 * * 1-5')
+
+    # Friday 2026-10-16 after the run, the next one is on Monday
+    assert schedule.next_after(datetime.datetime(2026, 10, 16, 7, 0)) == datetime.datetime(2026, 10, 19, 7, 0)
+    assert schedule.next_after(datetime.datetime(2026, 10, 16, 6, 59, 30)) == datetime.datetime(2026, 10, 16, 7, 0)
+
+def test_sunday_is_zero_or_seven():
+    saturday = datetime.datetime(2026, 10, 17, 12, 0)
+    assert CronSchedule('30 9 * * 0').next_after(saturday) == datetime.datetime(2026, 10, 18, 9, 30)
+    assert CronSchedule('30 9 * * 7').next_after(saturday) == datetime.datetime(2026, 10, 18, 9, 30)
+
+def test_restricted_day_of_month_or_weekday_matches_either():
+    # The 1st of the month or any Monday, like cron
+    schedule = CronSchedule('0 8 1 * 1')
+    runs, when = [], datetime.datetime(2026, 10, 27)
+    for _ in range(3):
+        when = schedule.next_after(when)
+        runs.append(when.date())
+
+    assert runs == [datetime.date(2026, 11, 1), datetime.date(2026, 11, 2), datetime.date(2026, 11, 9)]
+
+def test_invalid_expressions():
+    with pytest.raises(ValueError, match='5 fields'):
+        CronSchedule('0 7 * *')
+    with pytest.raises(ValueError, match='never fires'):
+        CronSchedule('0 0 30 2 *').next_after(datetime.datetime(2026, 1, 1))
+
+def test_parse_schedule():
+    schedule = parse_schedule('daily=0 7 * * 1-5; daily, union=0 8 * * 1;')
+
+    assert list(schedule) == ['daily', 'daily,union']
+    routes, cron = schedule['daily,union']
+    assert routes == ['daily', 'union']
+    assert cron.expression == '0 8 * * 1'
+
+    with pytest.raises(ValueError, match='unknown routes'):
+        parse_schedule('monthly=0 7 1 * *')